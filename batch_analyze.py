@@ -0,0 +1,230 @@
+import argparse
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import time
+import cv2
+import model_registry
+from emotion_model import load_backend, load_face_cascade, detect_faces, preprocess_faces, predict_emotions_batch
+from stress_analysis import calculate_stress_level, get_recommendation
+from preprocessing import FaceBatchBuffer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+
+# Per-worker model and cascade, loaded once by the pool initializer
+_worker_model = None
+_worker_cascade = None
+_worker_buffer = None
+
+# Build Work Items from Input Paths
+def build_work_items(paths, chunk_frames=300, frame_step=1):
+    """
+    Expands image files, image folders and video files into work items.
+    Images are one item each; videos are split into chunks of `chunk_frames`
+    frames so one long video is spread across all workers.
+    """
+    items = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(IMAGE_EXTENSIONS + VIDEO_EXTENSIONS):
+                    items.extend(build_work_items([os.path.join(path, name)], chunk_frames, frame_step))
+        elif path.lower().endswith(IMAGE_EXTENSIONS):
+            items.append(("image", path, 0, 1, 1))
+        elif path.lower().endswith(VIDEO_EXTENSIONS):
+            capture = cv2.VideoCapture(path)
+            frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            capture.release()
+            if frame_count <= 0:
+                # Unknown length (some containers/streams): one item read to the end
+                items.append(("video", path, 0, None, frame_step))
+                continue
+            for start in range(0, frame_count, chunk_frames):
+                items.append(("video", path, start, min(start + chunk_frames, frame_count), frame_step))
+        else:
+            logging.warning(f"Skipping unsupported input: {path}")
+    return items
+
+# Stream Frames for One Work Item
+def iter_frames(item):
+    kind, path, start, end, frame_step = item
+    if kind == "image":
+        frame = cv2.imread(path)
+        if frame is not None:
+            yield 0, 0.0, frame
+        return
+    capture = cv2.VideoCapture(path)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    if start:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+    index = start
+    while end is None or index < end:
+        # grab() skips decoding for frames we are not going to analyze
+        if (index - start) % frame_step:
+            if not capture.grab():
+                break
+        else:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            yield index, index / fps, frame
+        index += 1
+    capture.release()
+
+# Worker Process
+def init_worker(backend, model_path):
+    global _worker_model, _worker_cascade, _worker_buffer
+    cv2.setNumThreads(1)  # one process per core; avoid oversubscribing OpenCV threads
+    _worker_model = load_backend(backend, model_path)
+    _worker_cascade = load_face_cascade()
+    _worker_buffer = FaceBatchBuffer()
+
+def analyze_frame(frame):
+    """
+    Detects, preprocesses and classifies every face in one BGR frame with the
+    worker's model. Returns a list of face dicts.
+    """
+    faces, gray_frame = detect_faces(_worker_cascade, frame)
+    if len(faces) == 0:
+        return []
+    predictions = predict_emotions_batch(_worker_model, preprocess_faces(gray_frame, faces, _worker_buffer))
+    return [{
+        "box": [int(x), int(y), int(w), int(h)],
+        "emotion": emotion,
+        "confidence": float(confidence),
+        "stress_level": calculate_stress_level(emotion),
+    } for (x, y, w, h), (emotion, confidence) in zip(faces, predictions)]
+
+def analyze_item(item):
+    """
+    Analyzes every frame of a work item and returns (frames_processed, results).
+    """
+    results = []
+    frames = 0
+    for frame_index, offset, frame in iter_frames(item):
+        frames += 1
+        for face in analyze_frame(frame):
+            results.append({"source": item[1], "frame": frame_index, "offset_seconds": round(offset, 3), **face})
+    return frames, results
+
+# Result Writers
+class JsonlWriter:
+    def __init__(self, path):
+        self.file = open(path, "w", encoding="utf-8")
+
+    def write(self, rows):
+        for row in rows:
+            self.file.write(json.dumps(row) + "\n")
+
+    def close(self):
+        self.file.close()
+
+class ParquetWriter:
+    """
+    Appends result batches as row groups so memory stays bounded by one batch.
+    """
+
+    def __init__(self, path):
+        import pyarrow  # noqa: F401 - fail early if the optional dependency is missing
+        self.path = path
+        self.writer = None
+
+    def write(self, rows):
+        if not rows:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pylist(rows)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table.cast(self.writer.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+def to_history_entries(rows, username, started_at):
+    """
+    Converts result rows to analysis_history documents. Video rows are
+    stamped `offset_seconds` after `started_at`, so they keep their order.
+    """
+    return [{
+        "timestamp": started_at + datetime.timedelta(seconds=row["offset_seconds"]),
+        "emotion": row["emotion"],
+        "stress_level": row["stress_level"],
+        "user": username,
+        "recommendation": get_recommendation(row["stress_level"]),
+        "daily_routine": "",
+        "source": row["source"],
+        "frame": row["frame"],
+    } for row in rows]
+
+# Run a Batch Analysis
+def run_batch(paths, output, workers=None, backend=None, model_path=None,
+              chunk_frames=300, frame_step=1, insert_user=None, db_batch_size=1000):
+    """
+    Analyzes all inputs with a process pool (one model per worker), streams
+    results to JSONL or Parquet (chosen by the output extension) and optionally
+    bulk-inserts them into analysis_history. The backend and model path
+    default to model_registry's. Returns (frames, faces, seconds).
+    """
+    backend, model_path = model_registry.resolve_model(backend, model_path)
+    items = build_work_items(paths, chunk_frames, frame_step)
+    if not items:
+        raise ValueError("No images or videos found in the given inputs.")
+    writer = ParquetWriter(output) if output.endswith(".parquet") else JsonlWriter(output)
+    repository = None
+    if insert_user:
+        from database import get_repository
+        repository = get_repository()
+
+    workers = workers or os.cpu_count()
+    started_at = datetime.datetime.now()
+    frames = faces = 0
+    pending = []
+    start = time.perf_counter()
+    try:
+        with multiprocessing.Pool(workers, initializer=init_worker, initargs=(backend, model_path)) as pool:
+            for item_frames, rows in pool.imap_unordered(analyze_item, items):
+                frames += item_frames
+                faces += len(rows)
+                writer.write(rows)
+                if repository:
+                    pending.extend(to_history_entries(rows, insert_user, started_at))
+                    if len(pending) >= db_batch_size:
+                        repository.insert_analyses(pending)
+                        pending = []
+        if repository and pending:
+            repository.insert_analyses(pending)
+    finally:
+        writer.close()
+        if repository:
+            from database import close_repository
+            close_repository()
+    elapsed = time.perf_counter() - start
+    logging.info(f"Analyzed {frames} frames ({faces} faces) with {workers} workers in {elapsed:.1f}s: {frames / elapsed:.1f} frames/sec")
+    return frames, faces, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless stress analysis of image folders and video files.")
+    parser.add_argument("inputs", nargs="+", help="Image files, image folders or video files.")
+    parser.add_argument("--output", default="results.jsonl", help="Output file (.jsonl or .parquet).")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--backend", default=None, help="Inference backend (keras, tflite or onnxruntime; default: EMOTION_MODEL_BACKEND or keras).")
+    parser.add_argument("--model", default=None, help="Path to the emotion model (default: the backend's model file).")
+    parser.add_argument("--chunk-frames", type=int, default=300, help="Video frames per work item.")
+    parser.add_argument("--every", type=int, default=1, help="Analyze every Nth video frame.")
+    parser.add_argument("--insert-user", help="Also bulk-insert results into analysis_history for this user.")
+    args = parser.parse_args()
+
+    run_batch(args.inputs, args.output, args.workers, args.backend, args.model,
+              args.chunk_frames, args.every, args.insert_user)
+
+if __name__ == "__main__":
+    main()
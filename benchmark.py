@@ -0,0 +1,899 @@
+import argparse
+import datetime
+import logging
+import math
+import os
+import platform
+import subprocess
+import time
+import numpy as np
+import cv2
+from emotion_model import (
+    load_face_cascade, detect_faces, detect_faces_gray, preprocess_faces,
+    predict_emotions_batch, load_backend, BACKENDS, EmotionBackend,
+)
+from face_tracker import FaceTracker, box_iou
+import database
+
+# Configure logging
+logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Benchmark Batched Emotion Inference
+def benchmark_batch_inference(emotion_model, batch_sizes=(1, 2, 4, 8, 16, 32), repeats=20):
+    """
+    Measures per-face latency of predict_emotions_batch for increasing batch sizes.
+    Returns a list of (batch_size, per_face_ms) tuples.
+    """
+    results = []
+    for batch_size in batch_sizes:
+        faces = np.random.rand(batch_size, 48, 48, 1).astype(np.float32)
+        # Warm up so graph tracing is not counted
+        predict_emotions_batch(emotion_model, faces)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            predict_emotions_batch(emotion_model, faces)
+        elapsed = time.perf_counter() - start
+        per_face_ms = elapsed / (repeats * batch_size) * 1000
+        results.append((batch_size, per_face_ms))
+        print(f"batch={batch_size:4d}  per-face latency: {per_face_ms:.3f} ms")
+    return results
+
+# Benchmark Inference Backends
+def _max_rss_mb():
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return float("nan")
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def benchmark_backend(backend_name, model_path, batch_sizes=(1, 8, 32), repeats=50):
+    """
+    Measures import and load time, peak resident memory growth and per-face
+    latency for one backend. Run each backend in a fresh process for
+    meaningful memory numbers.
+    """
+    rss_before = _max_rss_mb()
+    start = time.perf_counter()
+    BACKENDS[backend_name].import_runtime()
+    import_s = time.perf_counter() - start
+    start = time.perf_counter()
+    backend = load_backend(backend_name, model_path)
+    load_s = time.perf_counter() - start
+    print(f"{backend_name}: import {import_s * 1000:.0f} ms, load {load_s * 1000:.0f} ms")
+
+    latencies = {}
+    for batch_size in batch_sizes:
+        faces = np.random.rand(batch_size, 48, 48, 1).astype(np.float32)
+        backend.predict(faces)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            backend.predict(faces)
+        latencies[batch_size] = (time.perf_counter() - start) / (repeats * batch_size) * 1000
+        print(f"{backend_name}: batch={batch_size:3d}  per-face latency: {latencies[batch_size]:.3f} ms")
+    rss_growth = _max_rss_mb() - rss_before
+    print(f"{backend_name}: peak RSS growth {rss_growth:.1f} MiB")
+    return {"import_s": import_s, "load_s": load_s, "latency_ms": latencies, "rss_growth_mb": rss_growth}
+
+# Benchmark Scalar vs Vectorized Stress Scoring
+def benchmark_scoring(rows=1_000_000):
+    """
+    Scores `rows` random predictions with calculate_stress_level/get_recommendation
+    in a loop and with score_batch (label and probability-weighted variants).
+    """
+    from stress_analysis import EMOTIONS, calculate_stress_level, get_recommendation, score_batch, get_recommendation_by_id
+    rng = np.random.default_rng(0)
+    emotion_ids = rng.integers(0, len(EMOTIONS), rows)
+    probabilities = rng.dirichlet(np.ones(len(EMOTIONS)), rows).astype(np.float32)
+    routines = rng.integers(0, 3, rows)
+    labels = [EMOTIONS[i] for i in emotion_ids]
+
+    start = time.perf_counter()
+    for emotion in labels:
+        get_recommendation(calculate_stress_level(emotion))
+    scalar_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    level_ids, _ = score_batch(emotion_ids, routines)
+    vector_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    score_batch(probabilities, routines)
+    weighted_s = time.perf_counter() - start
+
+    get_recommendation_by_id(int(level_ids[0]))
+    print(f"calculate_stress_level + get_recommendation loop: {scalar_s:.3f} s ({rows / scalar_s:,.0f} rows/s)")
+    print(f"score_batch (labels):        {vector_s:.4f} s ({rows / vector_s:,.0f} rows/s)")
+    print(f"score_batch (probabilities): {weighted_s:.4f} s ({rows / weighted_s:,.0f} rows/s)")
+    return scalar_s, vector_s, weighted_s
+
+# Benchmark Per-Client vs Pooled Database Access
+def benchmark_db_operations(client_factory, operations=200):
+    """
+    Compares per-operation latency of opening a new client for every call (the
+    old connect_to_mongodb behaviour) against the shared pooled repository.
+    client_factory() must return a new MongoClient-compatible object.
+    """
+    entry = {"user": "benchmark", "emotion": "Neutral", "stress_level": "MEDIUM"}
+
+    start = time.perf_counter()
+    for _ in range(operations):
+        client = client_factory()
+        client[database.DATABASE_NAME]["analysis_history"].insert_one(dict(entry))
+        client[database.DATABASE_NAME]["users"].find_one({"username": "benchmark"})
+        client.close()
+    per_client_ms = (time.perf_counter() - start) / operations * 1000
+
+    database.configure_client(client=client_factory())
+    repository = database.get_mongo_repository()
+    start = time.perf_counter()
+    for _ in range(operations):
+        repository.insert_analysis(dict(entry))
+        repository.find_user("benchmark")
+    pooled_ms = (time.perf_counter() - start) / operations * 1000
+
+    repository.clear_history("benchmark")
+    print(f"new client per operation: {per_client_ms:.3f} ms/op")
+    print(f"pooled repository:        {pooled_ms:.3f} ms/op")
+    return per_client_ms, pooled_ms
+
+# Benchmark Detect-Every-Frame vs Detection Plus Tracking
+def benchmark_tracking(video_path, detect_every=5, detection_scale=0.5, max_frames=None):
+    """
+    Replays a recorded video and compares CPU time per frame of running the
+    cascade on every frame against FaceTracker. Recall is the share of
+    every-frame detections that the tracker also reports (IoU >= 0.3).
+    """
+    face_cascade = load_face_cascade()
+    tracker = FaceTracker(face_cascade, detect_every=detect_every, detection_scale=detection_scale)
+    capture = cv2.VideoCapture(video_path)
+    baseline_cpu = tracker_cpu = 0.0
+    frames = reference_faces = matched_faces = 0
+    while max_frames is None or frames < max_frames:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        start = time.process_time()
+        reference = detect_faces_gray(face_cascade, gray_frame)
+        baseline_cpu += time.process_time() - start
+
+        start = time.process_time()
+        tracks = tracker.update(gray_frame)
+        tracker_cpu += time.process_time() - start
+
+        frames += 1
+        reference_faces += len(reference)
+        for box in reference:
+            if any(box_iou(tuple(box), track.box) >= 0.3 for track in tracks):
+                matched_faces += 1
+    capture.release()
+    if frames == 0:
+        raise ValueError(f"No frames could be read from {video_path}")
+
+    recall = matched_faces / reference_faces if reference_faces else 1.0
+    print(f"frames: {frames}")
+    print(f"detect every frame: {baseline_cpu / frames * 1000:.2f} ms CPU/frame")
+    print(f"detect + tracking:  {tracker_cpu / frames * 1000:.2f} ms CPU/frame (detect every {detect_every}, scale {detection_scale})")
+    print(f"recall vs every-frame detection: {recall:.3f}")
+    return baseline_cpu / frames, tracker_cpu / frames, recall
+
+# Benchmark Batch CLI Scaling with Worker Count
+def benchmark_batch_scaling(inputs, worker_counts=None, backend=None, model_path=None):
+    """
+    Runs the headless batch analysis over the same inputs with increasing
+    worker counts and reports frames/sec and speed-up over one worker.
+    """
+    import tempfile
+    from batch_analyze import run_batch
+    worker_counts = worker_counts or sorted({1, 2, 4, os.cpu_count() or 1})
+    baseline = None
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in worker_counts:
+            frames, _, elapsed = run_batch(inputs, os.path.join(tmp, f"out_{workers}.jsonl"), workers, backend, model_path)
+            fps = frames / elapsed
+            baseline = baseline or fps
+            results[workers] = fps
+            print(f"workers={workers:3d}  {fps:8.1f} frames/sec  speed-up x{fps / baseline:.2f}")
+    return results
+
+# Reproducible Pipeline Benchmark
+PIPELINE_RESOLUTIONS = ((320, 240), (640, 480), (1280, 720))
+
+def measure(func, repeats=20, warmup=3, rounds=1):
+    """
+    Calls func() `warmup` times untimed, then `rounds` rounds of `repeats`
+    timed calls. Returns the median, p95, min and mean wall time in
+    milliseconds over all calls, plus each round's median so a comparison
+    can tell a real change from run-to-run noise.
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    round_medians = []
+    for _ in range(rounds):
+        start_index = len(samples)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+        round_medians.append(float(np.median(samples[start_index:])))
+    samples = np.sort(samples)
+    return {
+        "median_ms": float(np.median(samples)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "min_ms": float(samples[0]),
+        "mean_ms": float(np.mean(samples)),
+        "round_medians": round_medians,
+        "rounds": rounds,
+        "repeats": repeats,
+    }
+
+def load_face_frames(samples_dir):
+    """
+    Loads the recorded-face fixture images from a directory (BGR frames).
+    """
+    frames = []
+    for name in sorted(os.listdir(samples_dir)):
+        frame = cv2.imread(os.path.join(samples_dir, name))
+        if frame is not None:
+            frames.append(frame)
+    if not frames:
+        raise ValueError(f"No images found in {samples_dir}")
+    return frames
+
+def synthetic_frames(resolution, count=4, seed=0):
+    """
+    Seeded noise frames with a bright ellipse and two dark "eyes", so runs are
+    comparable between machines and commits without any recorded data.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = resolution
+    frames = []
+    for _ in range(count):
+        frame = rng.integers(0, 80, (height, width, 3), dtype=np.uint8)
+        center, axes = (width // 2, height // 2), (width // 8, height // 5)
+        cv2.ellipse(frame, center, axes, 0, 0, 360, (200, 190, 180), -1)
+        for dx in (-axes[0] // 2, axes[0] // 2):
+            cv2.circle(frame, (center[0] + dx, center[1] - axes[1] // 3), max(2, axes[0] // 8), (30, 30, 30), -1)
+        frames.append(frame)
+    return frames
+
+def benchmark_environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+# Benchmark Face Preprocessing Allocations
+def _legacy_preprocess_face(face):
+    # The original implementation: float64 division, then reshape
+    resized_face = cv2.resize(face, (48, 48))
+    if len(resized_face.shape) == 3:
+        resized_face = cv2.cvtColor(resized_face, cv2.COLOR_BGR2GRAY)
+    return np.reshape(resized_face / 255.0, (1, 48, 48, 1))
+
+def benchmark_preprocessing(faces_per_frame=4, frames=500):
+    """
+    Compares per-crop latency and tracemalloc allocations of the original
+    per-face preprocessing (convert + float64 normalize + concatenate), the
+    one-shot preprocess_faces and a FaceBatchBuffer reused across frames.
+    """
+    import tracemalloc
+    from preprocessing import FaceBatchBuffer
+    frame = synthetic_frames((640, 480), count=1)[0]
+    gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    boxes = [(40 + 140 * i, 120, 120, 140) for i in range(faces_per_frame)]
+    buffer = FaceBatchBuffer()
+
+    variants = {
+        "per-face (original)": lambda: np.concatenate(
+            [_legacy_preprocess_face(frame[y:y+h, x:x+w]) for x, y, w, h in boxes]).astype(np.float32),
+        "preprocess_faces": lambda: preprocess_faces(gray_frame, boxes),
+        "FaceBatchBuffer (reused)": lambda: buffer.fill(gray_frame, boxes),
+    }
+    results = {}
+    for name, func in variants.items():
+        func()
+        # Peak traced bytes of one frame, temporaries included
+        tracemalloc.start()
+        base, _ = tracemalloc.get_traced_memory()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        # Blocks allocated per frame, with every result kept alive so none are freed
+        kept = []
+        before = tracemalloc.take_snapshot()
+        for _ in range(frames):
+            kept.append(func())
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename")) / frames
+        del kept
+        timing = measure(func, repeats=frames)
+        per_crop_us = timing["median_ms"] / faces_per_frame * 1000
+        results[name] = {"per_crop_us": per_crop_us, "peak_bytes_per_frame": peak - base, "blocks_per_frame": blocks}
+        print(f"{name:<26} {per_crop_us:8.2f} us/crop   peak {(peak - base) / 1024:7.1f} KiB/frame   {blocks:5.1f} blocks/frame")
+    return results
+
+# Benchmark the Prediction Cache on a Recorded Session
+def benchmark_prediction_cache(video_path, model_path="emotion_model.h5", backend="keras",
+                               tolerances=(0, 8, 16, 32), ttl=2.0, max_size=256, max_frames=None):
+    """
+    Replays a recorded video, preprocesses every detected face and runs the
+    crops through the plain backend and through a CachedBackend for each
+    tolerance. Reports the share of model rows saved, the hit rate and the
+    label agreement with the uncached predictions. The video's own frame rate
+    drives the cache clock so TTL behaves as it would live.
+    """
+    from emotion_model import classify_predictions
+    from prediction_cache import CachedBackend, PredictionCache
+    face_cascade = load_face_cascade()
+    model = load_backend(backend, model_path)
+    capture = cv2.VideoCapture(video_path)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    batches = []
+    while max_frames is None or len(batches) < max_frames:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        faces, gray_frame = detect_faces(face_cascade, frame)
+        if len(faces):
+            batches.append((len(batches) / fps, preprocess_faces(gray_frame, faces)))
+    capture.release()
+    if not batches:
+        raise ValueError(f"No faces found in {video_path}")
+
+    reference = [[classify_predictions(row)[0] for row in model.predict(batch)] for _, batch in batches]
+    rows = sum(len(labels) for labels in reference)
+    results = {}
+    for tolerance in tolerances:
+        cache = PredictionCache(max_size, ttl, tolerance)
+        video_clock = [0.0]
+        cached = CachedBackend(model, cache, clock=lambda: video_clock[0])
+        agree = 0
+        start = time.perf_counter()
+        for (offset, batch), labels in zip(batches, reference):
+            video_clock[0] = offset
+            cached_predictions = cached.predict(batch)
+            agree += sum(classify_predictions(row)[0] == label for row, label in zip(cached_predictions, labels))
+        elapsed = time.perf_counter() - start
+        stats = cache.get_stats()
+        results[tolerance] = {"saved": stats["hits"] / rows, "agreement": agree / rows, "seconds": elapsed}
+        print(f"tolerance={tolerance:3d}  model rows saved {stats['hits']}/{rows} ({stats['hits'] / rows:.1%})  "
+              f"label agreement {agree / rows:.3f}  {elapsed:.2f} s")
+    return results
+
+# Benchmark Concurrent Logins and Session Token Checks
+def benchmark_logins(client_factory, users=32, logins=128, concurrency=(1, 4, 8, 16)):
+    """
+    Registers `users` accounts (half stored with legacy SHA-256 hashes, which
+    are migrated on their first login) against a MongoDB stand-in and measures
+    login latency with a thread pool at each concurrency level, then the cost
+    of checking the issued session tokens.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    import credentials
+    database.configure_client(client=client_factory())
+    # login_user goes through get_repository; point it at MongoDB for the run only
+    storage_backend = database.STORAGE_BACKEND
+    database.STORAGE_BACKEND = "mongodb"
+    try:
+        repository = database.get_mongo_repository()
+        repository.ensure_indexes()
+        for i in range(users):
+            password = f"password-{i}"
+            stored = credentials.legacy_sha256(password) if i % 2 else credentials.hash_password(password)
+            repository.insert_user({"username": f"bench-user-{i}", "password": stored})
+
+        def timed_login(i):
+            start = time.perf_counter()
+            token = database.login_user(f"bench-user-{i % users}", f"password-{i % users}")
+            return time.perf_counter() - start, token
+
+        tokens = []
+        results = {}
+        for workers in concurrency:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(workers) as pool:
+                outcomes = list(pool.map(timed_login, range(logins)))
+            elapsed = time.perf_counter() - start
+            latencies = np.array([seconds for seconds, _ in outcomes]) * 1000
+            tokens = [token for _, token in outcomes]
+            if not all(tokens):
+                raise RuntimeError("A benchmark login failed.")
+            results[workers] = {"p50_ms": float(np.median(latencies)), "p95_ms": float(np.percentile(latencies, 95)),
+                                "logins_per_s": logins / elapsed}
+            print(f"workers={workers:3d}  login p50 {results[workers]['p50_ms']:7.1f} ms  p95 {results[workers]['p95_ms']:7.1f} ms  "
+                  f"{logins / elapsed:7.1f} logins/s")
+
+        migrated = sum(not credentials.is_legacy_hash(user["password"]) for user in repository.user_collection.find())
+        timing = measure(lambda: [database.authenticate_session(token) for token in tokens], repeats=20)
+        print(f"legacy hashes migrated: {migrated}/{users} users on scrypt")
+        print(f"session token check: {timing['median_ms'] / len(tokens) * 1000:.1f} us/token (no DB, no KDF)")
+        results["token_check_us"] = timing["median_ms"] / len(tokens) * 1000
+        repository.user_collection.delete_many({"username": {"$regex": "^bench-user-"}})
+    finally:
+        database.STORAGE_BACKEND = storage_backend
+    return results
+
+# Load Generator for the Inference Server
+def benchmark_inference_server(address="127.0.0.1:8799", client_counts=(1, 2, 4, 8, 16), requests_per_client=50,
+                               model_path="emotion_model.h5", backend="keras", max_batch=32, max_wait_ms=5.0,
+                               analyze_frames=False):
+    """
+    Starts inference_server.py in a subprocess and drives it with a growing
+    number of concurrent clients, each sending one-face predict requests (or
+    whole 640x480 frames with analyze_frames). Reports p50/p99 request latency,
+    throughput and the mean micro-batch size the server formed.
+    """
+    import sys
+    import threading
+    from inference_server import InferenceClient
+    server = subprocess.Popen([sys.executable, "inference_server.py", "--address", address, "--backend", backend,
+                               "--model", model_path, "--max-batch", str(max_batch), "--max-wait-ms", str(max_wait_ms)],
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+    try:
+        probe = InferenceClient(address, timeout=1.0)
+        deadline = time.monotonic() + 120
+        while True:
+            try:
+                probe.stats()
+                break
+            except OSError:
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("Inference server did not start.")
+                time.sleep(0.5)
+
+        face = np.random.default_rng(0).random((1, 48, 48, 1), dtype=np.float32)
+        frame = synthetic_frames((640, 480), count=1)[0]
+        results = {}
+        for clients in client_counts:
+            latencies = []
+            lock = threading.Lock()
+
+            def run_client():
+                client = InferenceClient(address)
+                local = []
+                for _ in range(requests_per_client):
+                    start = time.perf_counter()
+                    if analyze_frames:
+                        client.analyze(frame)
+                    else:
+                        client.predict(face)
+                    local.append((time.perf_counter() - start) * 1000)
+                client.close()
+                with lock:
+                    latencies.extend(local)
+
+            before = probe.stats()
+            threads = [threading.Thread(target=run_client) for _ in range(clients)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            after = probe.stats()
+            batches = after["batches"] - before["batches"]
+            mean_batch = (after["faces"] - before["faces"]) / batches if batches else 0.0
+            results[clients] = {
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p99_ms": float(np.percentile(latencies, 99)),
+                "requests_per_s": len(latencies) / elapsed,
+                "mean_batch": mean_batch,
+            }
+            print(f"clients={clients:3d}  p50 {results[clients]['p50_ms']:7.2f} ms  p99 {results[clients]['p99_ms']:7.2f} ms  "
+                  f"{results[clients]['requests_per_s']:8.1f} req/s  mean batch {mean_batch:5.1f}")
+        probe.close()
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+# Benchmark the Incremental History Export
+def _current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):  # no /proc outside Linux
+        return _max_rss_mb()
+
+def synthetic_history(rows, users=50, days=30, seed=0):
+    """
+    Yields `rows` analysis_history-shaped documents in _id order, spread over
+    `users` users and the last `days` days.
+    """
+    from bson import ObjectId
+    from stress_analysis import EMOTIONS, calculate_stress_level, get_recommendation
+    rng = np.random.default_rng(seed)
+    start = datetime.datetime(2026, 1, 1)
+    levels = {emotion: calculate_stress_level(emotion) for emotion in EMOTIONS}
+    for offset in range(0, rows, 100_000):
+        count = min(100_000, rows - offset)
+        user_ids = rng.integers(0, users, count)
+        emotion_ids = rng.integers(0, len(EMOTIONS), count)
+        # Timestamps rise with _id, as they do for live inserts
+        seconds = np.sort(rng.integers(offset, offset + count, count)) * (days * 86400) // rows
+        for user_id, emotion_id, second in zip(user_ids.tolist(), emotion_ids.tolist(), seconds.tolist()):
+            emotion = EMOTIONS[emotion_id]
+            yield {
+                "_id": ObjectId(),
+                "user": f"user-{user_id}",
+                "timestamp": start + datetime.timedelta(seconds=second),
+                "emotion": emotion,
+                "stress_level": levels[emotion],
+                "recommendation": get_recommendation(levels[emotion]),
+                "daily_routine": "",
+            }
+
+def benchmark_history_export(client_factory, rows=10_000_000, fmt="parquet", batch_size=None, incremental_rows=20_000):
+    """
+    Streams `rows` synthetic documents straight into the partitioned writer,
+    reporting writer-only rows/s (no database reads) and resident memory
+    (sampled every 100 ms) against the pre-run baseline. Then seeds
+    `incremental_rows` documents into MongoDB (or mongomock), times a full
+    export that reads them through history_cursor's projected, sorted,
+    batched cursor, adds 10% more documents and checks that the second run
+    exports only those.
+    """
+    import shutil
+    import tempfile
+    import threading
+    import export_history
+    batch_size = batch_size or export_history.EXPORT_BATCH_SIZE
+    output_dir = tempfile.mkdtemp(prefix="history-export-")
+    try:
+        baseline_mb = peak_mb = _current_rss_mb()
+        sampling = True
+
+        def sample_rss():
+            nonlocal peak_mb
+            while sampling:
+                peak_mb = max(peak_mb, _current_rss_mb())
+                time.sleep(0.1)
+
+        sampler = threading.Thread(target=sample_rss, daemon=True)
+        sampler.start()
+        writer = export_history.PartitionedWriter(output_dir, fmt)
+        start = time.perf_counter()
+        exported, _ = export_history.export_documents(synthetic_history(rows), writer, batch_size)
+        files = writer.commit()
+        elapsed = time.perf_counter() - start
+        sampling = False
+        sampler.join()
+        size_mb = sum(os.path.getsize(path) for path in files) / 2 ** 20
+        print(f"{fmt} writer only: {exported:,} rows in {elapsed:.1f} s ({exported / elapsed:,.0f} rows/s), "
+              f"{len(files)} files, {size_mb:.1f} MiB")
+        print(f"resident memory: {baseline_mb:.0f} MiB before, {peak_mb:.0f} MiB peak "
+              f"(+{peak_mb - baseline_mb:.0f} MiB, batch size {batch_size:,})")
+        results = {"writer_rows_per_s": exported / elapsed, "rss_increase_mb": peak_mb - baseline_mb, "files": len(files)}
+        shutil.rmtree(output_dir)
+
+        collection = client_factory()[database.DATABASE_NAME]["benchmark_export_history"]
+        collection.drop()
+        # Inserted through the repository so documents get their synced_at stamp
+        repository = database.StressRepository(collection, collection.database["benchmark_export_users"],
+                                               collection.database["benchmark_export_rollups"], use_rollups=False)
+        documents = list(synthetic_history(incremental_rows + incremental_rows // 10, seed=1))
+        repository.insert_analyses(documents[:incremental_rows])
+        time.sleep(0.01)  # past the millisecond of the last stamp, so settle=0 includes it
+        first = export_history.run_export(collection, output_dir, fmt, batch_size, settle=0)
+        print(f"{fmt} export through the cursor: {first['rows']:,} rows in {first['seconds']:.2f} s "
+              f"({first['rows'] / first['seconds']:,.0f} rows/s)")
+        results["cursor_rows_per_s"] = first["rows"] / first["seconds"]
+        repository.insert_analyses(documents[incremental_rows:])
+        time.sleep(0.01)
+        second = export_history.run_export(collection, output_dir, fmt, batch_size, settle=0)
+        third = export_history.run_export(collection, output_dir, fmt, batch_size, settle=0)
+        collection.drop()
+        print(f"incremental: first run {first['rows']:,} rows, after adding {len(documents) - incremental_rows:,} "
+              f"documents {second['rows']:,} rows, unchanged rerun {third['rows']:,} rows")
+        results["incremental_rows"] = [first["rows"], second["rows"], third["rows"]]
+        return results
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+# Exercise the QoS Controller with a Simulated Slow Backend
+class SimulatedCascade:
+    """
+    Stand-in for the Haar Cascade whose cost grows with the pixels scanned
+    and the number of pyramid levels (which shrinks as scaleFactor grows),
+    scaled by a `load` factor the benchmark raises to simulate a busy box.
+    Always finds one face in the middle of the frame.
+    """
+
+    def __init__(self, full_ms=60.0, full_pixels=640 * 480):
+        self.full_ms = full_ms
+        self.full_pixels = full_pixels
+        self.load = 1.0
+
+    def detectMultiScale(self, image, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)):
+        h, w = image.shape[:2]
+        cost = self.full_ms * (h * w / self.full_pixels) * (np.log(1.1) / np.log(scaleFactor))
+        time.sleep(cost * self.load / 1000)
+        return np.array([[w // 4, h // 4, w // 2, h // 2]], dtype=np.int32)
+
+class SimulatedSlowBackend(EmotionBackend):
+    """
+    Emotion backend that sleeps `delay_ms` * load per batch and returns uniform scores.
+    """
+    name = "simulated"
+
+    def __init__(self, cascade, delay_ms=20.0):
+        self.cascade = cascade
+        self.delay_ms = delay_ms
+
+    @staticmethod
+    def import_runtime():
+        return None
+
+    def predict(self, batch):
+        time.sleep(self.delay_ms * self.cascade.load / 1000)
+        return np.full((len(batch), 7), 1 / 7, dtype=np.float32)
+
+class StaticCamera:
+    """
+    Returns the same 640x480 frame at `fps`, i.e. a scene without motion.
+    """
+
+    def __init__(self, fps=30.0):
+        self.frame = synthetic_frames((640, 480), count=1)[0]
+        self.interval = 1.0 / fps
+
+    def read(self):
+        time.sleep(self.interval)
+        return True, self.frame
+
+def benchmark_qos(phases=((8, 1.0), (12, 6.0), (30, 1.0)), target_ms=150.0):
+    """
+    Runs LiveAnalyzer with a QoSController against a simulated cascade and
+    backend whose cost is multiplied by each phase's load factor for the
+    phase's duration in seconds. CPU load is pinned low so only the stage
+    timings drive the controller. Prints the level once per second and the
+    decisions taken; the controller should degrade under load and return to
+    "full" once it is removed.
+    """
+    from live_analysis import LiveAnalyzer
+    from qos import QoSController
+    cascade = SimulatedCascade()
+    qos = QoSController(target_ms=target_ms, cpu_sampler=lambda: 0.2)
+    analyzer = LiveAnalyzer(StaticCamera(), SimulatedSlowBackend(cascade), cascade, on_result=lambda result: None, qos=qos)
+    analyzer.start()
+    timeline = []
+    try:
+        elapsed = 0
+        for duration, load in phases:
+            cascade.load = load
+            for _ in range(duration):
+                before = analyzer.get_stats()["frames_analyzed"]
+                time.sleep(1.0)
+                elapsed += 1
+                stats = analyzer.get_stats()
+                timeline.append((elapsed, load, stats["qos"]["level_name"], stats["qos"]["frame_ms"],
+                                 stats["frames_analyzed"] - before, stats["frames_gated"]))
+                print(f"t={elapsed:3d}s  load x{load:<4}  level {stats['qos']['level_name']:<15} "
+                      f"frame {stats['qos']['frame_ms']:6.1f} ms  {stats['frames_analyzed'] - before:2d} analyzed/s  "
+                      f"{stats['frames_gated']} gated")
+    finally:
+        analyzer.stop()
+    print("decisions:")
+    for decision in qos.decisions:
+        print(f"  {decision['from']} -> {decision['to']}: {decision['reason']}")
+    levels = [row[2] for row in timeline]
+    print(f"degraded under load: {any(level != 'full' for level in levels)}, recovered: {levels[-1] == 'full'}")
+    return timeline
+
+# Benchmark Dashboard Rendering
+def synthetic_score_series(points, days=90, seed=0):
+    """
+    Returns `points` sorted matplotlib date numbers over `days` days and
+    stress scores (0-2) that drift between neighbouring levels.
+    """
+    import matplotlib.dates as mdates
+    rng = np.random.default_rng(seed)
+    start = mdates.date2num(datetime.datetime(2026, 1, 1))
+    timestamps = np.sort(start + rng.random(points) * days)
+    scores = np.clip(1 + np.cumsum(rng.choice([-1, 0, 0, 0, 1], points)) % 5 - 2, 0, 2).astype(np.float64)
+    return timestamps, scores
+
+def benchmark_dashboard(sizes=(1_000, 100_000, 1_000_000), repeats=5, appends=200):
+    """
+    For each series size, times a full render of every raw point on a fresh
+    Figure (the old approach, with date axes rather than string labels)
+    against StressDashboard's downsampled render, then the cost of a live
+    append by blitting. Finally opens and closes dashboards repeatedly and
+    checks that every Figure is garbage-collected.
+    """
+    import gc
+    import weakref
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import matplotlib.dates as mdates
+    from dashboard import StressDashboard
+    results = {}
+    for points in sizes:
+        timestamps, scores = synthetic_score_series(points)
+
+        def render_raw():
+            figure = Figure(figsize=(8, 6), dpi=100)
+            canvas = FigureCanvasAgg(figure)
+            ax = figure.add_subplot()
+            ax.plot(timestamps, scores, color="#c0392b", linewidth=1)
+            ax.xaxis.set_major_locator(mdates.AutoDateLocator())
+            canvas.draw()
+
+        def render_dashboard():
+            dashboard = StressDashboard()
+            dashboard.set_history(timestamps, scores)
+            dashboard.canvas.draw()
+            dashboard.close()
+
+        raw = measure(render_raw, repeats, 1)
+        downsampled = measure(render_dashboard, repeats, 1)
+
+        dashboard = StressDashboard()
+        dashboard.set_history(timestamps, scores)
+        dashboard.canvas.draw()
+        last = mdates.num2date(timestamps[-1]).replace(tzinfo=None)
+        start = time.perf_counter()
+        for i in range(appends):
+            dashboard.append(last + datetime.timedelta(minutes=i + 1), i % 3)
+        append_ms = (time.perf_counter() - start) * 1000 / appends
+        drawn = len(dashboard.line.get_xdata())
+        dashboard.close()
+
+        results[points] = {"raw_ms": raw["median_ms"], "dashboard_ms": downsampled["median_ms"], "append_ms": append_ms, "drawn_points": drawn}
+        print(f"{points:>9,} points  raw render {raw['median_ms']:8.1f} ms  dashboard render {downsampled['median_ms']:7.1f} ms "
+              f"({drawn:,} drawn)  live append {append_ms:6.2f} ms")
+
+    references = []
+    for _ in range(20):
+        dashboard = StressDashboard()
+        dashboard.set_history(*synthetic_score_series(10_000))
+        dashboard.canvas.draw()
+        references.append(weakref.ref(dashboard.figure))
+        dashboard.close()
+    del dashboard
+    gc.collect()
+    alive = sum(reference() is not None for reference in references)
+    print(f"figures still alive after 20 open/close cycles: {alive}")
+    results["figures_alive"] = alive
+    return results
+
+# Regression Gate Between Two Result Files
+def timing_noise(timing):
+    """
+    Relative run-to-run spread of a timing: the scaled median absolute
+    deviation of its round medians over their median. 0.0 with one round.
+    """
+    medians = np.asarray(timing.get("round_medians") or [timing["median_ms"]])
+    center = np.median(medians)
+    if len(medians) < 2 or center <= 0:
+        return 0.0
+    return float(1.4826 * np.median(np.abs(medians - center)) / center)
+
+def compare_timing(previous, current, max_regression=0.2, noise_factor=3.0):
+    """
+    Returns (change, threshold) for one benchmark. change is the smaller of
+    the median and the best-round (lowest round median) slowdowns, so
+    neither a few outliers nor one disturbed round fails the gate on its
+    own. threshold is `max_regression` or `noise_factor` times the combined
+    noise of both runs, whichever is larger, so a noisy benchmark needs a
+    larger slowdown to count.
+    """
+    def best(timing):
+        return min(timing.get("round_medians") or [timing["median_ms"]])
+    change = min(current["median_ms"] / previous["median_ms"], best(current) / best(previous)) - 1.0
+    noise = math.hypot(timing_noise(previous), timing_noise(current))
+    return change, max(max_regression, noise_factor * noise)
+
+def compare_results(baseline, current, max_regression=0.2, min_ms=0.05, noise_factor=3.0):
+    """
+    Compares two benchmark reports and returns (name, baseline_ms,
+    current_ms, change, threshold) for every benchmark whose slowdown
+    exceeds its threshold (see compare_timing). Timings under `min_ms` in
+    the baseline are ignored as noise.
+    """
+    regressions = []
+    for name, timing in current["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None or previous["median_ms"] < min_ms:
+            continue
+        change, threshold = compare_timing(previous, timing, max_regression, noise_factor)
+        marker = "REGRESSION" if change > threshold else ""
+        print(f"{name:<50} {previous['median_ms']:9.3f} -> {timing['median_ms']:9.3f} ms  {change:+7.1%} (limit {threshold:+.0%})  {marker}")
+        if change > threshold:
+            regressions.append((name, previous["median_ms"], timing["median_ms"], change, threshold))
+    return regressions
+
+def _mongo_client_factory(use_mongomock):
+    if use_mongomock:
+        import mongomock
+        return mongomock.MongoClient
+    from pymongo import MongoClient
+    return lambda: MongoClient(database.MONGO_URI, **database.client_options)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the stress analysis pipeline.")
+    parser.add_argument("suite", nargs="?", default="inference", choices=["inference", "db", "tracking", "backend", "batch", "scoring", "pipeline", "preprocess", "cache", "auth", "server", "export", "qos", "dashboard"], help="Benchmark to run.")
+    parser.add_argument("--model", default="emotion_model.h5", help="Path to the emotion model file.")
+    parser.add_argument("--repeats", type=int, default=20, help="Iterations per measurement.")
+    parser.add_argument("--backend", default="keras", choices=list(BACKENDS), help="Backend for the backend benchmark.")
+    parser.add_argument("--video", help="Recorded video for the tracking and cache benchmarks.")
+    parser.add_argument("--inputs", nargs="+", help="Images, folders or videos for the batch scaling benchmark.")
+    parser.add_argument("--mongomock", action="store_true", help="Use an in-memory mongomock stand-in instead of a local mongod.")
+    parser.add_argument("--frames", action="store_true", help="Server benchmark: send whole frames (analyze) instead of faces.")
+    parser.add_argument("--samples", help="Directory of recorded face images for the pipeline benchmark.")
+    parser.add_argument("--json", help="Write the pipeline results to this JSON file.")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier pipeline run; exit non-zero on regressions.")
+    parser.add_argument("--rounds", type=int, default=5, help="Pipeline benchmark: timed rounds of --repeats calls each.")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Synthetic documents for the export benchmark.")
+    parser.add_argument("--export-rows", type=int, default=20_000, help="Documents stored in MongoDB and exported through the cursor.")
+    parser.add_argument("--format", default="parquet", choices=["parquet", "arrow"], help="File format for the export benchmark.")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Smallest slowdown --compare fails on (0.2 = 20%%); noisy benchmarks get a larger limit.")
+    args = parser.parse_args()
+
+    if args.suite == "inference":
+        emotion_model = load_backend(args.backend, args.model)
+        benchmark_batch_inference(emotion_model, repeats=args.repeats)
+    elif args.suite == "db":
+        benchmark_db_operations(_mongo_client_factory(args.mongomock), operations=args.repeats * 10)
+    elif args.suite == "backend":
+        benchmark_backend(args.backend, args.model, repeats=args.repeats)
+    elif args.suite == "scoring":
+        benchmark_scoring()
+    elif args.suite == "server":
+        benchmark_inference_server(model_path=args.model, backend=args.backend, requests_per_client=args.repeats * 5,
+                                   analyze_frames=args.frames)
+    elif args.suite == "auth":
+        benchmark_logins(_mongo_client_factory(args.mongomock))
+    elif args.suite == "dashboard":
+        benchmark_dashboard()
+    elif args.suite == "qos":
+        benchmark_qos()
+    elif args.suite == "export":
+        benchmark_history_export(_mongo_client_factory(args.mongomock), args.rows, args.format, incremental_rows=args.export_rows)
+    elif args.suite == "cache":
+        if not args.video:
+            parser.error("the cache benchmark needs --video")
+        benchmark_prediction_cache(args.video, args.model, args.backend)
+    elif args.suite == "preprocess":
+        benchmark_preprocessing(frames=args.repeats * 25)
+    elif args.suite == "pipeline":
+        # The pipeline suite lives in tests/benchmarks; this runs it through pytest
+        import pytest
+        options = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests", "benchmarks"), "-q", "--benchmarks",
+                   f"--benchmark-model={args.model}", f"--benchmark-backend={args.backend}",
+                   f"--benchmark-repeats={args.repeats}", f"--benchmark-rounds={args.rounds}",
+                   f"--benchmark-max-regression={args.max_regression}"]
+        if args.samples:
+            options.append(f"--benchmark-samples={args.samples}")
+        if args.json:
+            options.append(f"--benchmark-json={args.json}")
+        if args.compare:
+            options.append(f"--benchmark-compare={args.compare}")
+        if not args.mongomock:
+            options.append("--benchmark-mongodb")
+        raise SystemExit(pytest.main(options))
+    elif args.suite == "batch":
+        if not args.inputs:
+            parser.error("the batch benchmark needs --inputs")
+        benchmark_batch_scaling(args.inputs, backend=args.backend, model_path=args.model)
+    elif args.suite == "tracking":
+        if not args.video:
+            parser.error("the tracking benchmark needs --video")
+        benchmark_tracking(args.video)
+
+if __name__ == "__main__":
+    main()
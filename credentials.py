@@ -0,0 +1,143 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+import logging
+from metrics import timed
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# scrypt cost (overridable through environment variables). N=2**14, r=8 takes
+# roughly 50 ms and 16 MiB per hash on a desktop CPU.
+SCRYPT_N = int(os.environ.get("SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = int(os.environ.get("SCRYPT_R", "8"))
+SCRYPT_P = int(os.environ.get("SCRYPT_P", "1"))
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+# Session tokens; without SESSION_SECRET a random key is used, so tokens die with the process
+SESSION_SECRET = os.environ.get("SESSION_SECRET")
+SESSION_TTL = float(os.environ.get("SESSION_TTL", str(12 * 3600)))
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+# Password Hashing
+def legacy_sha256(password):
+    """
+    The original unsalted SHA-256 hex digest, kept only to verify old hashes.
+    """
+    return hashlib.sha256(password.encode()).hexdigest()
+
+@timed("auth.kdf")
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=KEY_BYTES, maxmem=256 * n * r + 1024 * 1024)
+
+def hash_password(password, n=None, r=None, p=None):
+    """
+    Returns a salted scrypt hash encoded as "scrypt$n$r$p$salt$key".
+    """
+    n, r, p = n or SCRYPT_N, r or SCRYPT_R, p or SCRYPT_P
+    salt = os.urandom(SALT_BYTES)
+    return f"scrypt${n}${r}${p}${_b64encode(salt)}${_b64encode(_scrypt(password, salt, n, r, p))}"
+
+def is_legacy_hash(stored_hash):
+    return not stored_hash.startswith("scrypt$")
+
+def verify_password(password, stored_hash):
+    """
+    Checks a password against a stored scrypt or legacy SHA-256 hash and
+    returns (matches, needs_rehash). needs_rehash is True for legacy hashes and
+    for scrypt hashes made with a different cost than the current settings.
+    """
+    if is_legacy_hash(stored_hash):
+        return hmac.compare_digest(legacy_sha256(password), stored_hash), True
+    try:
+        _, n, r, p, salt, key = stored_hash.split("$")
+        n, r, p = int(n), int(r), int(p)
+        expected = _b64decode(key)
+        actual = _scrypt(password, _b64decode(salt), n, r, p)
+    except ValueError:
+        logging.error("Malformed password hash.")
+        return False, False
+    matches = hmac.compare_digest(actual, expected)
+    return matches, matches and (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+# Hash of a random password, verified when the username is unknown so the
+# response time does not reveal which usernames exist
+_DUMMY_HASH = None
+
+def verify_unknown_user(password):
+    global _DUMMY_HASH
+    if _DUMMY_HASH is None:
+        _DUMMY_HASH = hash_password(secrets.token_hex(16))
+    verify_password(password, _DUMMY_HASH)
+    return False
+
+# Signed Session Tokens
+class SessionManager:
+    """
+    Issues HMAC-SHA256 signed tokens of the form "user.expiry.nonce.signature".
+    verify() only recomputes the HMAC and checks expiry and the in-memory
+    revocation set, so repeat authentication checks never touch the database
+    or the password KDF.
+    """
+
+    def __init__(self, secret=None, ttl=SESSION_TTL):
+        secret = secret or SESSION_SECRET
+        self.secret = secret.encode() if isinstance(secret, str) else (secret or os.urandom(32))
+        self.ttl = ttl
+        self.revoked = set()
+        self._lock = threading.Lock()
+
+    def _sign(self, payload):
+        return _b64encode(hmac.new(self.secret, payload.encode(), hashlib.sha256).digest())
+
+    def issue(self, username):
+        payload = f"{_b64encode(username.encode())}.{int(time.time() + self.ttl)}.{secrets.token_urlsafe(12)}"
+        return f"{payload}.{self._sign(payload)}"
+
+    @timed("auth.verify_token")
+    def verify(self, token):
+        """
+        Returns the username for a valid, unexpired and unrevoked token, else None.
+        """
+        try:
+            payload, signature = token.rsplit(".", 1)
+            user, expiry, nonce = payload.split(".")
+        except (AttributeError, ValueError):
+            return None
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+        if int(expiry) < time.time() or nonce in self.revoked:
+            return None
+        return _b64decode(user).decode()
+
+    def revoke(self, token):
+        try:
+            nonce = token.rsplit(".", 2)[-2]
+        except (AttributeError, IndexError):
+            return
+        with self._lock:
+            self.revoked.add(nonce)
+
+_sessions = None
+_sessions_lock = threading.Lock()
+
+def get_session_manager():
+    """
+    Returns the process-wide SessionManager.
+    """
+    global _sessions
+    if _sessions is None:
+        with _sessions_lock:
+            if _sessions is None:
+                _sessions = SessionManager()
+    return _sessions
@@ -0,0 +1,251 @@
+import datetime
+import logging
+import os
+import numpy as np
+import matplotlib.dates as mdates
+from matplotlib.figure import Figure
+from stress_analysis import STRESS_SCORES
+from metrics import timed
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Parse formats matching database.SUMMARY_PERIODS (weeks are ISO weeks, parsed from their Monday)
+BUCKET_FORMATS = {"day": "%Y-%m-%d", "week": "%G-W%V-%u", "month": "%Y-%m"}
+BAR_WIDTHS = {"day": 0.8, "week": 5.6, "month": 25.0}  # in days
+
+# Timeline window (days up to the latest analysed day) and its point budget before per-pixel downsampling
+TIMELINE_DAYS = int(os.environ.get("DASHBOARD_TIMELINE_DAYS", "30"))
+TIMELINE_POINTS = int(os.environ.get("DASHBOARD_TIMELINE_POINTS", "4000"))
+
+# Convert a Summary Bucket to Its Start Date
+def bucket_start(bucket, period):
+    if period == "week":
+        bucket += "-1"
+    return datetime.datetime.strptime(bucket, BUCKET_FORMATS[period])
+
+# Min/Max Downsampling per Pixel Column
+def minmax_downsample(x, y, buckets):
+    """
+    Reduces a series sorted by x to at most 2 * buckets points: the x range is
+    split into `buckets` equal-width columns (one per pixel) and each column
+    keeps its minimum and maximum y at the column's first x. The drawn line
+    covers the same pixels as the full series, so short HIGH-stress spikes
+    stay visible, which plain decimation would drop. Vectorized, O(n).
+    """
+    if len(x) <= 2 * buckets:
+        return x, y
+    edges = np.linspace(x[0], x[-1], buckets + 1)[:-1]
+    starts = np.unique(np.searchsorted(x, edges, side="left"))
+    mins = np.minimum.reduceat(y, starts)
+    maxs = np.maximum.reduceat(y, starts)
+    xs = np.repeat(x[starts], 2)
+    ys = np.empty(len(xs), dtype=y.dtype)
+    ys[0::2] = mins
+    ys[1::2] = maxs
+    return xs, ys
+
+def score_series(documents):
+    """
+    Turns history documents (in timestamp order) into float64 arrays of
+    matplotlib date numbers and stress scores.
+    """
+    timestamps = []
+    scores = []
+    for document in documents:
+        score = STRESS_SCORES.get(document.get("stress_level"))
+        if score is None or not isinstance(document.get("timestamp"), datetime.datetime):
+            continue
+        timestamps.append(document["timestamp"])
+        scores.append(score)
+    return mdates.date2num(np.array(timestamps, dtype="datetime64[us]")), np.array(scores, dtype=np.float64)
+
+# Bounded Timeline Query
+def timeline_series(repository, username, summary, days=TIMELINE_DAYS, points=TIMELINE_POINTS):
+    """
+    Loads the timeline for a user's daily stress_summary() rows: only the
+    `days` days up to the latest summarised day are queried, and the scores
+    are min/max downsampled to at most `points` points, so opening the
+    dashboard does not grow with the length of the user's history.
+    """
+    start = bucket_start(summary[-1]["bucket"], "day") - datetime.timedelta(days=days - 1)
+    documents = repository.find_history(username, {"_id": 0, "timestamp": 1, "stress_level": 1}, start=start)
+    x, y = score_series(documents)
+    return minmax_downsample(x, y, points // 2)
+
+# Reusable Stress Dashboard
+class StressDashboard:
+    """
+    A persistent matplotlib Figure (no pyplot, so nothing is kept in pyplot's
+    global figure registry) with two panels on real datetime axes:
+    per-period summaries (mean stress line over analysis-count bars) and a
+    timeline of individual analyses, downsampled to the panel's pixel width.
+
+    append() adds a live analysis to the timeline by drawing just the new
+    segment onto the saved panel image and blitting that panel, so its cost
+    does not depend on how much history is shown. A full redraw (and
+    re-downsampling) happens only when the point falls outside the current
+    x range. Embedded in Tk when `master` is given, otherwise rendered
+    off-screen with Agg (for benchmarks and exports). Call close() when the
+    window goes away.
+    """
+
+    def __init__(self, master=None, figsize=(8, 6), dpi=100):
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.summary_ax, self.timeline_ax = self.figure.subplots(2, 1, gridspec_kw={"height_ratios": [3, 2]})
+        # Fixed margins: a layout engine would re-measure every tick label on each draw
+        self.figure.subplots_adjust(left=0.12, right=0.9, top=0.94, bottom=0.07, hspace=0.4)
+        self.count_ax = self.summary_ax.twinx()
+        if master is not None:
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            self.canvas = FigureCanvasTkAgg(self.figure, master=master)
+            self.interactive = True
+        else:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            self.canvas = FigureCanvasAgg(self.figure)
+            self.interactive = False
+        self.x = np.empty(1024)
+        self.y = np.empty(1024)
+        self.count = 0
+        self.username = None
+        # Animated: left out of full draws and drawn by _on_draw/_blit instead
+        self.line, = self.timeline_ax.plot([], [], color="#c0392b", linewidth=1, animated=True)
+        self.tail, = self.timeline_ax.plot([], [], color="#c0392b", linewidth=1, animated=True)
+        self.background = None
+        self._callbacks = [
+            self.canvas.mpl_connect("draw_event", self._on_draw),
+            self.canvas.mpl_connect("resize_event", self._on_resize),
+        ]
+        self._style_timeline()
+
+    @staticmethod
+    def _date_axis(ax):
+        locator = mdates.AutoDateLocator()
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+
+    def _score_axis(self, ax, label):
+        ax.set_yticks(list(STRESS_SCORES.values()))
+        ax.set_yticklabels(list(STRESS_SCORES.keys()))
+        ax.set_ylim(-0.2, max(STRESS_SCORES.values()) + 0.2)
+        ax.set_ylabel(label)
+        ax.grid(True)
+
+    def _style_timeline(self):
+        self._date_axis(self.timeline_ax)
+        self._score_axis(self.timeline_ax, "Stress Level")
+        self.timeline_ax.set_title("Individual Analyses")
+
+    def get_widget(self):
+        return self.canvas.get_tk_widget()
+
+    def _request_draw(self):
+        # Agg's draw_idle draws immediately; off-screen callers draw once when they are done
+        if self.interactive:
+            self.canvas.draw_idle()
+
+    # Summary Panel
+    def set_summary(self, rows, period, username):
+        """
+        Redraws the summary panel from stress_summary() rows.
+        """
+        self.username = username
+        dates = mdates.date2num([bucket_start(row["bucket"], period) for row in rows])
+        self.summary_ax.clear()
+        self.count_ax.clear()
+        self.count_ax.bar(dates, [row["count"] for row in rows], width=BAR_WIDTHS[period], align="edge", color="#95a5a6", alpha=0.4)
+        # clear() resets the twin axis to the left side
+        self.count_ax.yaxis.tick_right()
+        self.count_ax.yaxis.set_label_position("right")
+        self.count_ax.set_ylabel("Analyses")
+        self.summary_ax.set_zorder(self.count_ax.get_zorder() + 1)
+        self.summary_ax.patch.set_visible(False)
+        self.summary_ax.plot(dates + BAR_WIDTHS[period] / 2, [row["mean_score"] for row in rows], marker="o", linestyle="-", color="b")
+        self._date_axis(self.summary_ax)
+        self._score_axis(self.summary_ax, "Mean Stress Level")
+        self.summary_ax.set_title(f"Mean Stress Level per {period.capitalize()} - {username}")
+        self._request_draw()
+
+    # Timeline Panel
+    def set_history(self, timestamps, scores):
+        """
+        Replaces the timeline with a full series (date numbers and scores, in time order).
+        """
+        count = len(timestamps)
+        self._reserve(count)
+        self.x[:count] = timestamps
+        self.y[:count] = scores
+        self.count = count
+        self._fit_xlim()
+        self._request_draw()
+
+    def append(self, timestamp, score):
+        """
+        Adds one analysis (a datetime and its stress score) to the timeline.
+        """
+        x = mdates.date2num(timestamp)
+        self._reserve(self.count + 1)
+        self.x[self.count] = x
+        self.y[self.count] = score
+        self.count += 1
+        left, right = self.timeline_ax.get_xlim()
+        if self.background is None or not left <= x <= right:
+            self._fit_xlim()
+            self._request_draw()
+            return
+        # Inside the visible range: keep the point for later full draws, but only
+        # paint the segment from the previous point onto the saved panel image
+        xs, ys = self.line.get_data()
+        self.line.set_data(np.append(xs, x), np.append(ys, score))
+        if self.count > 1:
+            self.tail.set_data(self.x[self.count - 2:self.count], self.y[self.count - 2:self.count])
+        else:
+            self.tail.set_data([x], [score])
+        self._blit()
+
+    def _reserve(self, count):
+        if count <= len(self.x):
+            return
+        capacity = max(count, len(self.x) * 2)
+        self.x = np.resize(self.x, capacity)
+        self.y = np.resize(self.y, capacity)
+
+    def _fit_xlim(self):
+        if self.count == 0:
+            return
+        first, last = self.x[0], self.x[self.count - 1]
+        # Headroom on the right so live points can be blitted for a while
+        span = max(last - first, 1.0 / 24)
+        self.timeline_ax.set_xlim(first - span * 0.02, last + span * 0.1)
+        self._resample()
+
+    @timed("dashboard.downsample")
+    def _resample(self):
+        buckets = max(int(self.timeline_ax.bbox.width), 100)
+        self.line.set_data(*minmax_downsample(self.x[:self.count], self.y[:self.count], buckets))
+
+    def _on_resize(self, event):
+        self._resample()
+
+    def _on_draw(self, event):
+        # The saved image includes the history line, so blits restore it with the panel
+        self.timeline_ax.draw_artist(self.line)
+        self.background = self.canvas.copy_from_bbox(self.timeline_ax.bbox)
+
+    def _blit(self):
+        self.canvas.restore_region(self.background)
+        self.timeline_ax.draw_artist(self.tail)
+        self.canvas.blit(self.timeline_ax.bbox)
+        self.background = self.canvas.copy_from_bbox(self.timeline_ax.bbox)
+
+    def close(self):
+        """
+        Disconnects the canvas callbacks and releases the figure and its Tk widget.
+        """
+        for callback in self._callbacks:
+            self.canvas.mpl_disconnect(callback)
+        self._callbacks = []
+        self.background = None
+        self.figure.clear()
+        if hasattr(self.canvas, "get_tk_widget"):
+            self.canvas.get_tk_widget().destroy()
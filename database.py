@@ -1,32 +1,399 @@
-from pymongo import MongoClient
-import hashlib
+from pymongo import MongoClient, ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+import datetime
 import logging
+import os
+import threading
+from stress_analysis import STRESS_SCORES
+from metrics import timed
+import credentials
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# MongoDB Client Settings (overridable through environment variables)
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
+DATABASE_NAME = os.environ.get("MONGO_DATABASE", "stress_management")
+client_options = {
+    "maxPoolSize": int(os.environ.get("MONGO_MAX_POOL_SIZE", "20")),
+    "minPoolSize": int(os.environ.get("MONGO_MIN_POOL_SIZE", "0")),
+    "serverSelectionTimeoutMS": int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+    "connectTimeoutMS": int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+    "socketTimeoutMS": int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", "10000")),
+}
+
+# "sqlite" (offline-first local store synced to MongoDB) or "mongodb" (direct)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "sqlite")
+
+_client = None
+_repository = None
+_client_lock = threading.RLock()
+
+# Configure the Shared Client
+def configure_client(uri=None, client=None, **options):
+    """
+    Overrides the connection URI and pool/timeout options, or injects an existing
+    client (e.g. a mongomock client). Resets any previously created client.
+    """
+    global MONGO_URI, _client, _repository
+    with _client_lock:
+        if uri:
+            MONGO_URI = uri
+        client_options.update(options)
+        if _client is not None and _client is not client:
+            _client.close()
+        _client = client
+        _repository = None
+
+# Process-wide MongoDB Client
+def get_client():
+    """
+    Returns the process-wide MongoClient, creating it with the configured pool
+    size and timeouts on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                try:
+                    _client = MongoClient(MONGO_URI, **client_options)
+                    logging.info(f"Created MongoDB client (pool size {client_options['maxPoolSize']}).")
+                except Exception as e:
+                    logging.error(f"Failed to connect to MongoDB: {str(e)}")
+                    raise Exception(f"Failed to connect to MongoDB: {str(e)}")
+    return _client
+
 # MongoDB Connection Setup
 def connect_to_mongodb():
     """
-    Connects to the MongoDB database and returns the collections for analysis history and users.
+    Returns the collections for analysis history and users from the shared client.
     """
     try:
-        client = MongoClient("mongodb://localhost:27017/")
-        db = client["stress_management"]
+        db = get_client()[DATABASE_NAME]
         collection = db["analysis_history"]
         user_collection = db["users"]
-        logging.info("Connected to MongoDB successfully.")
         return collection, user_collection
     except Exception as e:
         logging.error(f"Failed to connect to MongoDB: {str(e)}")
         raise Exception(f"Failed to connect to MongoDB: {str(e)}")
 
+DUPLICATE_KEY = 11000
+
+# Default number of history entries fetched per page
+HISTORY_PAGE_SIZE = int(os.environ.get("HISTORY_PAGE_SIZE", "50"))
+
+# Bucket formats for dashboard summaries (shared by the aggregation pipeline and the rollups)
+SUMMARY_PERIODS = {"day": "%Y-%m-%d", "week": "%G-W%V", "month": "%Y-%m"}
+
+# Keep the stress_rollups collection up to date on every insert (STRESS_ROLLUPS=0 to disable)
+USE_ROLLUPS = os.environ.get("STRESS_ROLLUPS", "1") == "1"
+
+def bucket_key(timestamp, period):
+    """
+    Returns the summary bucket label of a datetime for the given period.
+    """
+    return timestamp.strftime(SUMMARY_PERIODS[period])
+
+def page_key(document):
+    """
+    Returns the (timestamp, _id) keyset position of a history document.
+    """
+    return document["timestamp"], document["_id"]
+
+# Data-Access Layer
+class StressRepository:
+    """
+    Single entry point for every read and write against the stress_management database.
+    """
+
+    def __init__(self, collection, user_collection, rollup_collection=None, use_rollups=USE_ROLLUPS, timeseries=None):
+        self.collection = collection
+        self.user_collection = user_collection
+        self.rollup_collection = rollup_collection if rollup_collection is not None else collection.database["stress_rollups"]
+        self.use_rollups = use_rollups
+        self._timeseries = timeseries  # detected on first write when None
+
+    @timed("db.ping")
+    def ping(self):
+        """
+        Forces the server handshake so the first real query does not pay for it.
+        """
+        self.collection.database.client.admin.command("ping")
+
+    @timed("db.ensure_indexes")
+    def ensure_indexes(self):
+        """
+        Creates the (user, timestamp) and synced_at history indexes and the
+        unique username index. Safe to call repeatedly; existing indexes are
+        left untouched.
+        """
+        self.collection.create_index([("user", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)], name="user_timestamp")
+        self.collection.create_index([("synced_at", ASCENDING)], name="synced_at")
+        self.user_collection.create_index([("username", ASCENDING)], name="username_unique", unique=True)
+        self.rollup_collection.create_index([("user", ASCENDING), ("period", ASCENDING), ("bucket", ASCENDING)], name="user_period_bucket", unique=True)
+
+    def is_timeseries(self):
+        """
+        True when history is a time-series collection (migrate.py --timeseries).
+        """
+        if self._timeseries is None:
+            try:
+                self._timeseries = "timeseries" in self.collection.options()
+            except Exception as e:
+                # Not cached: asked again on the next write
+                logging.debug(f"Could not read the options of {self.collection.name}: {str(e)}")
+                return False
+        return self._timeseries
+
+    def stored_ids(self, entries):
+        """
+        Returns the _ids of `entries` that are already stored. Time-series
+        collections do not enforce a unique _id, so writes that may be retried
+        check first; the lookup goes through the (user, timestamp) index.
+        """
+        keys = [{"user": entry.get("user"), "timestamp": entry.get("timestamp"), "_id": entry["_id"]} for entry in entries if "_id" in entry]
+        if not keys:
+            return set()
+        return {document["_id"] for document in self.collection.find({"$or": keys}, {"_id": 1})}
+
+    @timed("db.insert_analysis")
+    def insert_analysis(self, entry):
+        if self.is_timeseries() and self.stored_ids([entry]):
+            raise DuplicateKeyError(f"Analysis {entry['_id']} is already stored.")
+        self.collection.insert_one(entry)
+        self.stamp_synced([entry["_id"]])
+        if self.use_rollups:
+            self.update_rollups([entry])
+
+    @timed("db.insert_analyses")
+    def insert_analyses(self, entries):
+        """
+        Bulk-inserts many analysis entries with one unordered insert_many.
+        Entries whose _id is already stored (e.g. from an earlier partial
+        attempt) are skipped, so retrying the same batch is safe; on a
+        time-series collection they are looked up first (see stored_ids).
+        """
+        if not entries:
+            return 0
+        stored = self.stored_ids(entries) if self.is_timeseries() else set()
+        fresh = [entry for entry in entries if entry.get("_id") not in stored]
+        try:
+            if fresh:
+                self.collection.insert_many(fresh, ordered=False)
+            inserted = fresh
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error["code"] != DUPLICATE_KEY for error in errors):
+                raise
+            duplicates = {error["index"] for error in errors}
+            inserted = [entry for index, entry in enumerate(fresh) if index not in duplicates]
+        # Duplicates too: an earlier attempt may have stopped between the insert and the stamp
+        self.stamp_synced([entry["_id"] for entry in entries])
+        if self.use_rollups:
+            self.update_rollups(inserted)
+        return len(inserted)
+
+    @timed("db.stamp_synced")
+    def stamp_synced(self, ids):
+        """
+        Sets synced_at to the server's clock on documents that do not have it
+        yet. Unlike _id, which the offline store assigns when an analysis is
+        made, it records when the document reached MongoDB, so incremental
+        exports also see entries synced late.
+        """
+        self.collection.update_many({"_id": {"$in": ids}, "synced_at": {"$exists": False}}, {"$currentDate": {"synced_at": True}})
+
+    # Dashboard Summaries
+    @timed("db.update_rollups")
+    def update_rollups(self, entries):
+        """
+        Incrementally adds analysis entries to the per-user daily/weekly/monthly rollups.
+        """
+        operations = []
+        for entry in entries:
+            timestamp = entry.get("timestamp")
+            level = entry.get("stress_level")
+            if not isinstance(timestamp, datetime.datetime) or level not in STRESS_SCORES:
+                continue
+            for period in SUMMARY_PERIODS:
+                key = {"user": entry.get("user"), "period": period, "bucket": bucket_key(timestamp, period)}
+                increments = {"count": 1, "score_sum": STRESS_SCORES[level], level.lower(): 1}
+                operations.append(UpdateOne(key, {"$inc": increments}, upsert=True))
+        if operations:
+            self.rollup_collection.bulk_write(operations, ordered=False)
+
+    @timed("db.rebuild_rollups")
+    def rebuild_rollups(self, username=None):
+        """
+        Recomputes the rollups from analysis_history (all users, or just one).
+        """
+        users = [username] if username else self.collection.distinct("user")
+        for user in users:
+            self.rollup_collection.delete_many({"user": user})
+            for period in SUMMARY_PERIODS:
+                operations = []
+                for row in self.aggregate_stress_summary(user, period):
+                    key = {"user": user, "period": period, "bucket": row["bucket"]}
+                    fields = {name: row[name] for name in ("count", "low", "medium", "high")}
+                    fields["score_sum"] = row["mean_score"] * row["count"]
+                    operations.append(UpdateOne(key, {"$set": fields}, upsert=True))
+                if operations:
+                    self.rollup_collection.bulk_write(operations, ordered=False)
+
+    @timed("db.aggregate_stress_summary")
+    def aggregate_stress_summary(self, username, period="day"):
+        """
+        Buckets a user's history by period inside MongoDB and returns one row per
+        bucket with the entry count, per-level counts and mean numeric stress score.
+        """
+        level_score = {"$switch": {
+            "branches": [{"case": {"$eq": ["$stress_level", level]}, "then": score} for level, score in STRESS_SCORES.items()],
+            "default": None,
+        }}
+        pipeline = [
+            {"$match": {"user": username, "timestamp": {"$type": "date"}}},
+            {"$group": {
+                "_id": {"$dateToString": {"format": SUMMARY_PERIODS[period], "date": "$timestamp"}},
+                "count": {"$sum": 1},
+                "mean_score": {"$avg": level_score},
+                **{level.lower(): {"$sum": {"$cond": [{"$eq": ["$stress_level", level]}, 1, 0]}} for level in STRESS_SCORES},
+            }},
+            {"$sort": {"_id": 1}},
+        ]
+        return [
+            {"bucket": row["_id"], "count": row["count"], "mean_score": row["mean_score"] or 0.0,
+             **{level.lower(): row[level.lower()] for level in STRESS_SCORES}}
+            for row in self.collection.aggregate(pipeline)
+        ]
+
+    @timed("db.stress_summary")
+    def stress_summary(self, username, period="day"):
+        """
+        Returns pre-bucketed stress stats for the dashboard, read from the rollups
+        when they are enabled and computed with an aggregation pipeline otherwise.
+        Users without rollups (e.g. history written before they were enabled and
+        not yet rebuilt with migrate.py --rollups) also get the aggregation.
+        """
+        if period not in SUMMARY_PERIODS:
+            raise ValueError(f"Invalid period. Expected one of: {list(SUMMARY_PERIODS)}")
+        if not self.use_rollups:
+            return self.aggregate_stress_summary(username, period)
+        rows = list(self.rollup_collection.find({"user": username, "period": period}, {"_id": 0}).sort("bucket", ASCENDING))
+        if not rows:
+            return self.aggregate_stress_summary(username, period)
+        return [
+            {"bucket": row["bucket"], "count": row["count"], "mean_score": row["score_sum"] / row["count"],
+             **{level.lower(): row.get(level.lower(), 0) for level in STRESS_SCORES}}
+            for row in rows
+        ]
+
+    def history_query(self, username, start=None, end=None):
+        query = {"user": username}
+        if start is not None or end is not None:
+            query["timestamp"] = {}
+            if start is not None:
+                query["timestamp"]["$gte"] = start
+            if end is not None:
+                query["timestamp"]["$lt"] = end
+        return query
+
+    def find_history(self, username, projection=None, start=None, end=None):
+        """
+        Returns a cursor over a user's history in timestamp order, optionally
+        limited to the [start, end) datetime range.
+        """
+        query = self.history_query(username, start, end)
+        return self.collection.find(query, projection).sort("timestamp", ASCENDING)
+
+    @timed("db.fetch_history_page")
+    def fetch_history_page(self, username, page_size=HISTORY_PAGE_SIZE, after=None, before=None, projection=None):
+        """
+        Returns one page of a user's history in timestamp order using keyset
+        pagination on (timestamp, _id). Pass the page_key() of the last document
+        as `after` for the next page, or of the first document as `before` for
+        the previous one. Cost is independent of how deep the page is.
+        """
+        query = {"user": username}
+        if after is not None or before is not None:
+            timestamp, document_id = after if after is not None else before
+            op = "$gt" if after is not None else "$lt"
+            query["$or"] = [
+                {"timestamp": {op: timestamp}},
+                {"timestamp": timestamp, "_id": {op: document_id}},
+            ]
+        if projection is not None:
+            projection = dict(projection)
+            projection.pop("_id", None)
+            projection["timestamp"] = 1
+        direction = DESCENDING if before is not None else ASCENDING
+        cursor = self.collection.find(query, projection).sort([("timestamp", direction), ("_id", direction)]).limit(page_size)
+        documents = list(cursor)
+        if before is not None:
+            documents.reverse()
+        return documents
+
+    @timed("db.clear_history")
+    def clear_history(self, username):
+        self.rollup_collection.delete_many({"user": username})
+        return self.collection.delete_many({"user": username}).deleted_count
+
+    @timed("db.insert_user_data")
+    def insert_user_data(self, user_data):
+        self.collection.insert_one(user_data)
+
+    @timed("db.insert_user")
+    def insert_user(self, user):
+        self.user_collection.insert_one(user)
+
+    @timed("db.find_user")
+    def find_user(self, username):
+        """
+        Fetches a user by username through the unique username index; the
+        password hash is checked by the caller.
+        """
+        return self.user_collection.find_one({"username": username})
+
+    @timed("db.update_user_password")
+    def update_user_password(self, username, password_hash):
+        self.user_collection.update_one({"username": username}, {"$set": {"password": password_hash}})
+
+def get_mongo_repository():
+    """
+    Returns the shared StressRepository bound to the process-wide client.
+    """
+    global _repository
+    if _repository is None:
+        with _client_lock:
+            if _repository is None:
+                collection, user_collection = connect_to_mongodb()
+                _repository = StressRepository(collection, user_collection)
+    return _repository
+
+def get_repository():
+    """
+    Returns the repository the app reads and writes through: the local SQLite
+    store (synced to MongoDB in the background) by default, or MongoDB
+    directly when STORAGE_BACKEND=mongodb.
+    """
+    if STORAGE_BACKEND == "sqlite":
+        from local_store import get_local_repository
+        return get_local_repository()
+    return get_mongo_repository()
+
+def close_repository():
+    """
+    Runs a final sync of the local store before the app exits.
+    """
+    if STORAGE_BACKEND == "sqlite":
+        from local_store import shutdown_sync
+        shutdown_sync()
+
 # Hash Password for Secure Login
 def hash_password(password):
     """
-    Hashes the password using SHA-256 for secure storage.
+    Hashes the password with salted scrypt (see credentials.hash_password).
     """
-    return hashlib.sha256(password.encode()).hexdigest()
+    return credentials.hash_password(password)
 
 # Save User Data to MongoDB
 def save_user_data(username, emotion, daily_routine, stress_level, recommendation):
@@ -34,7 +401,6 @@ def save_user_data(username, emotion, daily_routine, stress_level, recommendatio
     Saves user data (emotion, daily routine, stress level, and recommendation) to the database.
     """
     try:
-        collection, _ = connect_to_mongodb()
         user_data = {
             "username": username,
             "emotion": emotion,
@@ -42,7 +408,7 @@ def save_user_data(username, emotion, daily_routine, stress_level, recommendatio
             "stress_level": stress_level,
             "recommendation": recommendation
         }
-        collection.insert_one(user_data)
+        get_repository().insert_user_data(user_data)
         logging.info(f"User data saved for {username}.")
     except Exception as e:
         logging.error(f"Failed to save user data: {str(e)}")
@@ -52,16 +418,20 @@ def save_user_data(username, emotion, daily_routine, stress_level, recommendatio
 def register_user(username, password):
     """
     Registers a new user by saving their username and hashed password to the database.
+    Returns False if the username is already taken (enforced by the unique username index).
     """
     try:
-        _, user_collection = connect_to_mongodb()
         hashed_password = hash_password(password)
         user = {
             "username": username,
             "password": hashed_password
         }
-        user_collection.insert_one(user)
+        get_repository().insert_user(user)
         logging.info(f"User {username} registered successfully.")
+        return True
+    except DuplicateKeyError:
+        logging.warning(f"Registration failed: username {username} already exists.")
+        return False
     except Exception as e:
         logging.error(f"Failed to register user: {str(e)}")
         raise Exception(f"Failed to register user: {str(e)}")
@@ -69,18 +439,55 @@ def register_user(username, password):
 # Authenticate User
 def authenticate_user(username, password):
     """
-    Authenticates a user by checking their username and password.
+    Authenticates a user by checking their username and password. Legacy
+    SHA-256 hashes (and scrypt hashes with an outdated cost) are replaced with
+    a fresh scrypt hash after a successful login.
     """
     try:
-        _, user_collection = connect_to_mongodb()
-        hashed_password = hash_password(password)
-        user = user_collection.find_one({"username": username, "password": hashed_password})
-        if user:
-            logging.info(f"User {username} authenticated successfully.")
-            return True
-        else:
+        repository = get_repository()
+        user = repository.find_user(username)
+        if not user:
+            credentials.verify_unknown_user(password)
             logging.warning(f"Authentication failed for user {username}.")
             return False
+        if user.get("status") == "conflict":
+            # Created offline under a name that belongs to another MongoDB account
+            logging.warning(f"Authentication refused for user {username}: the local account conflicts with a server account.")
+            return False
+        matches, needs_rehash = credentials.verify_password(password, user["password"])
+        if not matches:
+            logging.warning(f"Authentication failed for user {username}.")
+            return False
+        if needs_rehash:
+            repository.update_user_password(username, hash_password(password))
+            logging.info(f"Upgraded the password hash of user {username} to scrypt.")
+        logging.info(f"User {username} authenticated successfully.")
+        return True
     except Exception as e:
         logging.error(f"Failed to authenticate user: {str(e)}")
-        raise Exception(f"Failed to authenticate user: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Failed to authenticate user: {str(e)}")
+
+# Log In and Issue a Session Token
+def login_user(username, password):
+    """
+    Authenticates with the password once and returns a signed session token,
+    or None if the credentials are wrong.
+    """
+    if not authenticate_user(username, password):
+        return None
+    return credentials.get_session_manager().issue(username)
+
+# Check a Session Token
+def authenticate_session(token):
+    """
+    Returns the username of a valid session token, or None. Verified in memory:
+    no database lookup and no password hashing.
+    """
+    return credentials.get_session_manager().verify(token)
+
+# Log Out
+def logout_session(token):
+    """
+    Revokes a session token so authenticate_session rejects it from now on.
+    """
+    credentials.get_session_manager().revoke(token)
@@ -1,8 +1,10 @@
 import cv2
 import numpy as np
-import tensorflow as tf
 import os
 import logging
+from abc import ABC, abstractmethod
+from metrics import timed, timer
+from preprocessing import FaceBatchBuffer, to_gray
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -16,6 +18,8 @@ def load_emotion_model(model_path):
         logging.error(f"Model file not found at: {model_path}")
         raise FileNotFoundError(f"Model file not found at: {model_path}")
     try:
+        # TensorFlow is imported lazily so importing this module stays cheap
+        import tensorflow as tf
         model = tf.keras.models.load_model(model_path)
         logging.info("Emotion model loaded successfully.")
         return model
@@ -23,6 +27,148 @@ def load_emotion_model(model_path):
         logging.error(f"Failed to load emotion model: {str(e)}")
         raise Exception(f"Failed to load emotion model: {str(e)}")
 
+# Inference Backends
+class EmotionBackend(ABC):
+    """
+    Common interface for emotion model runtimes. predict() takes a float32 batch
+    of shape (N, 48, 48, 1) and returns softmax scores of shape (N, 7).
+    """
+    name = None
+
+    @staticmethod
+    @abstractmethod
+    def import_runtime():
+        """
+        Imports and returns the runtime module the backend needs.
+        """
+
+    @abstractmethod
+    def predict(self, batch):
+        """
+        Returns the (N, 7) softmax scores for a preprocessed batch.
+        """
+
+class KerasBackend(EmotionBackend):
+    """
+    Runs the full TensorFlow/Keras model with a direct call (no predict() setup).
+    """
+    name = "keras"
+
+    def __init__(self, model):
+        self.model = model
+
+    @classmethod
+    def load(cls, model_path):
+        return cls(load_emotion_model(model_path))
+
+    @staticmethod
+    def import_runtime():
+        import tensorflow
+        return tensorflow
+
+    def predict(self, batch):
+        predictions = self.model(batch, training=False)
+        if hasattr(predictions, "numpy"):
+            predictions = predictions.numpy()
+        return np.asarray(predictions)
+
+class TFLiteBackend(EmotionBackend):
+    """
+    Runs an exported .tflite model with the TFLite interpreter. Uses the small
+    tflite_runtime package when installed and falls back to TensorFlow's own
+    interpreter. int8-quantized inputs and outputs are (de)quantized here.
+    """
+    name = "tflite"
+
+    def __init__(self, model_path, num_threads=None):
+        if not os.path.exists(model_path):
+            logging.error(f"Model file not found at: {model_path}")
+            raise FileNotFoundError(f"Model file not found at: {model_path}")
+        runtime = self.import_runtime()
+        self.interpreter = runtime.Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_detail = self.interpreter.get_output_details()[0]
+        self.batch_size = int(self.input_detail["shape"][0])
+        logging.info(f"TFLite emotion model loaded from {model_path} (input {self.input_detail['dtype'].__name__}).")
+
+    @classmethod
+    def load(cls, model_path):
+        return cls(model_path)
+
+    @staticmethod
+    def import_runtime():
+        try:
+            from tflite_runtime import interpreter
+            return interpreter
+        except ImportError:
+            import tensorflow as tf
+            return tf.lite
+
+    def predict(self, batch):
+        if len(batch) != self.batch_size:
+            self.interpreter.resize_tensor_input(self.input_detail["index"], [len(batch), 48, 48, 1])
+            self.interpreter.allocate_tensors()
+            self.input_detail = self.interpreter.get_input_details()[0]
+            self.output_detail = self.interpreter.get_output_details()[0]
+            self.batch_size = len(batch)
+        input_data = batch
+        scale, zero_point = self.input_detail["quantization"]
+        if self.input_detail["dtype"] != np.float32:
+            input_data = np.round(batch / scale + zero_point).astype(self.input_detail["dtype"])
+        self.interpreter.set_tensor(self.input_detail["index"], input_data)
+        self.interpreter.invoke()
+        output = self.interpreter.get_tensor(self.output_detail["index"])
+        scale, zero_point = self.output_detail["quantization"]
+        if self.output_detail["dtype"] != np.float32:
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+class OnnxRuntimeBackend(EmotionBackend):
+    """
+    Runs an exported .onnx model with onnxruntime on the CPU execution provider.
+    """
+    name = "onnxruntime"
+
+    def __init__(self, model_path):
+        if not os.path.exists(model_path):
+            logging.error(f"Model file not found at: {model_path}")
+            raise FileNotFoundError(f"Model file not found at: {model_path}")
+        runtime = self.import_runtime()
+        self.session = runtime.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        logging.info(f"ONNX emotion model loaded from {model_path}.")
+
+    @classmethod
+    def load(cls, model_path):
+        return cls(model_path)
+
+    @staticmethod
+    def import_runtime():
+        import onnxruntime
+        return onnxruntime
+
+    def predict(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+BACKENDS = {backend.name: backend for backend in (KerasBackend, TFLiteBackend, OnnxRuntimeBackend)}
+
+def load_backend(name, model_path):
+    """
+    Loads the emotion model with the named backend ("keras", "tflite" or "onnxruntime").
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Invalid backend. Expected one of: {list(BACKENDS)}")
+    return BACKENDS[name].load(model_path)
+
+def as_backend(emotion_model):
+    """
+    Wraps a plain Keras model in a KerasBackend; backends are returned unchanged.
+    """
+    if isinstance(emotion_model, EmotionBackend):
+        return emotion_model
+    return KerasBackend(emotion_model)
+
 # Load Haar Cascade for Face Detection
 def load_face_cascade():
     """
@@ -35,15 +181,35 @@ def load_face_cascade():
     return cv2.CascadeClassifier(cascade_path)
 
 # Detect Faces in a Frame
-def detect_faces(face_cascade, frame):
+def detect_faces(face_cascade, frame, color_order="bgr"):
     """
     Detects faces in a given frame using the Haar Cascade classifier.
+    Returns the boxes and the grayscale frame, which callers reuse for
+    preprocessing instead of converting again.
     """
-    gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(gray_frame, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+    gray_frame = to_gray(frame, color_order)
+    faces = detect_faces_gray(face_cascade, gray_frame)
     return faces, gray_frame
 
+# Detect Faces in an Already-Grayscale Frame
+@timed("detect_faces")
+def detect_faces_gray(face_cascade, gray_frame, downscale=1.0, scale_factor=1.1, min_neighbors=5, min_size=(30, 30)):
+    """
+    Runs the Haar Cascade on a grayscale frame, optionally on a copy shrunk by
+    `downscale` (e.g. 0.5 for half resolution). Boxes are returned in
+    full-resolution coordinates.
+    """
+    if downscale == 1.0:
+        return face_cascade.detectMultiScale(gray_frame, scaleFactor=scale_factor, minNeighbors=min_neighbors, minSize=min_size)
+    small = cv2.resize(gray_frame, None, fx=downscale, fy=downscale, interpolation=cv2.INTER_AREA)
+    small_min_size = (max(1, int(min_size[0] * downscale)), max(1, int(min_size[1] * downscale)))
+    faces = face_cascade.detectMultiScale(small, scaleFactor=scale_factor, minNeighbors=min_neighbors, minSize=small_min_size)
+    if len(faces) == 0:
+        return faces
+    return (np.asarray(faces, dtype=np.float32) / downscale).astype(np.int32)
+
 # Preprocess Face for Emotion Analysis
+@timed("preprocess")
 def preprocess_face(face):
     """
     Preprocesses the face image for emotion analysis.
@@ -53,41 +219,94 @@ def preprocess_face(face):
     # Convert to grayscale if not already
     if len(resized_face.shape) == 3:
         resized_face = cv2.cvtColor(resized_face, cv2.COLOR_BGR2GRAY)
-    # Normalize pixel values to [0, 1]
-    normalized_face = resized_face / 255.0
+    # Normalize pixel values to [0, 1] directly in float32 (no float64 temporary)
+    normalized_face = np.multiply(resized_face, np.float32(1.0 / 255.0), dtype=np.float32)
     # Reshape to match model input shape (1, 48, 48, 1)
-    reshaped_face = np.reshape(normalized_face, (1, 48, 48, 1))
-    return reshaped_face
+    return normalized_face.reshape(1, 48, 48, 1)
+
+# Preprocess All Detected Faces into a Single Batch
+def preprocess_faces(gray_frame, faces, buffer=None):
+    """
+    Crops every detected face box from the grayscale frame and stacks them into
+    one float32 batch of shape (N, 48, 48, 1) for a single forward pass.
+    Pass a preprocessing.FaceBatchBuffer to reuse its memory across frames;
+    the result is then a view that the next call overwrites.
+    """
+    if buffer is None:
+        buffer = FaceBatchBuffer(len(faces))
+    return buffer.fill(to_gray(gray_frame), faces)
 
 # Predict Emotion from Preprocessed Face
-import numpy as np
-import logging
+EMOTION_LABELS = ["Angry", "Disgust", "Fear", "Happy", "Sad", "Surprise", "Neutral"]
 
-def predict_emotion(emotion_model, face):
+# Set thresholds
+HAPPY_THRESHOLD = 0.5  # Adjust this based on testing
+NEUTRAL_THRESHOLD = 0.4
+
+def classify_predictions(predictions):
     """
-    Predicts the emotion from a preprocessed face image.
+    Maps one softmax vector to a final emotion label and its confidence.
     """
-    emotion_labels = ["Angry", "Disgust", "Fear", "Happy", "Sad", "Surprise", "Neutral"]
-    
-    predictions = emotion_model.predict(face)[0]  # Get predictions for the first (and only) face
-    logging.info(f"Raw predictions: {predictions}")
-    
-    # Set thresholds
-    happy_threshold = 0.5  # Adjust this based on testing
-    neutral_threshold = 0.4
-    
     # Get the predicted index and confidence
     predicted_index = np.argmax(predictions)
-    predicted_emotion = emotion_labels[predicted_index]
+    predicted_emotion = EMOTION_LABELS[predicted_index]
     confidence = predictions[predicted_index]
     
     # Apply custom logic for classification
-    if predicted_emotion == "Happy" and confidence >= happy_threshold:
+    if predicted_emotion == "Happy" and confidence >= HAPPY_THRESHOLD:
         final_emotion = "Happy"
-    elif confidence > neutral_threshold:
+    elif confidence > NEUTRAL_THRESHOLD:
         final_emotion = "Neutral"
     else:
         final_emotion = "Sad"  # Default fallback for lower confidence levels
-    
-    logging.info(f"Predicted emotion: {final_emotion} (Confidence: {confidence:.2f})")
+
     return final_emotion, confidence
+
+# Timed Forward Pass
+def run_inference(emotion_model, batch):
+    """
+    Runs one forward pass through the model's backend and records its duration.
+    """
+    with timer("inference"):
+        return as_backend(emotion_model).predict(batch)
+
+def predict_emotion(emotion_model, face):
+    """
+    Predicts the emotion from a preprocessed face image.
+    """
+    batch = np.asarray(face, dtype=np.float32)
+    predictions = run_inference(emotion_model, batch)[0]  # Get predictions for the first (and only) face
+    # Lazy %-formatting: the array is only rendered when DEBUG is enabled
+    logging.debug("Raw predictions: %s", predictions)
+
+    final_emotion, confidence = classify_predictions(predictions)
+
+    logging.debug("Predicted emotion: %s (Confidence: %.2f)", final_emotion, confidence)
+    return final_emotion, confidence
+
+# Raw Softmax Scores for a Batch of Faces
+def predict_emotion_probabilities(emotion_model, faces):
+    """
+    Returns the (N, 7) softmax scores for a batch of preprocessed faces, for
+    callers that smooth or weight the full distribution instead of one label.
+    """
+    if len(faces) == 0:
+        return np.empty((0, len(EMOTION_LABELS)), dtype=np.float32)
+    return run_inference(emotion_model, np.asarray(faces, dtype=np.float32))
+
+# Predict Emotions for Many Faces in One Forward Pass
+def predict_emotions_batch(emotion_model, faces):
+    """
+    Predicts emotions for a batch of preprocessed faces of shape (N, 48, 48, 1).
+    Runs a single forward pass through the model's backend instead of one
+    predict() per face and returns a list of (emotion, confidence) tuples in input order.
+    """
+    if len(faces) == 0:
+        return []
+    batch = np.asarray(faces, dtype=np.float32)
+    predictions = run_inference(emotion_model, batch)
+
+    results = [classify_predictions(row) for row in predictions]
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug(f"Predicted emotions for {len(results)} face(s): {[emotion for emotion, _ in results]}")
+    return results
@@ -0,0 +1,126 @@
+import logging
+import numpy as np
+from emotion_model import EMOTION_LABELS, classify_predictions
+from stress_analysis import calculate_stress_level, STRESS_SCORES
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Smoothed State of One Tracked Face
+class FaceState:
+    """
+    Fixed-size per-face state: the EMA of the softmax vector, the current and
+    candidate labels for hysteresis, and running totals for the open window.
+    """
+    __slots__ = ("ema", "label", "confidence", "candidate", "candidate_count",
+                 "window_start", "window_frames", "window_score", "last_seen")
+
+    def __init__(self, probabilities, timestamp):
+        self.ema = np.array(probabilities, dtype=np.float32)
+        self.label, self.confidence = classify_predictions(self.ema)
+        self.candidate = None
+        self.candidate_count = 0
+        self.window_start = timestamp
+        self.window_frames = 0
+        self.window_score = 0.0
+        self.last_seen = timestamp
+
+# Streaming Aggregation of Per-Frame Predictions
+class EmotionAggregator:
+    """
+    Turns a noisy stream of per-frame softmax vectors into stable per-face
+    emotion records. Each face keeps an exponential moving average of its
+    softmax scores (weight `alpha` for the newest frame); the label only
+    changes after the smoothed prediction has disagreed with it for
+    `hysteresis_frames` consecutive updates. A record is emitted when the
+    smoothed label changes or a `window_seconds` window closes, and a face's
+    window is closed when it has not been seen for `expire_seconds`.
+    """
+
+    def __init__(self, alpha=0.3, hysteresis_frames=3, window_seconds=60.0, expire_seconds=10.0, daily_routine=None):
+        self.alpha = alpha
+        self.hysteresis_frames = hysteresis_frames
+        self.window_seconds = window_seconds
+        self.expire_seconds = expire_seconds
+        self.daily_routine = daily_routine
+        self.faces = {}
+
+    def update(self, face_id, probabilities, timestamp):
+        """
+        Adds one frame's softmax vector for a face and returns the records it produced.
+        """
+        records = self.expire(timestamp)
+        state = self.faces.get(face_id)
+        if state is None:
+            state = self.faces[face_id] = FaceState(probabilities, timestamp)
+            records.append(self._record(face_id, state, timestamp, "start"))
+        else:
+            state.ema *= 1.0 - self.alpha
+            state.ema += self.alpha * np.asarray(probabilities, dtype=np.float32)
+            label, confidence = classify_predictions(state.ema)
+            state.confidence = confidence
+            if label == state.label:
+                state.candidate, state.candidate_count = None, 0
+            elif label == state.candidate:
+                state.candidate_count += 1
+            else:
+                state.candidate, state.candidate_count = label, 1
+            if state.candidate_count >= self.hysteresis_frames:
+                state.label = label
+                state.candidate, state.candidate_count = None, 0
+                records.append(self._record(face_id, state, timestamp, "change"))
+        state.last_seen = timestamp
+        state.window_frames += 1
+        state.window_score += STRESS_SCORES[calculate_stress_level(state.label, self.daily_routine)]
+
+        if timestamp - state.window_start >= self.window_seconds:
+            records.append(self._close_window(face_id, state, timestamp))
+        return records
+
+    def current(self, face_id):
+        """
+        Returns (emotion, confidence) of the smoothed state, or None for unknown faces.
+        """
+        state = self.faces.get(face_id)
+        return (state.label, state.confidence) if state else None
+
+    def expire(self, timestamp):
+        """
+        Closes and forgets faces that have not been seen for expire_seconds.
+        """
+        records = []
+        for face_id, state in list(self.faces.items()):
+            if timestamp - state.last_seen >= self.expire_seconds:
+                if state.window_frames:
+                    records.append(self._close_window(face_id, state, state.last_seen))
+                del self.faces[face_id]
+        return records
+
+    def flush(self, timestamp):
+        """
+        Closes every open window (e.g. when live analysis stops).
+        """
+        records = [self._close_window(face_id, state, timestamp) for face_id, state in self.faces.items() if state.window_frames]
+        self.faces.clear()
+        return records
+
+    def _close_window(self, face_id, state, timestamp):
+        record = self._record(face_id, state, timestamp, "window")
+        record["frames"] = state.window_frames
+        record["mean_score"] = state.window_score / state.window_frames if state.window_frames else 0.0
+        record["window_start"] = state.window_start
+        state.window_start = timestamp
+        state.window_frames = 0
+        state.window_score = 0.0
+        return record
+
+    def _record(self, face_id, state, timestamp, reason):
+        return {
+            "face_id": face_id,
+            "timestamp": timestamp,
+            "reason": reason,
+            "emotion": state.label,
+            "confidence": float(state.confidence),
+            "stress_level": calculate_stress_level(state.label, self.daily_routine),
+            "probabilities": dict(zip(EMOTION_LABELS, state.ema.round(4).tolist())),
+        }
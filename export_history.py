@@ -0,0 +1,298 @@
+import argparse
+import datetime
+import json
+import os
+import time
+import logging
+from collections import OrderedDict
+from urllib.parse import quote
+from bson import ObjectId
+from stress_analysis import STRESS_SCORES
+from metrics import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Export settings (overridable through environment variables)
+EXPORT_DIR = os.environ.get("HISTORY_EXPORT_DIR", "history_export")
+EXPORT_BATCH_SIZE = int(os.environ.get("HISTORY_EXPORT_BATCH_SIZE", "50000"))
+EXPORT_MAX_OPEN_FILES = int(os.environ.get("HISTORY_EXPORT_MAX_OPEN_FILES", "64"))
+# Only export documents stamped (synced_at) at least this many seconds ago, so a
+# stamp still being written, or clock skew between this host and MongoDB, cannot
+# land behind the high-water mark
+EXPORT_SETTLE = float(os.environ.get("HISTORY_EXPORT_SETTLE", "60"))
+
+STATE_FILE = "_export_state.json"
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+EXPORT_COLUMNS = ("_id", "timestamp", "emotion", "stress_level", "score", "recommendation", "daily_routine", "camera")
+EXPORT_PROJECTION = {column: 1 for column in EXPORT_COLUMNS + ("user", "synced_at")}
+
+def export_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("_id", pa.string()),
+        ("timestamp", pa.timestamp("ms")),
+        ("emotion", pa.string()),
+        ("stress_level", pa.string()),
+        ("score", pa.int8()),
+        ("recommendation", pa.string()),
+        ("daily_routine", pa.string()),
+        ("camera", pa.string()),
+    ])
+
+def _to_datetime(timestamp):
+    if isinstance(timestamp, datetime.datetime):
+        return timestamp
+    try:
+        # Legacy string timestamps ("%Y-%m-%d %H:%M:%S") not yet converted by migrate.py
+        return datetime.datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return None
+
+# Partitioned File Writers
+class PartitionedWriter:
+    """
+    Writes rows into a Hive-style layout, user=<name>/date=<YYYY-MM-DD>/part-<run>-<n>.<ext>,
+    so readers such as pyarrow.dataset or pandas.read_parquet can prune by
+    user and date. At most `max_open_files` partition files are open at once;
+    the least recently written one is closed when another is needed, and a
+    later batch for that partition starts a new part file. Files are written
+    under a .tmp name and only renamed into place by commit(), so an
+    interrupted run leaves no partial files behind for readers.
+    """
+
+    def __init__(self, output_dir, fmt="parquet", run_id=None, max_open_files=EXPORT_MAX_OPEN_FILES):
+        if fmt not in FORMATS:
+            raise ValueError(f"Invalid export format. Expected one of: {list(FORMATS)}")
+        import pyarrow  # noqa: F401 - fail early if the optional dependency is missing
+        self.output_dir = output_dir
+        self.fmt = fmt
+        self.run_id = run_id or datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+        self.max_open_files = max_open_files
+        self.schema = export_schema()
+        self.open_files = OrderedDict()  # (user, datetime.date or None) -> writer
+        self.pending_paths = []
+        self.part_numbers = {}
+
+    def _open(self, partition):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if partition in self.open_files:
+            self.open_files.move_to_end(partition)
+            return self.open_files[partition]
+        while len(self.open_files) >= self.max_open_files:
+            self.open_files.popitem(last=False)[1].close()
+        user, date = partition
+        directory = os.path.join(self.output_dir, f"user={quote(user, safe='')}", f"date={date.isoformat() if date else 'unknown'}")
+        os.makedirs(directory, exist_ok=True)
+        number = self.part_numbers.get(partition, 0)
+        self.part_numbers[partition] = number + 1
+        path = os.path.join(directory, f"part-{self.run_id}-{number:04d}{FORMATS[self.fmt]}.tmp")
+        if self.fmt == "parquet":
+            writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        else:
+            writer = pa.ipc.new_file(path, self.schema)
+        self.pending_paths.append(path)
+        self.open_files[partition] = writer
+        return writer
+
+    def write(self, partition, columns):
+        import pyarrow as pa
+        table = pa.Table.from_pydict(columns, schema=self.schema)
+        self._open(partition).write_table(table)
+
+    def close(self):
+        while self.open_files:
+            self.open_files.popitem(last=False)[1].close()
+
+    def commit(self):
+        """
+        Closes every file and renames the run's .tmp files into place.
+        Returns the final paths.
+        """
+        self.close()
+        paths = []
+        for path in self.pending_paths:
+            final_path = path[:-len(".tmp")]
+            os.replace(path, final_path)
+            paths.append(final_path)
+        self.pending_paths = []
+        return paths
+
+    def abort(self):
+        self.close()
+        for path in self.pending_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        self.pending_paths = []
+
+# Stream Documents into Partitions
+def export_documents(documents, writer, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Buffers up to `batch_size` documents as per-partition column lists, then
+    writes each partition's rows as one table, so memory stays bounded by a
+    single batch however large the collection is. Returns (rows, marks),
+    where marks holds the largest synced_at and _id seen (None if none).
+    """
+    buffers = {}
+    buffered = rows = 0
+    last_synced_at = last_id = None
+    for document in documents:
+        timestamp = _to_datetime(document.get("timestamp"))
+        # Keyed by date object; formatting the partition name is left to the writer
+        partition = (str(document.get("user")), timestamp.date() if timestamp else None)
+        columns = buffers.get(partition)
+        if columns is None:
+            columns = buffers[partition] = {column: [] for column in EXPORT_COLUMNS}
+        level = document.get("stress_level")
+        columns["_id"].append(str(document["_id"]))
+        columns["timestamp"].append(timestamp)
+        columns["emotion"].append(document.get("emotion"))
+        columns["stress_level"].append(level)
+        columns["score"].append(STRESS_SCORES.get(level))
+        columns["recommendation"].append(document.get("recommendation"))
+        columns["daily_routine"].append(document.get("daily_routine"))
+        columns["camera"].append(document.get("camera"))
+        synced_at = document.get("synced_at")
+        if synced_at is not None and (last_synced_at is None or synced_at > last_synced_at):
+            last_synced_at = synced_at
+        if last_id is None or document["_id"] > last_id:
+            last_id = document["_id"]
+        buffered += 1
+        if buffered >= batch_size:
+            _flush(buffers, writer)
+            rows += buffered
+            buffered = 0
+    _flush(buffers, writer)
+    return rows + buffered, {"synced_at": last_synced_at, "_id": last_id}
+
+def _flush(buffers, writer):
+    with metrics.timer("export.write_batch"):
+        for partition, columns in buffers.items():
+            writer.write(partition, columns)
+    buffers.clear()
+
+# Export State (High-Water Mark)
+def read_state(output_dir):
+    path = os.path.join(output_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def write_state(output_dir, state):
+    # Write-then-rename so a crash never leaves a truncated state file
+    path = os.path.join(output_dir, STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def remove_stale_files(output_dir):
+    """
+    Deletes .tmp part files left behind by an interrupted run.
+    """
+    removed = 0
+    for directory, _, files in os.walk(output_dir):
+        for name in files:
+            if name.endswith(".tmp"):
+                os.remove(os.path.join(directory, name))
+                removed += 1
+    if removed:
+        logging.warning(f"Removed {removed} partial file(s) from an interrupted export.")
+    return removed
+
+def history_query(state, until):
+    """
+    Selects the documents to export given the saved state. Incremental runs
+    take everything stamped after the synced_at mark, up to `until`. A first
+    run takes every document except those stamped after `until`. An export
+    made before synced_at existed (state with only last_id) is continued
+    once more by _id for unstamped documents, plus every stamped one.
+    """
+    settled = {"synced_at": {"$lte": until}}
+    if state.get("last_synced_at"):
+        mark = datetime.datetime.fromisoformat(state["last_synced_at"])
+        # MongoDB dates have millisecond precision: start at the next possible stamp
+        settled["synced_at"]["$gte"] = mark.replace(microsecond=mark.microsecond // 1000 * 1000) + datetime.timedelta(milliseconds=1)
+        return settled
+    unstamped = {"synced_at": {"$exists": False}}
+    if state.get("last_id"):
+        unstamped["_id"] = {"$gt": ObjectId(state["last_id"])}
+    return {"$or": [unstamped, settled]}
+
+def history_cursor(collection, query, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Returns a cursor over the selected analysis_history documents in
+    synced_at order, which the synced_at index serves without an in-memory
+    sort. Reads go to a secondary when the deployment has one.
+    """
+    try:
+        from pymongo import ReadPreference
+        collection = collection.with_options(read_preference=ReadPreference.SECONDARY_PREFERRED)
+    except (ImportError, NotImplementedError):
+        pass
+    return collection.find(query, EXPORT_PROJECTION).sort("synced_at", 1).batch_size(min(batch_size, 10000))
+
+# Run an Incremental Export
+def run_export(collection, output_dir=EXPORT_DIR, fmt="parquet", batch_size=EXPORT_BATCH_SIZE,
+               max_open_files=EXPORT_MAX_OPEN_FILES, settle=EXPORT_SETTLE, full=False):
+    """
+    Exports the analysis_history documents that reached MongoDB since the
+    previous run (or all of them with full=True) and advances the high-water
+    mark stored in <output_dir>/_export_state.json. The mark is the
+    server-assigned synced_at, not the _id, which the offline store assigns
+    when an analysis is made, so entries synced days later are still
+    exported. It is only moved after the run's files are committed, so a
+    failed run is simply repeated next time. Returns a summary dict.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    remove_stale_files(output_dir)
+    state = {} if full else read_state(output_dir)
+    if state.get("format", fmt) != fmt:
+        raise ValueError(f"{output_dir} holds a {state['format']} export; use the same format or another directory.")
+    writer = PartitionedWriter(output_dir, fmt, max_open_files=max_open_files)
+    # MongoDB stores naive UTC datetimes
+    until = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) - datetime.timedelta(seconds=settle)
+    start = time.perf_counter()
+    try:
+        rows, marks = export_documents(history_cursor(collection, history_query(state, until), batch_size), writer, batch_size)
+        paths = writer.commit()
+    except Exception as e:
+        writer.abort()
+        logging.error(f"History export failed: {str(e)}")
+        raise Exception(f"History export failed: {str(e)}")
+    seconds = time.perf_counter() - start
+    if rows:
+        state.update({
+            "format": fmt,
+            "rows_exported": state.get("rows_exported", 0) + rows,
+            "last_run": datetime.datetime.now().isoformat(timespec="seconds"),
+        })
+        if marks["synced_at"] is not None:
+            state["last_synced_at"] = marks["synced_at"].isoformat()
+            state.pop("last_id", None)
+        elif not state.get("last_synced_at"):
+            # Only unstamped documents so far: keep continuing by _id
+            previous = ObjectId(state["last_id"]) if state.get("last_id") else marks["_id"]
+            state["last_id"] = str(max(previous, marks["_id"]))
+        write_state(output_dir, state)
+    logging.info(f"Exported {rows} history rows to {len(paths)} file(s) in {seconds:.1f} s.")
+    return {"rows": rows, "files": len(paths), "seconds": seconds, "last_synced_at": state.get("last_synced_at")}
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally export analysis_history to partitioned Parquet or Arrow files.")
+    parser.add_argument("--output", default=EXPORT_DIR, help="Export directory (holds the high-water mark state).")
+    parser.add_argument("--format", default="parquet", choices=list(FORMATS), help="File format.")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE, help="Documents buffered per write.")
+    parser.add_argument("--max-open-files", type=int, default=EXPORT_MAX_OPEN_FILES, help="Partition files kept open at once.")
+    parser.add_argument("--settle", type=float, default=EXPORT_SETTLE, help="Leave documents synced within this many seconds for the next run.")
+    parser.add_argument("--full", action="store_true", help="Ignore the high-water mark and export everything.")
+    args = parser.parse_args()
+
+    from database import get_mongo_repository
+    summary = run_export(get_mongo_repository().collection, args.output, args.format, args.batch_size,
+                         args.max_open_files, args.settle, args.full)
+    print(f"{summary['rows']} rows exported to {summary['files']} file(s) in {summary['seconds']:.1f} s")
+
+if __name__ == "__main__":
+    main()
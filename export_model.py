@@ -0,0 +1,130 @@
+import argparse
+import os
+import logging
+import cv2
+import numpy as np
+from emotion_model import (
+    load_emotion_model, load_face_cascade, detect_faces, preprocess_faces,
+    load_backend, KerasBackend, classify_predictions,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+# Collect Sample Faces for Calibration and Parity Checks
+def load_sample_faces(image_dir, limit=500):
+    """
+    Detects and preprocesses faces from the images in a directory and returns
+    them as one float32 batch of shape (N, 48, 48, 1).
+    """
+    face_cascade = load_face_cascade()
+    batches = []
+    count = 0
+    for name in sorted(os.listdir(image_dir)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        frame = cv2.imread(os.path.join(image_dir, name))
+        if frame is None:
+            continue
+        faces, gray_frame = detect_faces(face_cascade, frame)
+        if len(faces) == 0:
+            continue
+        batches.append(preprocess_faces(gray_frame, faces))
+        count += len(faces)
+        if count >= limit:
+            break
+    if not batches:
+        raise ValueError(f"No faces found in sample images under {image_dir}")
+    logging.info(f"Loaded {count} sample faces from {image_dir}.")
+    return np.concatenate(batches)[:limit]
+
+# Convert the Keras Model to TFLite
+def export_tflite(model_path, output_path, quantize="none", sample_faces=None):
+    """
+    Converts the .h5 model to TFLite. quantize is "none", "float16" (float16
+    weights) or "int8" (full-integer post-training quantization calibrated on
+    sample_faces, which is required in that case).
+    """
+    import tensorflow as tf
+    model = load_emotion_model(model_path)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == "int8":
+        if sample_faces is None:
+            raise ValueError("int8 quantization needs calibration faces (--samples).")
+
+        def representative_dataset():
+            for face in sample_faces:
+                yield [face[np.newaxis].astype(np.float32)]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    elif quantize != "none":
+        raise ValueError("Invalid quantization. Expected one of: none, float16, int8")
+
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+    logging.info(f"Exported TFLite model ({quantize}) to {output_path} ({os.path.getsize(output_path) / 1024:.0f} KiB).")
+    return output_path
+
+# Convert the Keras Model to ONNX
+def export_onnx(model_path, output_path):
+    """
+    Converts the .h5 model to ONNX with tf2onnx (optional dependency).
+    """
+    import tensorflow as tf
+    import tf2onnx
+    model = load_emotion_model(model_path)
+    signature = (tf.TensorSpec((None, 48, 48, 1), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=signature, output_path=output_path)
+    logging.info(f"Exported ONNX model to {output_path}.")
+    return output_path
+
+# Accuracy Parity Between the Keras Model and an Exported Backend
+def check_parity(reference, candidate, faces):
+    """
+    Compares two backends on the same faces and returns the top-1 agreement,
+    the final-label agreement (after the Happy/Neutral thresholds) and the
+    largest absolute softmax difference.
+    """
+    expected = reference.predict(faces)
+    actual = candidate.predict(faces)
+    top1 = float(np.mean(np.argmax(expected, axis=1) == np.argmax(actual, axis=1)))
+    labels = float(np.mean([classify_predictions(a)[0] == classify_predictions(b)[0] for a, b in zip(expected, actual)]))
+    max_diff = float(np.max(np.abs(expected - actual)))
+    logging.info(f"Parity: top-1 agreement {top1:.3f}, label agreement {labels:.3f}, max softmax diff {max_diff:.4f}")
+    return {"top1_agreement": top1, "label_agreement": labels, "max_abs_diff": max_diff}
+
+def main():
+    parser = argparse.ArgumentParser(description="Export emotion_model.h5 to an optimized inference format.")
+    parser.add_argument("--model", default="emotion_model.h5", help="Path to the Keras model.")
+    parser.add_argument("--format", default="tflite", choices=["tflite", "onnx"], help="Export format.")
+    parser.add_argument("--quantize", default="none", choices=["none", "float16", "int8"], help="TFLite post-training quantization.")
+    parser.add_argument("--samples", help="Directory of face images used for int8 calibration and the parity check.")
+    parser.add_argument("--output", help="Output path (defaults to emotion_model.<format> next to the model).")
+    parser.add_argument("--min-agreement", type=float, default=0.95, help="Fail if label agreement with Keras is lower.")
+    args = parser.parse_args()
+
+    sample_faces = load_sample_faces(args.samples) if args.samples else None
+    output = args.output or os.path.splitext(args.model)[0] + (".tflite" if args.format == "tflite" else ".onnx")
+    if args.format == "tflite":
+        export_tflite(args.model, output, args.quantize, sample_faces)
+        backend = "tflite"
+    else:
+        export_onnx(args.model, output)
+        backend = "onnxruntime"
+
+    if sample_faces is not None:
+        parity = check_parity(KerasBackend.load(args.model), load_backend(backend, output), sample_faces)
+        if parity["label_agreement"] < args.min_agreement:
+            raise SystemExit(f"Exported model agrees with Keras on only {parity['label_agreement']:.1%} of sample faces.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import logging
+from collections import Counter, deque
+import cv2
+from emotion_model import detect_faces_gray
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Intersection over Union of Two (x, y, w, h) Boxes
+def box_iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    intersection = ix * iy
+    union = aw * ah + bw * bh - intersection
+    return intersection / union if union else 0.0
+
+# One Tracked Face
+class Track:
+    """
+    A face with a stable ID, its current box, the grayscale template used for
+    matching between detections, and a short window of recent emotion labels.
+    """
+
+    def __init__(self, track_id, box, gray_frame, history=5):
+        self.track_id = track_id
+        self.box = tuple(int(v) for v in box)
+        self.template = None
+        self.missed = 0
+        self.emotions = deque(maxlen=history)
+        self.update_template(gray_frame)
+
+    def update_template(self, gray_frame):
+        x, y, w, h = self.box
+        self.template = gray_frame[y:y+h, x:x+w].copy()
+
+    def add_emotion(self, emotion):
+        self.emotions.append(emotion)
+
+    def smoothed_emotion(self):
+        """
+        Returns the most common of the recent emotion labels (None if there are none).
+        """
+        if not self.emotions:
+            return None
+        return Counter(self.emotions).most_common(1)[0][0]
+
+# Detection Plus Tracking
+class FaceTracker:
+    """
+    Runs the Haar Cascade only every `detect_every` frames (optionally on a frame
+    shrunk by `detection_scale`) and follows faces in between with template
+    matching inside a small region of interest around each previous box.
+    Detections are matched to existing tracks by IoU so face IDs stay stable.
+    """
+
+    def __init__(self, face_cascade, detect_every=5, detection_scale=0.5, search_margin=0.5,
+                 match_threshold=0.6, iou_threshold=0.3, max_missed=2, scale_factor=1.1):
+        self.face_cascade = face_cascade
+        self.detect_every = detect_every
+        self.detection_scale = detection_scale
+        self.scale_factor = scale_factor
+        self.search_margin = search_margin
+        self.match_threshold = match_threshold
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.tracks = []
+        self.frame_count = 0
+        self.next_id = 1
+        self.force_detection = True
+
+    def update(self, gray_frame):
+        """
+        Advances the tracker by one grayscale frame and returns the active tracks.
+        """
+        if self.force_detection or self.frame_count % self.detect_every == 0:
+            self._detect(gray_frame)
+        else:
+            self._track(gray_frame)
+        self.frame_count += 1
+        return self.tracks
+
+    def _detect(self, gray_frame):
+        faces = detect_faces_gray(self.face_cascade, gray_frame, downscale=self.detection_scale, scale_factor=self.scale_factor)
+        unmatched = list(self.tracks)
+        tracks = []
+        for box in faces:
+            box = tuple(int(v) for v in box)
+            best = max(unmatched, key=lambda track: box_iou(track.box, box), default=None)
+            if best is not None and box_iou(best.box, box) >= self.iou_threshold:
+                unmatched.remove(best)
+                best.box = box
+                best.missed = 0
+                best.update_template(gray_frame)
+                tracks.append(best)
+            else:
+                tracks.append(Track(self.next_id, box, gray_frame))
+                self.next_id += 1
+        # Keep briefly-missed faces so a single failed detection does not reset their ID
+        for track in unmatched:
+            track.missed += 1
+            if track.missed <= self.max_missed:
+                tracks.append(track)
+        self.tracks = tracks
+        self.force_detection = False
+
+    def _track(self, gray_frame):
+        frame_h, frame_w = gray_frame.shape[:2]
+        tracks = []
+        for track in self.tracks:
+            x, y, w, h = track.box
+            mx, my = int(w * self.search_margin), int(h * self.search_margin)
+            x0, y0 = max(0, x - mx), max(0, y - my)
+            x1, y1 = min(frame_w, x + w + mx), min(frame_h, y + h + my)
+            roi = gray_frame[y0:y1, x0:x1]
+            if roi.shape[0] < h or roi.shape[1] < w or track.template.size == 0:
+                continue
+            scores = cv2.matchTemplate(roi, track.template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, location = cv2.minMaxLoc(scores)
+            if score < self.match_threshold:
+                continue
+            track.box = (x0 + location[0], y0 + location[1], w, h)
+            tracks.append(track)
+        # Lost a face between detections: run the cascade on the next frame
+        if len(tracks) < len(self.tracks):
+            self.force_detection = True
+        self.tracks = tracks
@@ -0,0 +1,135 @@
+import threading
+import time
+import logging
+import cv2
+import numpy as np
+from metrics import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Dedicated Camera Reader Thread
+class FrameReader:
+    """
+    Reads frames from a VideoCapture on its own thread and keeps only the newest
+    one. Each frame is also resized and converted to RGB for display into one of
+    two reused buffers, so the Tk thread only has to blit. read() blocks until a
+    frame newer than the call arrives, so the reader can stand in for `cap`
+    wherever an OpenCV-style source is expected. With display_size=None the
+    display conversion is skipped (headless streams).
+    """
+
+    def __init__(self, capture, display_size=(600, 400), name="frame-reader"):
+        self.capture = capture
+        self.display_size = display_size
+        self.name = name
+        self._display_buffers = None
+        if display_size is not None:
+            width, height = display_size
+            self._resized = np.empty((height, width, 3), dtype=np.uint8)
+            self._display_buffers = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(2)]
+        self._front = 0
+        self._condition = threading.Condition()
+        self.frame = None
+        self.frame_id = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._read_loop, name=self.name, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self.thread:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def _read_loop(self):
+        while self.running:
+            ret, frame = self.capture.read()
+            if not ret:
+                time.sleep(0.01)
+                continue
+            back = 1 - self._front
+            if self._display_buffers is not None:
+                cv2.resize(frame, self.display_size, dst=self._resized)
+                cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGB, dst=self._display_buffers[back])
+            with self._condition:
+                self.frame = frame
+                self._front = back
+                self.frame_id += 1
+                self._condition.notify_all()
+
+    def latest(self):
+        """
+        Returns (frame_id, frame) for the newest full-resolution BGR frame.
+        """
+        with self._condition:
+            return self.frame_id, self.frame
+
+    def read(self, timeout=1.0):
+        """
+        Waits for the next frame and returns (ret, frame) like cv2.VideoCapture.read().
+        """
+        with self._condition:
+            seen = self.frame_id
+            self._condition.wait_for(lambda: self.frame_id != seen or not self.running, timeout=timeout)
+            if self.frame_id == seen:
+                return False, None
+            return True, self.frame
+
+    def blit(self, draw):
+        """
+        Calls draw(rgb_display_frame) with the newest display buffer while holding
+        the lock, so the reader cannot overwrite it mid-copy. Returns the frame id.
+        """
+        with self._condition:
+            draw(self._display_buffers[self._front])
+            return self.frame_id
+
+# Display Timing Statistics
+class FrameTimer:
+    """
+    Tracks display FPS, frames dropped between blits (cumulative) and UI-thread time per
+    displayed frame, and logs a summary every `log_interval` seconds.
+    """
+
+    def __init__(self, log_interval=5.0):
+        self.log_interval = log_interval
+        self.last_frame_id = None
+        self.displayed = 0
+        self.dropped = 0
+        self.ui_time = 0.0
+        self.display_fps = 0.0
+        self.ui_ms = 0.0
+        self.window_start = time.perf_counter()
+        self.last_log = self.window_start
+
+    def record(self, frame_id, ui_seconds):
+        if self.last_frame_id is not None and frame_id > self.last_frame_id + 1:
+            self.dropped += frame_id - self.last_frame_id - 1
+            metrics.increment("ui.dropped_frames", frame_id - self.last_frame_id - 1)
+        self.last_frame_id = frame_id
+        self.displayed += 1
+        self.ui_time += ui_seconds
+        metrics.observe("ui.draw_frame", ui_seconds)
+
+        now = time.perf_counter()
+        elapsed = now - self.window_start
+        if elapsed >= 1.0:
+            self.display_fps = self.displayed / elapsed
+            self.ui_ms = self.ui_time / self.displayed * 1000
+            self.displayed = 0
+            self.ui_time = 0.0
+            self.window_start = now
+        if now - self.last_log >= self.log_interval:
+            logging.info(f"Display: {self.display_fps:.1f} FPS, {self.ui_ms:.2f} ms UI time/frame, {self.dropped} dropped frames")
+            self.last_log = now
+
+    def summary(self):
+        return f"Display: {self.display_fps:.1f} FPS | UI: {self.ui_ms:.1f} ms/frame | Dropped: {self.dropped}"
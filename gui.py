@@ -1,16 +1,26 @@
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import messagebox, filedialog
 from PIL import Image, ImageTk
 import threading
 import datetime
+import time
 import cv2
-import numpy as np
 import logging
-from database import connect_to_mongodb, hash_password, save_user_data, register_user, authenticate_user
-from emotion_model import load_emotion_model, load_face_cascade, detect_faces, preprocess_face, predict_emotion
-from stress_analysis import calculate_stress_level, get_recommendation
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from database import register_user, login_user, authenticate_session, logout_session, get_repository, SUMMARY_PERIODS
+from emotion_model import detect_faces, preprocess_faces, predict_emotions_batch
+import model_registry
+from model_registry import get_emotion_model, get_face_cascade, warm_up_in_background, get_prediction_cache_stats
+from stress_analysis import calculate_stress_level, get_recommendation, STRESS_SCORES
+from history_viewer import HistoryViewer
+from live_analysis import LiveAnalyzer
+from qos import QoSController
+from face_tracker import FaceTracker
+from emotion_smoothing import EmotionAggregator
+from write_behind import get_analysis_writer
+from frame_reader import FrameReader, FrameTimer
+from multi_camera import MultiCameraAnalyzer, parse_sources
+from metrics import metrics
+from dashboard import StressDashboard, timeline_series
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -18,17 +28,64 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 # Global Variables
 webcam_running = False
 current_user = None
+session_token = None  # Signed token issued at login; re-checked in memory before history, delete and dashboard actions
 cap = None  # Webcam VideoCapture Object
+frame_reader = None  # FrameReader thread that owns cap while the webcam runs
+frame_timer = None  # Display FPS / UI-thread timing for show_frame
 daily_routine = ""  # Store daily routine entered by user
-
-# Load Emotion Model and Face Cascade
+live_analyzer = None  # LiveAnalyzer while live analysis mode is on
+multi_camera_analyzer = None  # MultiCameraAnalyzer while multi-camera mode is on
+multi_camera_starting = False  # True while its worker processes load the model
+stress_dashboard = None  # StressDashboard of the open dashboard window, fed with new analyses
+dashboard_loading = False  # True while the dashboard's data is fetched on a worker thread
+
+# Emotion model and face cascade are loaded lazily through model_registry
+# and the storage repository through database.get_repository; both are
+# warmed up in the background after the login screen is drawn
 emotion_labels = ["Angry", "Disgust", "Fear", "Happy", "Sad", "Surprise", "Neutral"]
-model_path = r"D:\PROJECT\PRJCT\emotion_model.h5"
-emotion_model = load_emotion_model(model_path)
-face_cascade = load_face_cascade()
 
-# MongoDB Connection
-collection, user_collection = connect_to_mongodb()
+# Analysis Entries
+def analysis_entry(emotion, stress_level, camera=None, timestamp=None, **details):
+    """
+    Builds the analysis_history document for the current user; `details`
+    are extra fields such as a live smoothing window's frames and mean_score.
+    """
+    entry = {
+        "timestamp": timestamp or datetime.datetime.now(),
+        "emotion": emotion,
+        "stress_level": stress_level,
+        "user": current_user,
+        "recommendation": get_recommendation(stress_level),
+        "daily_routine": daily_routine
+    }
+    if camera is not None:
+        entry["camera"] = camera
+    entry.update(details)
+    return entry
+
+def live_record_fields(record):
+    """
+    Keyword arguments for analysis_entry from an EmotionAggregator record:
+    its own timestamp and, for closed windows, the window's statistics.
+    """
+    fields = {"timestamp": datetime.datetime.fromtimestamp(record["timestamp"])}
+    if "window_start" in record:
+        fields["window_start"] = datetime.datetime.fromtimestamp(record["window_start"])
+        fields["frames"] = record["frames"]
+        fields["mean_score"] = record["mean_score"]
+    return fields
+
+def stop_live_analyzer():
+    """
+    Stops live analysis, if running, and returns the records of its still
+    open smoothing windows so the session's last state can be stored.
+    """
+    global live_analyzer
+    analyzer, live_analyzer = live_analyzer, None
+    if analyzer is None:
+        return []
+    analyzer.stop()
+    return analyzer.aggregator.flush(time.time())
 
 # Create the GUI
 def create_gui(root):
@@ -44,28 +101,47 @@ def create_gui(root):
 
     # Webcam Feed Handler
     def start_webcam():
-        global webcam_running, cap
+        global webcam_running, cap, frame_reader, frame_timer
+        if multi_camera_analyzer or multi_camera_starting:
+            messagebox.showwarning("Cameras Busy", "Stop multi-camera analysis before starting the webcam.")
+            return
         webcam_running = True
-        cap = cv2.VideoCapture(0)
+        # The preview shows the first configured source (CAMERA_SOURCES, default device 0)
+        cap = cv2.VideoCapture(parse_sources()[0][1])
+        frame_reader = FrameReader(cap, display_size=(600, 400)).start()
+        frame_timer = FrameTimer()
         show_frame()
 
     def stop_webcam():
-        global webcam_running, cap
+        global webcam_running, cap, frame_reader
+        stop_live_analysis()
         webcam_running = False
+        if frame_reader:
+            frame_reader.stop()
+            frame_reader = None
         if cap:
             cap.release()
         webcam_label.config(image='')
+        webcam_label.imgtk = None
+        frame_stats_label.config(text="")
+
+    def draw_frame(rgb_frame):
+        # Reuse one PhotoImage and paste new pixels into it instead of allocating per frame
+        img = Image.fromarray(rgb_frame)
+        if getattr(webcam_label, "imgtk", None) is None:
+            webcam_label.imgtk = ImageTk.PhotoImage(image=img)
+            webcam_label.config(image=webcam_label.imgtk)
+        else:
+            webcam_label.imgtk.paste(img)
 
     def show_frame():
         if webcam_running:
-            ret, frame = cap.read()
-            if ret:
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(frame)
-                img = img.resize((600, 400))
-                imgtk = ImageTk.PhotoImage(image=img)
-                webcam_label.imgtk = imgtk
-                webcam_label.config(image=imgtk)
+            # Only blit when the reader thread has produced a new frame
+            if frame_reader.frame_id and frame_reader.frame_id != frame_timer.last_frame_id:
+                start = time.perf_counter()
+                frame_id = frame_reader.blit(draw_frame)
+                frame_timer.record(frame_id, time.perf_counter() - start)
+                frame_stats_label.config(text=frame_timer.summary())
             webcam_label.after(10, show_frame)
 
     # Capture Image from Webcam
@@ -75,41 +151,153 @@ def create_gui(root):
             return
 
         if webcam_running:
-            ret, frame = cap.read()
-            if ret:
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(frame)
-                img.save("captured_image.png")
+            _, frame = frame_reader.latest()
+            if frame is not None:
+                # The reader hands out BGR frames; imwrite and detect_faces both expect BGR
+                cv2.imwrite("captured_image.png", frame)
                 messagebox.showinfo("Image Captured", "Image has been captured and saved as captured_image.png")
                 # Run stress analysis in a separate thread
                 threading.Thread(target=analyze_stress, args=(frame,)).start()
 
+    # Live Analysis Mode
+    def toggle_live_analysis():
+        if live_analyzer:
+            stop_live_analysis()
+        else:
+            start_live_analysis()
+
+    def start_live_analysis():
+        global live_analyzer
+        if not webcam_running:
+            messagebox.showwarning("Webcam Off", "Please start the webcam before live analysis.")
+            return
+        live_analyzer = LiveAnalyzer(
+            frame_reader, get_emotion_model(), get_face_cascade(),
+            on_result=lambda result: root.after(0, update_live_results, result),
+            tracker=FaceTracker(get_face_cascade()),
+            aggregator=EmotionAggregator(daily_routine=daily_routine),
+            qos=QoSController(),
+        )
+        live_analyzer.start()
+        live_button.config(text="Stop Live Analysis")
+
+    def stop_live_analysis():
+        if live_analyzer:
+            save_live_records(stop_live_analyzer())
+            live_button.config(text="Live Analysis")
+            live_stats_label.config(text="")
+
+    def save_live_records(records):
+        # Only smoothed state changes and closed windows are stored, not every frame
+        for record in records:
+            save_analysis_result(record["emotion"], record["stress_level"], **live_record_fields(record))
+
+    def update_live_results(result):
+        save_live_records(result["records"])
+        if not live_analyzer:
+            return
+        stats = live_analyzer.get_stats()
+        writes = get_analysis_writer().get_metrics()
+        qos = stats["qos"]
+        live_stats_label.config(text=f"Inference: {stats['inference_fps']:.1f} FPS | Latency: {stats['latency_ms']:.0f} ms | Dropped frames: {stats['frames_dropped']} | Write queue: {writes['queue_depth']} ({writes['last_flush_ms']:.0f} ms/flush) | QoS: {qos['level_name']} ({qos['frame_ms']:.0f}/{qos['target_ms']:.0f} ms, {qos['frames_gated']} gated)")
+        if not result["faces"]:
+            return
+        face = result["faces"][0]
+        update_gui(face["emotion"], face["stress_level"])
+
+    # Multi-Camera Analysis (every source in CAMERA_SOURCES, shared worker pool)
+    def toggle_multi_camera():
+        global multi_camera_analyzer, multi_camera_starting
+        if multi_camera_starting:
+            return
+        if multi_camera_analyzer:
+            analyzer = multi_camera_analyzer
+            multi_camera_analyzer = None
+            analyzer.stop()
+            multi_camera_button.config(text="Multi-Camera")
+            live_stats_label.config(text="")
+            return
+        if webcam_running:
+            messagebox.showwarning("Webcam On", "Stop the webcam before starting multi-camera analysis.")
+            return
+        last_levels = {}
+
+        def on_camera_result(camera, faces, captured_at):
+            # Called on the pool's result thread; only level changes are stored per camera
+            if not faces:
+                return
+            face = faces[0]
+            if last_levels.get(camera) != face["stress_level"]:
+                last_levels[camera] = face["stress_level"]
+                save_analysis_result(face["emotion"], face["stress_level"], camera, datetime.datetime.fromtimestamp(captured_at))
+
+        # start() waits for every worker process to load the model, so it runs off the Tk thread
+        multi_camera_starting = True
+        multi_camera_button.config(text="Starting Cameras...")
+        threading.Thread(target=start_multi_camera, args=(on_camera_result,), daemon=True).start()
+
+    def start_multi_camera(on_camera_result):
+        try:
+            analyzer = MultiCameraAnalyzer(parse_sources(), on_camera_result, backend=model_registry.model_backend,
+                                           model_path=model_registry.model_path).start()
+        except Exception as e:
+            logging.error(f"Failed to start multi-camera analysis: {str(e)}")
+            root.after(0, multi_camera_failed, f"Failed to start multi-camera analysis: {str(e)}")
+            return
+        root.after(0, multi_camera_started, analyzer)
+
+    def multi_camera_started(analyzer):
+        global multi_camera_analyzer, multi_camera_starting
+        multi_camera_starting = False
+        multi_camera_analyzer = analyzer
+        multi_camera_button.config(text="Stop Multi-Camera")
+        update_multi_camera_stats()
+
+    def multi_camera_failed(message):
+        global multi_camera_starting
+        multi_camera_starting = False
+        multi_camera_button.config(text="Multi-Camera")
+        messagebox.showerror("Error", message)
+
+    def update_multi_camera_stats():
+        if not multi_camera_analyzer:
+            return
+        if multi_camera_analyzer.error:
+            # A respawned worker could not load the model; the analyzer has stopped scheduling
+            message = multi_camera_analyzer.error
+            toggle_multi_camera()
+            messagebox.showerror("Error", f"Multi-camera analysis stopped: {message}")
+            return
+        stats = multi_camera_analyzer.get_stats()
+        live_stats_label.config(text=" | ".join(
+            f"{name}: {camera['analysis_fps']:.1f}/s, {camera['latency_ms']:.0f} ms, {camera['frames_skipped']} skipped"
+            for name, camera in stats.items()))
+        root.after(1000, update_multi_camera_stats)
+
     # Analyze Stress Based on Captured Image
     def analyze_stress(frame):
         try:
             # Detect faces in the frame
-            faces, gray_frame = detect_faces(face_cascade, frame)
+            faces, gray_frame = detect_faces(get_face_cascade(), frame)
 
             if len(faces) == 0:
                 messagebox.showwarning("No Face Detected", "No face detected in the captured image.")
                 return
 
-            # Crop the first detected face
-            (x, y, w, h) = faces[0]
-            face = gray_frame[y:y+h, x:x+w]
+            # Preprocess every detected face into one batch
+            face_batch = preprocess_faces(gray_frame, faces)
 
-            # Preprocess the face for emotion analysis
-            reshaped_face = preprocess_face(face)
+            # Predict emotions for all faces in a single forward pass
+            results = predict_emotions_batch(get_emotion_model(), face_batch)
 
-            # Predict emotion
-            emotion, confidence = predict_emotion(emotion_model, reshaped_face)
+            for index, (emotion, confidence) in enumerate(results):
+                # Calculate initial stress level based on emotion
+                stress_level = calculate_stress_level(emotion)
 
-            # Calculate initial stress level based on emotion
-            stress_level = calculate_stress_level(emotion)
-
-            # Update the GUI with the analysis results
-            root.after(0, update_gui, emotion, stress_level)
-            save_analysis_result(emotion, stress_level)
+                # Update the GUI with the first face's results
+                if index == 0:
+                    root.after(0, update_gui, emotion, stress_level)
+                save_analysis_result(emotion, stress_level)
         except Exception as e:
             logging.error(f"Error in stress analysis: {e}")
 
@@ -121,28 +309,54 @@ def create_gui(root):
         recommendation_label.config(text=f"Recommendation: {get_recommendation(stress_level)}", fg="#ffffff")
 
     # Save Analysis Result to MongoDB
-    def save_analysis_result(emotion, stress_level):
-        try:
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            recommendation = get_recommendation(stress_level)
-            entry = {
-                "timestamp": timestamp,
-                "emotion": emotion,
-                "stress_level": stress_level,
-                "user": current_user,
-                "recommendation": recommendation,
-                "daily_routine": daily_routine
-            }
-            collection.insert_one(entry)
-            logging.info(f"Analysis result saved for user {current_user}.")
-        except Exception as e:
-            logging.error(f"Failed to save analysis: {str(e)}")
-            messagebox.showerror("Database Error", f"Failed to save analysis: {str(e)}")
+    def save_analysis_result(emotion, stress_level, camera=None, timestamp=None, **details):
+        entry = analysis_entry(emotion, stress_level, camera, timestamp, **details)
+        # Queued and written in batches; DB failures are retried and journaled by the writer
+        get_analysis_writer().submit(entry)
+        # Called from worker threads too, so the dashboard is updated on the Tk thread
+        if stress_dashboard and stress_dashboard.username == current_user:
+            root.after(0, append_to_dashboard, stress_dashboard, entry["timestamp"], STRESS_SCORES[stress_level])
+
+    def append_to_dashboard(dashboard, timestamp, score):
+        if dashboard is stress_dashboard:
+            dashboard.append(timestamp, score)
+
+    # Session Checks
+    def session_user(action):
+        """
+        Returns the user of the current session token, or None after telling
+        the user to log in. An expired or revoked token ends the session.
+        """
+        username = authenticate_session(session_token) if session_token else None
+        if username is None:
+            if session_token:
+                end_session()
+                messagebox.showwarning("Session Expired", f"Your session has expired. Please log in again to {action}.")
+            else:
+                messagebox.showwarning("No User", f"Please log in to {action}.")
+        return username
+
+    def end_session():
+        global current_user, session_token
+        # Stop analysing first so pending results are still stored for this user
+        stop_webcam()
+        if multi_camera_analyzer:
+            toggle_multi_camera()
+        if session_token:
+            logout_session(session_token)
+        current_user = session_token = None
+        app_frame.pack_forget()
+        login_frame.pack(fill="both", expand=True)
+
+    def close_app():
+        if session_token:
+            logout_session(session_token)
+        root.destroy()
 
     # Clear History Function
     def clear_history():
-        if not current_user:
-            messagebox.showwarning("No User", "Please log in to clear history.")
+        username = session_user("clear history")
+        if not username:
             return
 
         # Confirm with the user
@@ -150,8 +364,8 @@ def create_gui(root):
         if confirm:
             try:
                 # Delete all entries for the current user
-                collection.delete_many({"user": current_user})
-                logging.info(f"Analysis history cleared for user {current_user}.")
+                get_repository().clear_history(username)
+                logging.info(f"Analysis history cleared for user {username}.")
                 messagebox.showinfo("Success", "Analysis history cleared successfully!")
             except Exception as e:
                 logging.error(f"Failed to clear history: {str(e)}")
@@ -159,87 +373,141 @@ def create_gui(root):
 
     # Show History Function
     def show_history():
-        if not current_user:
-            messagebox.showwarning("No User", "Please log in to view history.")
+        username = session_user("view history")
+        if not username:
             return
 
-        try:
-            # Fetch all analysis results for the current user
-            history = list(collection.find({"user": current_user}, {"_id": 0, "timestamp": 1, "emotion": 1, "stress_level": 1, "recommendation": 1}))
-
-            if not history:
-                messagebox.showinfo("No Data", "No history found.")
-                return
-
-            # Create a new window to display the history
-            history_window = tk.Toplevel(root)
-            history_window.title(f"Analysis History - {current_user}")
-            history_window.geometry("800x600")
-            history_window.configure(bg="#2c3e50")
+        # Open the paginated viewer; pages are fetched on a worker thread as the user scrolls
+        HistoryViewer(root, username, font=label_font)
 
-            # Create a text widget to display the history
-            history_text = tk.Text(history_window, font=label_font, bg="#34495e", fg="#ffffff", wrap="word")
-            history_text.pack(fill="both", expand=True, padx=10, pady=10)
+    # Performance Stats Panel
+    def show_stats():
+        stats_window = tk.Toplevel(root)
+        stats_window.title("Performance Stats")
+        stats_window.geometry("700x450")
+        stats_window.configure(bg="#2c3e50")
 
-            # Insert the history data into the text widget
-            for entry in history:
-                history_text.insert("end", f"Timestamp: {entry['timestamp']}\n")
-                history_text.insert("end", f"Emotion: {entry['emotion']}\n")
-                history_text.insert("end", f"Stress Level: {entry['stress_level']}\n")
-                history_text.insert("end", f"Recommendation: {entry['recommendation']}\n")
-                history_text.insert("end", "-" * 50 + "\n\n")
+        stats_text = tk.Text(stats_window, font=("Courier", 10), bg="#34495e", fg="#ffffff")
+        stats_text.pack(fill="both", expand=True, padx=10, pady=10)
 
-            # Disable the text widget to prevent editing
-            history_text.config(state="disabled")
-
-        except Exception as e:
-            logging.error(f"Failed to fetch history: {str(e)}")
-            messagebox.showerror("Error", f"Failed to fetch history: {str(e)}")
+        def refresh_stats():
+            if not stats_window.winfo_exists():
+                return
+            stats_text.delete("1.0", tk.END)
+            stats_text.insert(tk.END, metrics.format_table())
+            cache_stats = get_prediction_cache_stats()
+            if cache_stats:
+                stats_text.insert(tk.END, f"\n\nPrediction cache: {cache_stats['hit_rate']:.1%} hits ({cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['evictions']} evictions, {cache_stats['expired']} expired, {cache_stats['size']} entries)")
+            stats_window.after(1000, refresh_stats)
+
+        def export_stats():
+            path = filedialog.asksaveasfilename(
+                parent=stats_window, defaultextension=".json",
+                filetypes=[("JSON", "*.json"), ("Prometheus text", "*.prom")],
+            )
+            if path:
+                try:
+                    metrics.dump(path)
+                except Exception as e:
+                    logging.error(f"Failed to export metrics: {str(e)}")
+                    messagebox.showerror("Error", f"Failed to export metrics: {str(e)}")
+
+        controls = tk.Frame(stats_window, bg="#2c3e50")
+        controls.pack(pady=5)
+        tk.Button(controls, text="Export", font=button_font, bg="#4caf50", fg="white", command=export_stats).pack(side="left", padx=10)
+        tk.Button(controls, text="Reset", font=button_font, bg="#ff6347", fg="white", command=metrics.reset).pack(side="left", padx=10)
+        refresh_stats()
 
     # Stress Analysis Dashboard
     def show_stress_dashboard():
-        if not current_user:
-            messagebox.showwarning("No User", "Please log in to view the dashboard.")
+        global stress_dashboard, dashboard_loading
+        username = session_user("view the dashboard")
+        if not username:
+            return
+        # One dashboard at a time: bring the open one forward, or replace it after a user change
+        if stress_dashboard:
+            window = stress_dashboard.get_widget().winfo_toplevel()
+            if stress_dashboard.username == username:
+                window.lift()
+                return
+            stress_dashboard.close()
+            window.destroy()
+            stress_dashboard = None
+        if dashboard_loading:
             return
 
-        # Fetch stress level history for the current user
+        # The summary and a bounded window of recent history are fetched on a worker thread, not the Tk thread
+        dashboard_loading = True
+        threading.Thread(target=load_dashboard_data, args=(username,), daemon=True).start()
+
+    def load_dashboard_data(username):
         try:
-            history = list(collection.find({"user": current_user}, {"_id": 0, "timestamp": 1, "stress_level": 1}))
-            if not history:
-                messagebox.showinfo("No Data", "No stress level history found.")
-                return
+            repository = get_repository()
+            summary = repository.stress_summary(username, "day")
+            series = timeline_series(repository, username, summary) if summary else None
+            root.after(0, open_stress_dashboard, username, summary, series)
+        except Exception as e:
+            logging.error(f"Failed to fetch stress level history: {str(e)}")
+            root.after(0, dashboard_load_failed, f"Failed to fetch stress level history: {str(e)}")
+
+    def dashboard_load_failed(message):
+        global dashboard_loading
+        dashboard_loading = False
+        messagebox.showerror("Error", message)
+
+    def open_stress_dashboard(username, summary, series):
+        global stress_dashboard, dashboard_loading
+        dashboard_loading = False
+        if username != current_user:
+            return  # logged out or switched user while loading
+        if not summary:
+            messagebox.showinfo("No Data", "No stress level history found.")
+            return
 
-            # Prepare data for plotting
-            timestamps = [entry["timestamp"] for entry in history]
-            stress_levels = [entry["stress_level"] for entry in history]
+        # Create a new window for the dashboard
+        dashboard_window = tk.Toplevel(root)
+        dashboard_window.title(f"Stress Analysis Dashboard - {username}")
+        dashboard_window.geometry("800x600")
+        dashboard_window.configure(bg="#2c3e50")
 
-            # Create a new window for the dashboard
-            dashboard_window = tk.Toplevel(root)
-            dashboard_window.title(f"Stress Analysis Dashboard - {current_user}")
-            dashboard_window.geometry("800x600")
-            dashboard_window.configure(bg="#2c3e50")
+        dashboard = StressDashboard(master=dashboard_window)
+        dashboard.set_summary(summary, "day", username)
+        dashboard.set_history(*series)
+        stress_dashboard = dashboard
 
-            # Create a figure and plot the data
-            fig, ax = plt.subplots(figsize=(8, 6))
+        def change_period(period):
+            threading.Thread(target=load_summary, args=(period,), daemon=True).start()
 
-            # Set a font that supports emojis
-            plt.rcParams['font.family'] = 'Segoe UI Emoji'  # Use 'Noto Color Emoji' on non-Windows platforms
+        def load_summary(period):
+            try:
+                rows = get_repository().stress_summary(username, period)
+                root.after(0, apply_summary, rows, period)
+            except Exception as e:
+                logging.error(f"Failed to fetch stress summary: {str(e)}")
+                root.after(0, messagebox.showerror, "Error", f"Failed to fetch stress summary: {str(e)}")
 
-            ax.plot(timestamps, stress_levels, marker='o', linestyle='-', color='b')
-            ax.set_title(f"Stress Level Over Time - {current_user}")
-            ax.set_xlabel("Timestamp")
-            ax.set_ylabel("Stress Level")
-            ax.grid(True)
-            plt.xticks(rotation=45)
+        def apply_summary(rows, period):
+            if stress_dashboard is dashboard:
+                dashboard.set_summary(rows, period, username)
 
-            # Embed the plot in the Tkinter window
-            canvas = FigureCanvasTkAgg(fig, master=dashboard_window)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill="both", expand=True)
+        def close_dashboard():
+            global stress_dashboard
+            if stress_dashboard is dashboard:
+                stress_dashboard = None
+            dashboard.close()
+            dashboard_window.destroy()
 
-        except Exception as e:
-            logging.error(f"Failed to fetch stress level history: {str(e)}")
-            messagebox.showerror("Error", f"Failed to fetch stress level history: {str(e)}")
+        dashboard_window.protocol("WM_DELETE_WINDOW", close_dashboard)
+
+        # Period selector (daily, weekly or monthly buckets)
+        period_var = tk.StringVar(value="day")
+        period_menu = tk.OptionMenu(dashboard_window, period_var, *SUMMARY_PERIODS, command=change_period)
+        period_menu.config(font=label_font, bg="#34495e", fg="#ffffff")
+        period_menu.pack(pady=5)
+
+        # Embed the plot in the Tkinter window
+        dashboard.canvas.draw()
+        dashboard.get_widget().pack(fill="both", expand=True)
 
     # Daily Routine Input Section
     def enter_daily_routine():
@@ -265,13 +533,30 @@ def create_gui(root):
         save_button.pack(pady=10)
 
     # Login Section
+    # Both may look the account up in MongoDB, so they run on a worker thread, not the Tk thread
+    def set_account_buttons(state):
+        login_button.config(state=state)
+        signup_button.config(state=state)
+
     def login():
-        global current_user
-        username = username_entry.get()
-        password = password_entry.get()
+        set_account_buttons(tk.DISABLED)
+        threading.Thread(target=check_login, args=(username_entry.get(), password_entry.get()), daemon=True).start()
 
-        if authenticate_user(username, password):
-            current_user = username
+    def check_login(username, password):
+        try:
+            token = login_user(username, password)
+        except Exception as e:
+            logging.error(f"Login failed: {str(e)}")
+            token = None
+        root.after(0, login_finished, token)
+
+    def login_finished(token):
+        global current_user, session_token
+        set_account_buttons(tk.NORMAL)
+        if token:
+            session_token = token
+            current_user = authenticate_session(token)
+            password_entry.delete(0, tk.END)
             messagebox.showinfo("Login Success", "Login Successful!")
             login_frame.pack_forget()
             app_frame.pack(fill="both", expand=True)
@@ -280,10 +565,20 @@ def create_gui(root):
 
     # Signup Section
     def signup():
-        username = username_entry.get()
-        password = password_entry.get()
-        
-        if register_user(username, password):
+        set_account_buttons(tk.DISABLED)
+        threading.Thread(target=check_signup, args=(username_entry.get(), password_entry.get()), daemon=True).start()
+
+    def check_signup(username, password):
+        try:
+            created = register_user(username, password)
+        except Exception as e:
+            logging.error(f"Signup failed: {str(e)}")
+            created = False
+        root.after(0, signup_finished, created)
+
+    def signup_finished(created):
+        set_account_buttons(tk.NORMAL)
+        if created:
             messagebox.showinfo("Signup Success", "Account created successfully!")
         else:
             messagebox.showerror("Signup Error", "Username already exists.")
@@ -328,6 +623,12 @@ def create_gui(root):
     webcam_label = tk.Label(app_frame, bg="#2c3e50")
     webcam_label.pack(pady=20)
 
+    frame_stats_label = tk.Label(app_frame, text="", font=label_font, bg="#2c3e50", fg="#ffffff")
+    frame_stats_label.pack()
+
+    live_stats_label = tk.Label(app_frame, text="", font=label_font, bg="#2c3e50", fg="#ffffff")
+    live_stats_label.pack()
+
     button_frame = tk.Frame(app_frame, bg="#2c3e50")
     button_frame.pack(pady=10)
 
@@ -340,6 +641,12 @@ def create_gui(root):
     capture_button = tk.Button(button_frame, text="Capture Image", font=button_font, bg="#4caf50", fg="white", command=capture_image)
     capture_button.pack(side="left", padx=10)
 
+    live_button = tk.Button(button_frame, text="Live Analysis", font=button_font, bg="#4caf50", fg="white", command=toggle_live_analysis)
+    live_button.pack(side="left", padx=10)
+
+    multi_camera_button = tk.Button(button_frame, text="Multi-Camera", font=button_font, bg="#4caf50", fg="white", command=toggle_multi_camera)
+    multi_camera_button.pack(side="left", padx=10)
+
     enter_routine_button = tk.Button(button_frame, text="Enter Daily Routine", font=button_font, bg="#4caf50", fg="white", command=enter_daily_routine)
     enter_routine_button.pack(side="left", padx=10)
 
@@ -352,6 +659,9 @@ def create_gui(root):
     show_history_button = tk.Button(button_frame, text="Show History", font=button_font, bg="#4caf50", fg="white", command=show_history)
     show_history_button.pack(side="left", padx=10)
 
+    stats_button = tk.Button(button_frame, text="Performance Stats", font=button_font, bg="#4caf50", fg="white", command=show_stats)
+    stats_button.pack(side="left", padx=10)
+
     # Add borders for emotion, stress level, and recommendation
     result_frame = tk.Frame(app_frame, bg="#2c3e50")
     result_frame.pack(pady=20)
@@ -374,6 +684,12 @@ def create_gui(root):
     recommendation_label = tk.Label(recommendation_frame, text="Recommendation: ", font=label_font, bg="#34495e", fg="#ffffff")
     recommendation_label.pack(pady=10)
 
+    # Revoke the session token when the window is closed
+    root.protocol("WM_DELETE_WINDOW", close_app)
+
+    # Load the model, cascade and database connection once the login screen is visible
+    root.after_idle(warm_up_in_background)
+
 # Run the application
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,152 @@
+import tkinter as tk
+import threading
+import datetime
+import logging
+from database import get_repository, page_key, HISTORY_PAGE_SIZE
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+HISTORY_PROJECTION = {"timestamp": 1, "emotion": 1, "stress_level": 1, "recommendation": 1}
+
+# Format a Single History Entry
+def format_entry(entry):
+    """
+    Formats one history document as the block of text shown in the viewer.
+    """
+    timestamp = entry["timestamp"]
+    if isinstance(timestamp, datetime.datetime):
+        timestamp = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+    return (
+        f"Timestamp: {timestamp}\n"
+        + (f"Camera: {entry['camera']}\n" if entry.get("camera") else "")
+        + f"Emotion: {entry.get('emotion')}\n"
+        f"Stress Level: {entry.get('stress_level')}\n"
+        f"Recommendation: {entry.get('recommendation')}\n"
+        + "-" * 50 + "\n\n"
+    )
+
+# Virtualized, Paginated History Window
+class HistoryViewer(tk.Toplevel):
+    """
+    Shows a user's analysis history a page at a time. Pages are fetched on a
+    worker thread as the user scrolls towards either end, and at most
+    `max_pages` pages are kept in the text widget so memory stays flat no
+    matter how long the history is.
+    """
+
+    def __init__(self, master, username, font=None, page_size=HISTORY_PAGE_SIZE, max_pages=4):
+        super().__init__(master)
+        self.username = username
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.pages = []  # list of (first_key, last_key, line_counts) for the pages on screen
+        self.has_more_after = True
+        self.has_more_before = False
+        self.loading = False
+
+        self.title(f"Analysis History - {username}")
+        self.geometry("800x600")
+        self.configure(bg="#2c3e50")
+
+        self.scrollbar = tk.Scrollbar(self)
+        self.scrollbar.pack(side="right", fill="y")
+        self.text = tk.Text(self, font=font, bg="#34495e", fg="#ffffff", wrap="word", yscrollcommand=self.on_scroll)
+        self.text.pack(fill="both", expand=True, padx=10, pady=10)
+        self.scrollbar.config(command=self.text.yview)
+
+        self.text.insert("end", "Loading history...\n")
+        self.text.config(state="disabled")
+        self.fetch_page(after=None)
+
+    # Scroll Handling
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self.loading or not self.pages:
+            return
+        if float(last) > 0.9 and self.has_more_after:
+            self.fetch_page(after=self.pages[-1][1])
+        elif float(first) < 0.1 and self.has_more_before:
+            self.fetch_page(before=self.pages[0][0])
+
+    # Background Page Fetching
+    def fetch_page(self, after=None, before=None):
+        self.loading = True
+        threading.Thread(target=self._fetch_worker, args=(after, before), daemon=True).start()
+
+    def _fetch_worker(self, after, before):
+        try:
+            documents = get_repository().fetch_history_page(
+                self.username, page_size=self.page_size, after=after, before=before, projection=HISTORY_PROJECTION
+            )
+        except Exception as e:
+            logging.error(f"Failed to fetch history page: {str(e)}")
+            self._deliver(self.show_error, str(e))
+            return
+        self._deliver(self.apply_page, documents, before is not None, after is None and before is None)
+
+    def _deliver(self, callback, *args):
+        # Hands the result to the Tk thread; the window may have been closed while the page loaded
+        try:
+            self.after(0, callback, *args)
+        except (tk.TclError, RuntimeError) as e:
+            logging.debug(f"History window closed before its page arrived: {str(e)}")
+
+    # Rendering
+    def apply_page(self, documents, prepend, initial):
+        self.loading = False
+        if not self.winfo_exists():
+            return
+        self.text.config(state="normal")
+        if initial:
+            self.text.delete("1.0", "end")
+            if not documents:
+                self.text.insert("end", "No history found.\n")
+                self.has_more_after = False
+                self.text.config(state="disabled")
+                return
+
+        full_page = len(documents) == self.page_size
+        if not documents:
+            if prepend:
+                self.has_more_before = False
+            else:
+                self.has_more_after = False
+            self.text.config(state="disabled")
+            return
+
+        blocks = [format_entry(entry) for entry in documents]
+        line_counts = [block.count("\n") for block in blocks]
+        page = (page_key(documents[0]), page_key(documents[-1]), line_counts)
+        top_line = int(self.text.index("@0,0").split(".")[0])
+
+        if prepend:
+            self.text.insert("1.0", "".join(blocks))
+            self.pages.insert(0, page)
+            top_line += sum(line_counts)
+            self.has_more_before = full_page
+            if len(self.pages) > self.max_pages:
+                dropped = self.pages.pop()
+                self.text.delete(f"end-1c linestart -{sum(dropped[2])} lines", "end-1c")
+                self.has_more_after = True
+        else:
+            self.text.insert("end-1c", "".join(blocks))
+            self.pages.append(page)
+            self.has_more_after = full_page
+            if len(self.pages) > self.max_pages:
+                dropped = self.pages.pop(0)
+                removed = sum(dropped[2])
+                self.text.delete("1.0", f"{removed + 1}.0")
+                top_line = max(1, top_line - removed)
+                self.has_more_before = True
+
+        self.text.yview(f"{top_line}.0")
+        self.text.config(state="disabled")
+
+    def show_error(self, message):
+        self.loading = False
+        if not self.winfo_exists():
+            return
+        self.text.config(state="normal")
+        self.text.insert("end", f"Failed to fetch history: {message}\n")
+        self.text.config(state="disabled")
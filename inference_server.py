@@ -0,0 +1,370 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from emotion_model import (
+    EmotionBackend, load_backend, load_face_cascade, detect_faces, preprocess_faces, classify_predictions,
+)
+from stress_analysis import calculate_stress_level
+from metrics import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Server settings (overridable through environment variables). The address is
+# "host:port" for TCP or "unix:/path/to/socket" for a Unix domain socket.
+SERVER_ADDRESS = os.environ.get("INFERENCE_SERVER_ADDRESS", "127.0.0.1:8765")
+MAX_BATCH_SIZE = int(os.environ.get("INFERENCE_MAX_BATCH_SIZE", "32"))
+MAX_WAIT_MS = float(os.environ.get("INFERENCE_MAX_WAIT_MS", "5"))
+
+FACE_SHAPE = (48, 48, 1)
+
+# Wire format: 8-byte header (JSON length, payload length), JSON, raw payload bytes
+_PREFIX = struct.Struct(">II")
+
+def encode_message(header, payload=b""):
+    body = json.dumps(header).encode()
+    return _PREFIX.pack(len(body), len(payload)) + body + payload
+
+def decode_array(header, payload):
+    return np.frombuffer(payload, dtype=header["dtype"]).reshape(header["shape"])
+
+def validate_faces(faces):
+    """
+    Raises ValueError unless `faces` is a non-empty float32 (N, 48, 48, 1) batch.
+    """
+    if faces.dtype != np.float32 or faces.ndim != 4 or faces.shape[1:] != FACE_SHAPE or len(faces) == 0:
+        raise ValueError(f"Expected a float32 (N, 48, 48, 1) face batch, got {faces.dtype} {tuple(faces.shape)}")
+
+def array_header(array, **header):
+    return dict(header, dtype=str(array.dtype), shape=list(array.shape))
+
+def parse_address(address):
+    """
+    Returns ("unix", path) or ("tcp", (host, port)).
+    """
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+# Dynamic Micro-Batching
+class MicroBatcher:
+    """
+    Groups face batches from concurrent requests into one model call. The
+    first waiting request opens a window of at most `max_wait` seconds; the
+    window closes early once `max_batch_size` faces are collected. Model calls
+    run one at a time on a dedicated thread, so while one batch is on the CPU
+    the next one fills up. If a combined batch fails, its requests are retried
+    one by one so only the offending ones get the error.
+    """
+
+    def __init__(self, model, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT_MS / 1000):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = None
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="inference-model")
+        self.stats = {"batches": 0, "faces": 0, "requests": 0, "max_batch": 0}
+
+    async def submit(self, faces):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((faces, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        if self.queue is None:
+            self.queue = asyncio.Queue()
+        while True:
+            pending = []
+            try:
+                pending.append(await self.queue.get())
+                rows = len(pending[0][0])
+                deadline = loop.time() + self.max_wait
+                while rows < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    pending.append(item)
+                    rows += len(item[0])
+                await self._run_batch(loop, pending)
+            except Exception as e:
+                # Keep serving: one bad batch must not stop the loop every request waits on
+                logging.error(f"Micro-batching failed: {str(e)}")
+                self._fail(pending, e)
+
+    @staticmethod
+    def _fail(pending, error):
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(error)
+
+    async def _run_batch(self, loop, pending):
+        try:
+            batch = np.concatenate([faces for faces, _ in pending])
+            predictions = await loop.run_in_executor(self.executor, self.model.predict, batch)
+            if len(predictions) != len(batch):
+                raise ValueError(f"Model returned {len(predictions)} predictions for {len(batch)} faces")
+        except Exception as e:
+            if len(pending) > 1:
+                logging.warning(f"Batched inference failed, retrying {len(pending)} requests separately: {str(e)}")
+                for item in pending:
+                    await self._run_batch(loop, [item])
+                return
+            logging.error(f"Batched inference failed: {str(e)}")
+            self._fail(pending, e)
+            return
+        offset = 0
+        for faces, future in pending:
+            if not future.done():
+                future.set_result(np.asarray(predictions[offset:offset + len(faces)], dtype=np.float32))
+            offset += len(faces)
+        rows = len(batch)
+        self.stats["batches"] += 1
+        self.stats["faces"] += rows
+        self.stats["requests"] += len(pending)
+        self.stats["max_batch"] = max(self.stats["max_batch"], rows)
+        metrics.increment("server.batched_faces", rows)
+
+# Inference Server
+class InferenceServer:
+    """
+    asyncio server that shares one loaded model between all local clients.
+    "predict" requests carry preprocessed (N, 48, 48, 1) faces; "analyze"
+    requests carry a whole BGR frame (raw or JPEG) and run face detection,
+    preprocessing, inference and stress scoring server-side. Detection runs
+    on a thread pool (OpenCV releases the GIL), inference goes through the
+    MicroBatcher.
+    """
+
+    def __init__(self, model, address=SERVER_ADDRESS, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, detect_workers=None):
+        self.address = address
+        self.batcher = MicroBatcher(model, max_batch_size, max_wait_ms / 1000)
+        self.detect_executor = ThreadPoolExecutor(detect_workers or os.cpu_count(), thread_name_prefix="inference-detect")
+        self._cascades = threading.local()  # CascadeClassifier objects are not shared between threads
+        self.server = None
+
+    async def serve(self, ready=None):
+        self.batcher.queue = asyncio.Queue()  # exists before the first client can submit
+        kind, target = parse_address(self.address)
+        if kind == "unix":
+            if os.path.exists(target):
+                os.remove(target)
+            self.server = await asyncio.start_unix_server(self._handle_client, path=target)
+        else:
+            self.server = await asyncio.start_server(self._handle_client, host=target[0], port=target[1])
+        batcher = asyncio.ensure_future(self.batcher.run())
+        logging.info(f"Inference server listening on {self.address} (max batch {self.batcher.max_batch_size}, max wait {self.batcher.max_wait * 1000:.1f} ms).")
+        if ready is not None:
+            ready.set()
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            batcher.cancel()
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    prefix = await reader.readexactly(_PREFIX.size)
+                except asyncio.IncompleteReadError:
+                    break
+                header_size, payload_size = _PREFIX.unpack(prefix)
+                header = json.loads(await reader.readexactly(header_size))
+                payload = await reader.readexactly(payload_size)
+                try:
+                    response, response_payload = await self._dispatch(header, payload)
+                except Exception as e:
+                    logging.error(f"Inference request failed: {str(e)}")
+                    response, response_payload = {"error": str(e)}, b""
+                writer.write(encode_message(response, response_payload))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, header, payload):
+        op = header.get("op")
+        if op == "predict":
+            faces = decode_array(header, payload)
+            validate_faces(faces)
+            predictions = await self.batcher.submit(faces)
+            return array_header(predictions), predictions.tobytes()
+        if op == "analyze":
+            loop = asyncio.get_running_loop()
+            gray_frame, faces = await loop.run_in_executor(self.detect_executor, self._detect, header, payload)
+            if len(faces) == 0:
+                return {"faces": []}, b""
+            batch = await loop.run_in_executor(self.detect_executor, preprocess_faces, gray_frame, faces)
+            predictions = await self.batcher.submit(batch)
+            return {"faces": [self._describe(box, scores) for box, scores in zip(faces, predictions)]}, b""
+        if op == "stats":
+            stats = dict(self.batcher.stats)
+            stats["mean_batch"] = stats["faces"] / stats["batches"] if stats["batches"] else 0.0
+            return stats, b""
+        raise ValueError(f"Unknown operation: {op}")
+
+    def _detect(self, header, payload):
+        if header.get("encoding") == "jpeg":
+            frame = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+        else:
+            frame = decode_array(header, payload)
+        cascade = getattr(self._cascades, "cascade", None)
+        if cascade is None:
+            cascade = self._cascades.cascade = load_face_cascade()
+        faces, gray_frame = detect_faces(cascade, frame)
+        return gray_frame, faces
+
+    @staticmethod
+    def _describe(box, scores):
+        emotion, confidence = classify_predictions(scores)
+        return {
+            "box": [int(v) for v in box],
+            "emotion": emotion,
+            "confidence": float(confidence),
+            "stress_level": calculate_stress_level(emotion),
+            "probabilities": [float(p) for p in scores],
+        }
+
+def run_server(address=SERVER_ADDRESS, backend="keras", model_path="emotion_model.h5",
+               max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, ready=None):
+    """
+    Loads the model once and serves it until interrupted.
+    """
+    model = load_backend(backend, model_path)
+    model.predict(np.zeros((1, 48, 48, 1), dtype=np.float32))  # warm up before accepting clients
+    server = InferenceServer(model, address, max_batch_size, max_wait_ms)
+    try:
+        asyncio.run(server.serve(ready))
+    except KeyboardInterrupt:
+        logging.info("Inference server stopped.")
+
+# Blocking Client
+class InferenceClient:
+    """
+    Thread-safe client for InferenceServer. One connection is kept open and
+    requests on it are serialized; use one client per thread for parallel
+    requests. Reconnects once if the connection was dropped.
+    """
+
+    def __init__(self, address=SERVER_ADDRESS, timeout=10.0):
+        self.address = address
+        self.timeout = timeout
+        self.sock = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        kind, target = parse_address(self.address)
+        if kind == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(self.timeout)
+        sock.connect(target)
+        self.sock = sock
+
+    def _receive(self, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("Inference server closed the connection.")
+            data.extend(chunk)
+        return bytes(data)
+
+    def request(self, header, payload=b""):
+        message = encode_message(header, payload)
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self.sock is None:
+                        self._connect()
+                    self.sock.sendall(message)
+                    header_size, payload_size = _PREFIX.unpack(self._receive(_PREFIX.size))
+                    response = json.loads(self._receive(header_size))
+                    response_payload = self._receive(payload_size)
+                    break
+                except (ConnectionError, socket.timeout, OSError):
+                    self.close()
+                    if attempt:
+                        raise
+        if "error" in response:
+            raise Exception(f"Inference server error: {response['error']}")
+        return response, response_payload
+
+    def predict(self, faces):
+        faces = np.ascontiguousarray(faces, dtype=np.float32)
+        header, payload = self.request(array_header(faces, op="predict"), faces.tobytes())
+        return decode_array(header, payload)
+
+    def analyze(self, frame, jpeg_quality=None):
+        """
+        Sends a BGR frame for detection and analysis; returns a list of face
+        dicts (box, emotion, confidence, stress_level, probabilities). With
+        jpeg_quality the frame is JPEG-encoded first (less data, some CPU).
+        """
+        if jpeg_quality:
+            _, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+            return self.request({"op": "analyze", "encoding": "jpeg"}, encoded.tobytes())[0]["faces"]
+        frame = np.ascontiguousarray(frame)
+        return self.request(array_header(frame, op="analyze"), frame.tobytes())[0]["faces"]
+
+    def stats(self):
+        return self.request({"op": "stats"})[0]
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            finally:
+                self.sock = None
+
+# Backend That Forwards to the Server
+class RemoteBackend(EmotionBackend):
+    """
+    EmotionBackend that sends every batch to a running InferenceServer, so a
+    GUI process can analyze faces without loading TensorFlow or the model.
+    """
+    name = "remote"
+
+    def __init__(self, address=SERVER_ADDRESS):
+        self.client = InferenceClient(address)
+
+    @classmethod
+    def load(cls, address):
+        return cls(address)
+
+    @staticmethod
+    def import_runtime():
+        return None
+
+    def predict(self, batch):
+        return self.client.predict(batch)
+
+def main():
+    parser = argparse.ArgumentParser(description="Local inference server shared by GUI and batch clients.")
+    parser.add_argument("--address", default=SERVER_ADDRESS, help="host:port or unix:/path/to/socket.")
+    parser.add_argument("--backend", default="keras", help="Inference backend (keras, tflite or onnxruntime).")
+    parser.add_argument("--model", default="emotion_model.h5", help="Path to the emotion model.")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_SIZE, help="Largest micro-batch in faces.")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS, help="Longest a request waits for others to batch with.")
+    args = parser.parse_args()
+    run_server(args.address, args.backend, args.model, args.max_batch, args.max_wait_ms)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import threading
+import queue
+import time
+import logging
+from emotion_model import detect_faces_gray, preprocess_faces, predict_emotion_probabilities, classify_predictions
+from stress_analysis import calculate_stress_level
+from metrics import metrics
+from preprocessing import FaceBatchBuffer, to_gray
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Continuous Analysis of a Video Stream
+class LiveAnalyzer:
+    """
+    Producer/consumer pipeline for continuous analysis. A capture thread reads
+    frames from `source` (a FrameReader or anything with an OpenCV-style read())
+    into a bounded queue that drops stale frames, and a single inference worker analyzes the
+    newest frame at most `analysis_fps` times per second. Each result is passed
+    to `on_result`; GUI callers should marshal it onto the Tk thread with root.after.
+    With a FaceTracker, the cascade only runs every few analyzed frames, faces
+    keep stable IDs and each face's stress level uses its smoothed emotion.
+    With an EmotionAggregator, faces are smoothed over their softmax vectors
+    instead and each result carries the records the aggregator emitted.
+    With a QoSController, the detection resolution, cascade scale step and
+    analysis rate follow its current level, and frames it gates for lack of
+    motion are skipped without producing a result.
+    """
+
+    def __init__(self, source, emotion_model, face_cascade, on_result, analysis_fps=5.0, queue_size=1, tracker=None, aggregator=None, qos=None):
+        self.source = source
+        self.emotion_model = emotion_model
+        self.face_cascade = face_cascade
+        self.on_result = on_result
+        self.tracker = tracker
+        self.aggregator = aggregator
+        self.qos = qos
+        self.base_detection_scale = tracker.detection_scale if tracker else 1.0
+        self.face_buffer = FaceBatchBuffer()  # only touched by the inference thread
+        self.analysis_fps = analysis_fps
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.running = False
+        self.threads = []
+        self.stats = {
+            "frames_captured": 0,
+            "frames_dropped": 0,
+            "frames_analyzed": 0,
+            "frames_gated": 0,
+            "inference_fps": 0.0,
+            "latency_ms": 0.0,
+        }
+        self._stats_lock = threading.Lock()
+
+    def start(self):
+        self.running = True
+        self.threads = [
+            threading.Thread(target=self._capture_loop, name="live-capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="live-inference", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+        logging.info(f"Live analysis started at up to {self.analysis_fps} analyses/sec.")
+
+    def stop(self):
+        self.running = False
+        for thread in self.threads:
+            thread.join(timeout=2.0)
+        self.threads = []
+        logging.info(f"Live analysis stopped: {self.get_stats()}")
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        if self.qos:
+            stats["qos"] = self.qos.get_stats()
+        return stats
+
+    # Producer: keep only the newest frame in the queue
+    def _capture_loop(self):
+        while self.running:
+            ret, frame = self.source.read()
+            if not ret:
+                time.sleep(0.01)
+                continue
+            captured_at = time.perf_counter()
+            with self._stats_lock:
+                self.stats["frames_captured"] += 1
+            try:
+                self.frames.put_nowait((captured_at, frame))
+            except queue.Full:
+                try:
+                    self.frames.get_nowait()
+                    with self._stats_lock:
+                        self.stats["frames_dropped"] += 1
+                except queue.Empty:
+                    pass
+                self.frames.put_nowait((captured_at, frame))
+
+    # Consumer: analyze frames at the configured rate
+    def _inference_loop(self):
+        last_finished = None
+        while self.running:
+            analysis_fps = self.analysis_fps * (self.qos.settings["rate_scale"] if self.qos else 1.0)
+            interval = 1.0 / analysis_fps if analysis_fps > 0 else 0.0
+            started = time.perf_counter()
+            if last_finished is not None and started - last_finished < interval:
+                time.sleep(interval - (started - last_finished))
+            try:
+                captured_at, frame = self.frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                result = self.analyze_frame(frame)
+            except Exception as e:
+                logging.error(f"Error in live analysis: {e}")
+                continue
+            if result is None:
+                with self._stats_lock:
+                    self.stats["frames_gated"] += 1
+                continue
+            finished = time.perf_counter()
+            result["latency_ms"] = (finished - captured_at) * 1000
+            self._record(finished, last_finished, result["latency_ms"])
+            last_finished = finished
+            self.on_result(result)
+
+    def analyze_frame(self, frame):
+        """
+        Runs face detection, batched emotion prediction and stress scoring on
+        one BGR frame. Returns None when the QoS motion gate skips the frame.
+        """
+        started = time.perf_counter()
+        gray_frame = to_gray(frame)
+        settings = self.qos.settings if self.qos else None
+        if settings and self.qos.should_skip(gray_frame):
+            return None
+        if self.tracker:
+            if settings:
+                self.tracker.detection_scale = self.base_detection_scale * settings["detection_scale"]
+                self.tracker.scale_factor = settings["scale_factor"]
+            tracks = self.tracker.update(gray_frame)
+            faces = [track.box for track in tracks]
+        elif settings:
+            faces = detect_faces_gray(self.face_cascade, gray_frame, downscale=settings["detection_scale"], scale_factor=settings["scale_factor"])
+            tracks = [None] * len(faces)
+        else:
+            faces = detect_faces_gray(self.face_cascade, gray_frame)
+            tracks = [None] * len(faces)
+        detected = time.perf_counter()
+        results = []
+        records = []
+        if len(faces) > 0:
+            probabilities = predict_emotion_probabilities(self.emotion_model, preprocess_faces(gray_frame, faces, self.face_buffer))
+            inferred = time.perf_counter()
+            now = time.time()
+            for index, (box, track, scores) in enumerate(zip(faces, tracks, probabilities)):
+                emotion, confidence = classify_predictions(scores)
+                face = {
+                    "box": tuple(int(v) for v in box),
+                    "emotion": emotion,
+                    "confidence": float(confidence),
+                }
+                if track is not None:
+                    face["face_id"] = track.track_id
+                if self.aggregator:
+                    face_id = face.get("face_id", index)
+                    records.extend(self.aggregator.update(face_id, scores, now))
+                    face["emotion"], face["confidence"] = self.aggregator.current(face_id)
+                elif track is not None:
+                    track.add_emotion(emotion)
+                    face["emotion"] = track.smoothed_emotion()
+                face["stress_level"] = calculate_stress_level(face["emotion"])
+                results.append(face)
+        else:
+            inferred = detected
+            if self.aggregator:
+                records.extend(self.aggregator.expire(time.time()))
+        if self.qos:
+            self.qos.observe({"detect": detected - started, "inference": inferred - detected,
+                              "scoring": time.perf_counter() - inferred})
+        return {"faces": results, "records": records}
+
+    def _record(self, finished, last_finished, latency_ms):
+        # Exponential moving averages keep the reported numbers stable
+        with self._stats_lock:
+            self.stats["frames_analyzed"] += 1
+            if last_finished is not None:
+                fps = 1.0 / max(finished - last_finished, 1e-6)
+                self.stats["inference_fps"] = 0.9 * self.stats["inference_fps"] + 0.1 * fps if self.stats["inference_fps"] else fps
+            self.stats["latency_ms"] = 0.9 * self.stats["latency_ms"] + 0.1 * latency_ms if self.stats["latency_ms"] else latency_ms
+        metrics.observe("live.frame_latency", latency_ms / 1000)
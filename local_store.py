@@ -0,0 +1,456 @@
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from stress_analysis import STRESS_SCORES
+from database import SUMMARY_PERIODS, HISTORY_PAGE_SIZE, bucket_key
+from metrics import timed
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Local store settings (overridable through environment variables)
+LOCAL_DB_PATH = os.environ.get("LOCAL_DB_PATH", "stress_management.db")
+SYNC_INTERVAL = float(os.environ.get("SYNC_INTERVAL", "10"))
+SYNC_BATCH_SIZE = int(os.environ.get("SYNC_BATCH_SIZE", "500"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    mongo_id TEXT NOT NULL UNIQUE,
+    user TEXT,
+    timestamp TEXT NOT NULL,
+    emotion TEXT,
+    stress_level TEXT,
+    score REAL,
+    recommendation TEXT,
+    daily_routine TEXT,
+    day TEXT,
+    week TEXT,
+    month TEXT,
+    synced INTEGER NOT NULL DEFAULT 0,
+    camera TEXT,
+    frames INTEGER,
+    mean_score REAL,
+    window_start TEXT
+);
+CREATE INDEX IF NOT EXISTS history_user_timestamp ON analysis_history (user, timestamp, id);
+CREATE INDEX IF NOT EXISTS history_user_day ON analysis_history (user, day);
+CREATE INDEX IF NOT EXISTS history_user_week ON analysis_history (user, week);
+CREATE INDEX IF NOT EXISTS history_user_month ON analysis_history (user, month);
+CREATE INDEX IF NOT EXISTS history_unsynced ON analysis_history (synced) WHERE synced = 0;
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    synced INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'local'
+);
+CREATE TABLE IF NOT EXISTS pending_deletes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user TEXT NOT NULL
+);
+"""
+
+# users.status: "remote" accounts were fetched from or stored in MongoDB, "local"
+# ones were created on this machine and are not in MongoDB yet, and "conflict"
+# ones turned out to clash with a different MongoDB account of the same name
+USER_REMOTE = "remote"
+USER_LOCAL = "local"
+USER_CONFLICT = "conflict"
+
+# Fields only some entries carry: the camera tag of multi-camera entries and the
+# statistics of closed live smoothing windows
+OPTIONAL_COLUMNS = {"camera": "TEXT", "frames": "INTEGER", "mean_score": "REAL", "window_start": "TEXT"}
+HISTORY_COLUMNS = ("id", "mongo_id", "user", "timestamp", "emotion", "stress_level", "recommendation", "daily_routine", *OPTIONAL_COLUMNS)
+
+def _to_text(timestamp):
+    return timestamp.isoformat(sep=" ")
+
+def _to_document(row):
+    document = dict(zip(HISTORY_COLUMNS, row))
+    document["_id"] = document.pop("id")
+    document["timestamp"] = datetime.datetime.fromisoformat(document["timestamp"])
+    for column in OPTIONAL_COLUMNS:
+        if document[column] is None:
+            del document[column]  # e.g. single-camera entries carry no camera tag
+    if "window_start" in document:
+        document["window_start"] = datetime.datetime.fromisoformat(document["window_start"])
+    return document
+
+# Embedded SQLite Repository
+class SQLiteRepository:
+    """
+    Local, offline-capable implementation of the StressRepository interface
+    backed by SQLite in WAL mode. Every read is served from indexed local
+    tables; writes are marked unsynced and replicated to MongoDB by SyncWorker.
+    Each thread gets its own connection.
+    """
+
+    def __init__(self, path=LOCAL_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self.ensure_indexes()
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10.0)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @timed("local_db.ping")
+    def ping(self):
+        self.connection.execute("SELECT 1")
+
+    @timed("local_db.ensure_indexes")
+    def ensure_indexes(self):
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            # Databases created before multi-camera support or live window statistics lack those columns
+            columns = {row[1] for row in self.connection.execute("PRAGMA table_info(analysis_history)")}
+            for column, column_type in OPTIONAL_COLUMNS.items():
+                if column not in columns:
+                    self.connection.execute(f"ALTER TABLE analysis_history ADD COLUMN {column} {column_type}")
+
+    # Analysis History
+    @timed("local_db.insert_analysis")
+    def insert_analysis(self, entry):
+        self.insert_analyses([entry])
+
+    @timed("local_db.insert_analyses")
+    def insert_analyses(self, entries, synced=False):
+        rows = []
+        for entry in entries:
+            timestamp = entry.get("timestamp") or datetime.datetime.now()
+            level = entry.get("stress_level")
+            entry.setdefault("_id", ObjectId())
+            rows.append((
+                str(entry["_id"]), entry.get("user", entry.get("username")), _to_text(timestamp),
+                entry.get("emotion"), level, STRESS_SCORES.get(level),
+                entry.get("recommendation"), entry.get("daily_routine"),
+                *(bucket_key(timestamp, period) for period in ("day", "week", "month")),
+                int(synced), entry.get("camera"), entry.get("frames"), entry.get("mean_score"),
+                _to_text(entry["window_start"]) if entry.get("window_start") else None,
+            ))
+        with self.connection:
+            cursor = self.connection.executemany(
+                "INSERT OR IGNORE INTO analysis_history (mongo_id, user, timestamp, emotion, stress_level, score,"
+                " recommendation, daily_routine, day, week, month, synced, camera, frames, mean_score, window_start)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return cursor.rowcount
+
+    @timed("local_db.insert_user_data")
+    def insert_user_data(self, user_data):
+        self.insert_analysis(dict(user_data))
+
+    @timed("local_db.find_history")
+    def find_history(self, username, projection=None, start=None, end=None):
+        query = f"SELECT {', '.join(HISTORY_COLUMNS)} FROM analysis_history WHERE user = ?"
+        params = [username]
+        if start is not None:
+            query += " AND timestamp >= ?"
+            params.append(_to_text(start))
+        if end is not None:
+            query += " AND timestamp < ?"
+            params.append(_to_text(end))
+        query += " ORDER BY timestamp, id"
+        return (_to_document(row) for row in self.connection.execute(query, params))
+
+    @timed("local_db.fetch_history_page")
+    def fetch_history_page(self, username, page_size=HISTORY_PAGE_SIZE, after=None, before=None, projection=None):
+        query = f"SELECT {', '.join(HISTORY_COLUMNS)} FROM analysis_history WHERE user = ?"
+        params = [username]
+        if after is not None or before is not None:
+            timestamp, row_id = after if after is not None else before
+            query += " AND (timestamp, id) > (?, ?)" if after is not None else " AND (timestamp, id) < (?, ?)"
+            params += [_to_text(timestamp), row_id]
+        direction = "DESC" if before is not None else "ASC"
+        query += f" ORDER BY timestamp {direction}, id {direction} LIMIT ?"
+        params.append(page_size)
+        documents = [_to_document(row) for row in self.connection.execute(query, params)]
+        if projection is not None:
+            # Like the MongoDB query: the requested fields plus the page key
+            fields = {field for field, include in projection.items() if include} | {"_id", "timestamp"}
+            documents = [{field: value for field, value in document.items() if field in fields} for document in documents]
+        if before is not None:
+            documents.reverse()
+        return documents
+
+    @timed("local_db.clear_history")
+    def clear_history(self, username):
+        with self.connection:
+            deleted = self.connection.execute("DELETE FROM analysis_history WHERE user = ?", (username,)).rowcount
+            self.connection.execute("INSERT INTO pending_deletes (user) VALUES (?)", (username,))
+        return deleted
+
+    @timed("local_db.stress_summary")
+    def stress_summary(self, username, period="day"):
+        if period not in SUMMARY_PERIODS:
+            raise ValueError(f"Invalid period. Expected one of: {list(SUMMARY_PERIODS)}")
+        level_counts = ", ".join(f"SUM(stress_level = '{level}')" for level in STRESS_SCORES)
+        rows = self.connection.execute(
+            f"SELECT {period}, COUNT(*), AVG(score), {level_counts} FROM analysis_history"
+            f" WHERE user = ? GROUP BY {period} ORDER BY {period}",
+            (username,),
+        )
+        return [
+            {"bucket": row[0], "count": row[1], "mean_score": row[2] or 0.0,
+             **{level.lower(): row[3 + i] for i, level in enumerate(STRESS_SCORES)}}
+            for row in rows
+        ]
+
+    # Users
+    @timed("local_db.insert_user")
+    def insert_user(self, user, status=USER_LOCAL):
+        """
+        Stores a user. A new signup (status "local") first claims the name in
+        MongoDB when it is reachable, so a taken name is refused right away;
+        offline signups stay provisional until the sync worker can claim it.
+        """
+        if status == USER_LOCAL:
+            if self.connection.execute("SELECT 1 FROM users WHERE username = ?", (user["username"],)).fetchone():
+                raise DuplicateKeyError(f"Username {user['username']} already exists.")
+            if sync_worker and sync_worker.register_remote(user):
+                status = USER_REMOTE
+        try:
+            with self.connection:
+                self.connection.execute(
+                    "INSERT INTO users (username, password, synced, status) VALUES (?, ?, ?, ?)",
+                    (user["username"], user["password"], int(status == USER_REMOTE), status),
+                )
+        except sqlite3.IntegrityError:
+            raise DuplicateKeyError(f"Username {user['username']} already exists.")
+
+    @timed("local_db.find_user")
+    def find_user(self, username):
+        """
+        Returns the user with its status; authentication rejects "conflict" accounts.
+        """
+        row = self.connection.execute(
+            "SELECT username, password, status FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        if row:
+            return {"username": row[0], "password": row[1], "status": row[2]}
+        # Not known locally yet (e.g. first login on this machine): ask MongoDB if it is reachable
+        return sync_worker.fetch_user(username) if sync_worker else None
+
+    @timed("local_db.update_user_password")
+    def update_user_password(self, username, password_hash):
+        # Marked unsynced so the new hash is pushed to MongoDB
+        with self.connection:
+            self.connection.execute(
+                "UPDATE users SET password = ?, synced = 0 WHERE username = ?", (password_hash, username)
+            )
+
+# Background Replication to MongoDB
+class SyncWorker:
+    """
+    Periodically pushes local users, deletes and unsynced history rows to
+    MongoDB (history and deletes only for users already stored there), and
+    pulls the history of users first seen on this machine.
+    Failures (MongoDB down or slow) are logged and retried on the next cycle;
+    the local store keeps serving the app in the meantime. While the last
+    attempt failed (`online` is False), signups and logins do not probe
+    MongoDB, so they never wait out a server selection timeout.
+    """
+
+    def __init__(self, local, interval=SYNC_INTERVAL, batch_size=SYNC_BATCH_SIZE):
+        self.local = local
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pull_users = set()
+        self._stop = threading.Event()
+        self.thread = None
+        self.last_sync = None
+        self.online = None  # unknown until the first sync or remote lookup
+
+    def start(self):
+        self.thread = threading.Thread(target=self._loop, name="mongo-sync", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, final_sync=True):
+        self._stop.set()
+        if self.thread:
+            self.thread.join(timeout=self.interval + 5.0)
+            if self.thread.is_alive():
+                # Still inside sync_once(): a second sync now would push the same rows concurrently
+                logging.warning("MongoDB sync still running at shutdown; skipping the final sync.")
+                return
+            self.thread = None
+        if final_sync:
+            self.sync_once()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.sync_once()
+            self._stop.wait(self.interval)
+
+    def _remote(self):
+        from database import get_mongo_repository
+        return get_mongo_repository()
+
+    @timed("sync.sync_once")
+    def sync_once(self):
+        try:
+            remote = self._remote()
+            # Users first: a delete or history row is only pushed once its user is claimed in MongoDB
+            self._push_users(remote)
+            self._push_deletes(remote)
+            pushed = self._push_history(remote)
+            for username in list(self.pull_users):
+                self._pull_history(remote, username)
+                self.pull_users.discard(username)
+            self.last_sync = datetime.datetime.now()
+            self.online = True
+            if pushed:
+                logging.info(f"Synced {pushed} analysis results to MongoDB.")
+        except Exception as e:
+            self.online = False
+            logging.warning(f"MongoDB sync failed, will retry: {str(e)}")
+
+    def _push_deletes(self, remote):
+        connection = self.local.connection
+        rows = connection.execute(
+            "SELECT id, user FROM pending_deletes WHERE user NOT IN"
+            " (SELECT username FROM users WHERE status != ?) ORDER BY id", (USER_REMOTE,)
+        ).fetchall()
+        for delete_id, username in rows:
+            remote.clear_history(username)
+            with connection:
+                connection.execute("DELETE FROM pending_deletes WHERE id = ?", (delete_id,))
+
+    def _push_users(self, remote):
+        connection = self.local.connection
+        rows = connection.execute(
+            "SELECT username, password, status FROM users WHERE synced = 0 AND status != ?", (USER_CONFLICT,)
+        ).fetchall()
+        for username, password, status in rows:
+            if status == USER_REMOTE:
+                # A MongoDB account whose password was re-hashed after a verified login
+                remote.update_user_password(username, password)
+            else:
+                try:
+                    remote.insert_user({"username": username, "password": password})
+                    status = USER_REMOTE
+                except DuplicateKeyError:
+                    # Someone else registered this name in MongoDB: never overwrite their password
+                    logging.error(f"Local account {username} conflicts with an existing MongoDB account; it is disabled.")
+                    status = USER_CONFLICT
+            with connection:
+                connection.execute("UPDATE users SET synced = 1, status = ? WHERE username = ?", (status, username))
+
+    def _push_history(self, remote):
+        connection = self.local.connection
+        pushed = 0
+        while True:
+            # Rows of provisional or conflicting accounts wait until the name is ours in MongoDB
+            rows = connection.execute(
+                f"SELECT {', '.join(HISTORY_COLUMNS)} FROM analysis_history WHERE synced = 0"
+                " AND (user IS NULL OR user NOT IN (SELECT username FROM users WHERE status != ?))"
+                " ORDER BY id LIMIT ?",
+                (USER_REMOTE, self.batch_size),
+            ).fetchall()
+            if not rows:
+                return pushed
+            documents = []
+            for row in rows:
+                document = _to_document(row)
+                document.pop("_id")
+                document["_id"] = ObjectId(document.pop("mongo_id"))
+                documents.append(document)
+            # insert_analyses skips _ids that are already stored, so a retried batch is idempotent
+            remote.insert_analyses(documents)
+            with connection:
+                connection.executemany("UPDATE analysis_history SET synced = 1 WHERE id = ?", [(row[0],) for row in rows])
+            pushed += len(rows)
+
+    def _pull_history(self, remote, username):
+        documents = []
+        for document in remote.find_history(username):
+            if isinstance(document.get("timestamp"), datetime.datetime):
+                documents.append(document)
+            if len(documents) >= self.batch_size:
+                self.local.insert_analyses(documents, synced=True)
+                documents = []
+        if documents:
+            self.local.insert_analyses(documents, synced=True)
+
+    def register_remote(self, user):
+        """
+        Claims a new username in MongoDB. Returns True when stored, False when
+        MongoDB is unreachable (or was on the last attempt); raises
+        DuplicateKeyError when the name is taken.
+        """
+        if self.online is False:
+            return False
+        try:
+            self._remote().insert_user(dict(user))
+            self.online = True
+            return True
+        except DuplicateKeyError:
+            self.online = True
+            raise
+        except Exception as e:
+            self.online = False
+            logging.warning(f"MongoDB unavailable for signup, account {user['username']} stays local until synced: {str(e)}")
+            return False
+
+    def fetch_user(self, username):
+        """
+        Looks a user up in MongoDB, caches them locally and schedules a history pull.
+        Returns None when the user is unknown or MongoDB is unreachable (or
+        was on the last attempt).
+        """
+        if self.online is False:
+            return None
+        try:
+            user = self._remote().find_user(username)
+            self.online = True
+        except Exception as e:
+            self.online = False
+            logging.warning(f"MongoDB unavailable for login lookup: {str(e)}")
+            return None
+        if user:
+            try:
+                self.local.insert_user({"username": username, "password": user["password"]}, status=USER_REMOTE)
+            except DuplicateKeyError:
+                pass
+            self.pull_users.add(username)
+        return user
+
+# Shared Local Store and Sync Worker
+_local_repository = None
+sync_worker = None
+_lock = threading.Lock()
+
+def get_local_repository():
+    """
+    Returns the shared SQLiteRepository and starts its sync worker on first use.
+    """
+    global _local_repository, sync_worker
+    if _local_repository is None:
+        with _lock:
+            if _local_repository is None:
+                _local_repository = SQLiteRepository()
+                sync_worker = SyncWorker(_local_repository).start()
+                logging.info(f"Using local store at {LOCAL_DB_PATH} with background sync every {SYNC_INTERVAL:.0f}s.")
+    return _local_repository
+
+def shutdown_sync():
+    """
+    Stops the sync worker after one last sync attempt.
+    """
+    global sync_worker
+    with _lock:
+        if sync_worker is not None:
+            sync_worker.stop()
+            sync_worker = None
@@ -1,6 +1,11 @@
 import tkinter as tk
 import logging
-from gui import create_gui
+import os
+import gui
+from gui import create_gui, stop_live_analyzer, live_record_fields, analysis_entry
+from write_behind import shutdown_analysis_writer, get_analysis_writer
+from database import close_repository
+from metrics import metrics, profile_session
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -16,8 +21,22 @@ def main():
         # Create the GUI
         create_gui(root)
 
-        # Start the main loop
-        root.mainloop()
+        # Start the main loop (profiled with cProfile when STRESS_PROFILE is set)
+        with profile_session():
+            root.mainloop()
+
+        # Stop camera workers, then write any analysis results still buffered before exiting
+        if gui.multi_camera_analyzer:
+            gui.multi_camera_analyzer.stop()
+        # The window is gone, so the live session's last windows go straight to the writer
+        for record in stop_live_analyzer():
+            get_analysis_writer().submit(analysis_entry(record["emotion"], record["stress_level"], **live_record_fields(record)))
+        shutdown_analysis_writer()
+        close_repository()
+
+        # Optional metrics dump (.json, or .prom for Prometheus text)
+        if os.environ.get("STRESS_METRICS_PATH"):
+            metrics.dump(os.environ["STRESS_METRICS_PATH"])
     except Exception as e:
         logging.error(f"An error occurred: {str(e)}")
         raise
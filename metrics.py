@@ -0,0 +1,216 @@
+import bisect
+import cProfile
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Metrics can be switched off entirely (timers become no-ops)
+METRICS_ENABLED = os.environ.get("STRESS_METRICS", "1") != "0"
+# Set to a file path to profile the whole GUI session with cProfile
+PROFILE_PATH = os.environ.get("STRESS_PROFILE")
+
+# Histogram bucket upper bounds in seconds (50 us .. 10 s)
+DURATION_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Fixed-Bucket Duration Histogram
+class Histogram:
+    """
+    Counts observations into fixed buckets, so recording is O(log buckets) and
+    memory does not grow with the number of calls. Quantiles are estimated
+    from the bucket bounds.
+    """
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+
+    def summary(self):
+        with self._lock:
+            mean = self.total / self.count if self.count else 0.0
+            return {
+                "count": self.count,
+                "total_ms": self.total * 1000,
+                "mean_ms": mean * 1000,
+                "p50_ms": self.quantile(0.5) * 1000,
+                "p95_ms": self.quantile(0.95) * 1000,
+                "max_ms": self.max * 1000,
+            }
+
+# Named Timers and Counters
+class MetricsRegistry:
+    """
+    Holds one Histogram per timed operation and plain integer counters.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        return histogram
+
+    def observe(self, name, seconds):
+        if self.enabled:
+            self.histogram(name).observe(seconds)
+
+    def increment(self, name, value=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def timer(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(name).observe(time.perf_counter() - start)
+
+    def timed(self, name):
+        """
+        Decorator form of timer().
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.histogram(name).observe(time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+
+    def snapshot(self):
+        """
+        Returns {"timers": {name: summary}, "counters": {name: value}}.
+        """
+        return {
+            "timers": {name: histogram.summary() for name, histogram in sorted(self.histograms.items())},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    # Export Formats
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix="stress_app"):
+        """
+        Renders every histogram and counter in the Prometheus text exposition format.
+        """
+        lines = [
+            f"# HELP {prefix}_duration_seconds Time spent per operation.",
+            f"# TYPE {prefix}_duration_seconds histogram",
+        ]
+        for name, histogram in sorted(self.histograms.items()):
+            with histogram._lock:
+                counts, count, total = list(histogram.counts), histogram.count, histogram.total
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{prefix}_duration_seconds_bucket{{operation="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_duration_seconds_bucket{{operation="{name}",le="+Inf"}} {count}')
+            lines.append(f'{prefix}_duration_seconds_sum{{operation="{name}"}} {total}')
+            lines.append(f'{prefix}_duration_seconds_count{{operation="{name}"}} {count}')
+        if self.counters:
+            lines.append(f"# TYPE {prefix}_events_total counter")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f'{prefix}_events_total{{event="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """
+        Writes the metrics to `path`: Prometheus text for .prom/.txt, JSON otherwise.
+        """
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        logging.info(f"Wrote metrics to {path}.")
+        return path
+
+    def format_table(self):
+        """
+        Plain-text table of all timers, used by the in-app stats panel.
+        """
+        rows = [f"{'operation':<28}{'count':>8}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        for name, stats in self.snapshot()["timers"].items():
+            rows.append(f"{name:<28}{stats['count']:>8}{stats['mean_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['max_ms']:>10.2f}")
+        for name, value in self.counters.items():
+            rows.append(f"{name:<28}{value:>8}")
+        return "\n".join(rows)
+
+# Process-wide registry used by all modules
+metrics = MetricsRegistry()
+timer = metrics.timer
+timed = metrics.timed
+
+# Opt-in Session Profiling
+@contextmanager
+def profile_session(path=PROFILE_PATH):
+    """
+    Runs the enclosed block under cProfile and writes the stats to `path`
+    (open with `python -m pstats` or snakeviz). Does nothing when path is
+    empty. cProfile only sees the thread that enabled it (the Tk main loop);
+    to cover the capture, inference and writer threads, attach py-spy to the
+    running process instead (`py-spy record --pid <pid>`), where the threads
+    show up under their names.
+    """
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        logging.info(f"Wrote cProfile stats to {path}.")
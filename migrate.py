@@ -0,0 +1,185 @@
+import argparse
+import datetime
+import logging
+from pymongo import UpdateOne
+from database import get_mongo_repository, get_client, DATABASE_NAME
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+LEGACY_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Convert String Timestamps to Datetimes
+def migrate_timestamps(collection, batch_size=1000):
+    """
+    Rewrites legacy "%Y-%m-%d %H:%M:%S" string timestamps as real datetimes so
+    history can be sorted and range-queried through the (user, timestamp) index.
+    Returns (converted, unparseable): the number of documents converted and
+    the _ids of string timestamps that could not be parsed, which are left
+    unchanged and reported.
+    """
+    converted = 0
+    unparseable = []
+    operations = []
+    cursor = collection.find({"timestamp": {"$type": "string"}}, {"timestamp": 1})
+    for document in cursor:
+        try:
+            timestamp = datetime.datetime.strptime(document["timestamp"], LEGACY_TIMESTAMP_FORMAT)
+        except ValueError:
+            logging.warning(f"Skipping document {document['_id']} with unparseable timestamp: {document['timestamp']}")
+            unparseable.append(document["_id"])
+            continue
+        operations.append(UpdateOne({"_id": document["_id"]}, {"$set": {"timestamp": timestamp}}))
+        if len(operations) >= batch_size:
+            converted += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    if operations:
+        converted += collection.bulk_write(operations, ordered=False).modified_count
+    logging.info(f"Converted {converted} string timestamps to datetimes.")
+    if unparseable:
+        logging.warning(f"{len(unparseable)} documents kept unparseable string timestamps; fix or delete them before --timeseries.")
+    return converted, unparseable
+
+# Move History into a Time-Series Collection
+def convert_to_timeseries(db, name="analysis_history", batch_size=1000):
+    """
+    Moves the history collection aside as "<name>_backup", creates a MongoDB
+    time-series collection (timeField "timestamp", metaField "user") under
+    the original name and copies the documents into it. Time-series
+    collections cannot be renamed, so the collection is created in place
+    rather than built under a staging name and swapped in. If anything
+    fails, the new collection is dropped and the backup renamed back.
+    Documents without a date timestamp cannot be stored in a time-series
+    collection; they are counted, logged and stay in the backup. Stop the
+    app while this runs. Requires MongoDB 7.0+, which allows the synced_at
+    stamp (an update of a non-meta field). Time-series collections do not
+    enforce a unique _id, so StressRepository looks ids up before writing to
+    keep retried inserts from duplicating history; writers must go through
+    it. Returns {"copied", "skipped"}.
+    """
+    backup_name = f"{name}_backup"
+    if backup_name in db.list_collection_names():
+        raise Exception(f"{backup_name} already exists; drop or rename it before converting {name}.")
+    db[name].rename(backup_name)
+    backup = db[backup_name]
+    try:
+        db.create_collection(name, timeseries={"timeField": "timestamp", "metaField": "user", "granularity": "seconds"})
+        timeseries = db[name]
+        copied = 0
+        batch = []
+        for document in backup.find({"timestamp": {"$type": "date"}}):
+            batch.append(document)
+            if len(batch) >= batch_size:
+                timeseries.insert_many(batch, ordered=False)
+                copied += len(batch)
+                batch = []
+        if batch:
+            timeseries.insert_many(batch, ordered=False)
+            copied += len(batch)
+        timeseries.create_index([("user", 1), ("timestamp", 1), ("_id", 1)], name="user_timestamp")
+    except Exception as e:
+        logging.error(f"Time-series conversion of {name} failed, restoring the original collection: {str(e)}")
+        db.drop_collection(name)
+        backup.rename(name)
+        raise Exception(f"Time-series conversion of {name} failed: {str(e)}")
+    skipped = [document["_id"] for document in backup.find({"timestamp": {"$not": {"$type": "date"}}}, {"_id": 1})]
+    if skipped:
+        logging.warning(f"{len(skipped)} documents without a date timestamp were not copied and remain in {backup_name}: {skipped[:20]}")
+    logging.info(f"Converted {name} to a time-series collection with {copied} documents (backup kept as {backup_name}).")
+    return {"copied": copied, "skipped": len(skipped)}
+
+# Find and Remove Duplicate Usernames
+def find_duplicate_usernames(user_collection):
+    """
+    Returns {username: [_id, ...]} (oldest _id first) for every username
+    stored more than once, which would make the unique index fail to build.
+    """
+    pipeline = [
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": "$username", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    return {row["_id"]: row["ids"] for row in user_collection.aggregate(pipeline)}
+
+def dedupe_usernames(user_collection, duplicates):
+    """
+    Keeps the oldest account of each duplicated username and moves the
+    others to "<users>_duplicates", so none is lost. Returns the number moved.
+    """
+    archive = user_collection.database[f"{user_collection.name}_duplicates"]
+    moved = 0
+    for username, ids in duplicates.items():
+        extra = list(user_collection.find({"_id": {"$in": ids[1:]}}))
+        archive.insert_many(extra)
+        user_collection.delete_many({"_id": {"$in": ids[1:]}})
+        moved += len(extra)
+        logging.warning(f"Username {username} was stored {len(ids)} times; kept {ids[0]}, moved the rest to {archive.name}.")
+    return moved
+
+# Verify Queries Use the Indexes
+def explain_uses_index(cursor):
+    """
+    Returns True if the cursor's winning plan contains an index scan.
+    """
+    plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+    # Queries run by the slot-based engine (MongoDB 7.0+) nest the plan one level deeper
+    plan = plan.get("queryPlan", plan)
+    stages = []
+    while plan:
+        stages.append(plan.get("stage"))
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return "IXSCAN" in stages
+
+def verify_indexes(repository, username="__explain__"):
+    """
+    Runs explain() on the history, clear-history and login lookups and reports
+    whether each one is served by an index instead of a collection scan.
+    """
+    checks = {
+        "history": repository.find_history(username, {"_id": 0, "timestamp": 1, "stress_level": 1}),
+        "history_range": repository.find_history(username, start=datetime.datetime(2000, 1, 1), end=datetime.datetime.now()),
+        "clear_history": repository.collection.find({"user": username}),
+        "username_lookup": repository.user_collection.find({"username": username}),
+    }
+    results = {}
+    for name, cursor in checks.items():
+        results[name] = explain_uses_index(cursor)
+        logging.info(f"{name}: {'index scan' if results[name] else 'COLLECTION SCAN'}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate the stress_management schema to datetime timestamps and indexes.")
+    parser.add_argument("--timeseries", action="store_true",
+                        help="Also convert analysis_history to a time-series collection (MongoDB 7.0+). It does not enforce "
+                             "a unique _id: only write to it through StressRepository, which skips ids already stored.")
+    parser.add_argument("--rollups", action="store_true", help="Rebuild the stress_rollups dashboard summaries from history.")
+    parser.add_argument("--verify", action="store_true", help="Check with explain() that queries use the indexes.")
+    parser.add_argument("--dedupe-users", action="store_true", help="Keep the oldest account of duplicated usernames, archiving the rest.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Documents per bulk write.")
+    args = parser.parse_args()
+
+    repository = get_mongo_repository()
+    migrate_timestamps(repository.collection, batch_size=args.batch_size)
+    if args.timeseries:
+        convert_to_timeseries(get_client()[DATABASE_NAME], batch_size=args.batch_size)
+    # The unique username index cannot be built while duplicates exist
+    duplicates = find_duplicate_usernames(repository.user_collection)
+    if duplicates:
+        for username, ids in duplicates.items():
+            logging.warning(f"Duplicate username {username}: {len(ids)} accounts ({', '.join(str(i) for i in ids)})")
+        if not args.dedupe_users:
+            raise SystemExit(f"{len(duplicates)} usernames are duplicated; rerun with --dedupe-users to keep the oldest account of each.")
+        dedupe_usernames(repository.user_collection, duplicates)
+    repository.ensure_indexes()
+    logging.info("Indexes created on analysis_history(user, timestamp) and users(username, unique).")
+    if args.rollups:
+        repository.rebuild_rollups()
+        logging.info("Rebuilt stress_rollups from analysis_history.")
+
+    if args.verify:
+        results = verify_indexes(repository)
+        if not all(results.values()):
+            raise SystemExit("Some queries are not served by an index.")
+
+if __name__ == "__main__":
+    main()
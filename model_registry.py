@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+import logging
+import numpy as np
+from prediction_cache import with_prediction_cache
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Inference backend ("keras", "tflite", "onnxruntime" or "remote") and model path can be
+# overridden with the EMOTION_MODEL_BACKEND and EMOTION_MODEL_PATH environment variables.
+# "remote" makes this process a thin client of inference_server.py; its "path"
+# is the server address.
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL_PATHS = {
+    "keras": os.path.join(MODEL_DIR, "emotion_model.h5"),
+    "tflite": os.path.join(MODEL_DIR, "emotion_model.tflite"),
+    "onnxruntime": os.path.join(MODEL_DIR, "emotion_model.onnx"),
+    "remote": os.environ.get("INFERENCE_SERVER_ADDRESS", "127.0.0.1:8765"),
+}
+DEFAULT_MODEL_PATH = DEFAULT_MODEL_PATHS["keras"]
+model_backend = os.environ.get("EMOTION_MODEL_BACKEND", "keras")
+model_path = os.environ.get("EMOTION_MODEL_PATH", DEFAULT_MODEL_PATHS.get(model_backend, DEFAULT_MODEL_PATH))
+
+# Startup cost breakdown in seconds (import, model_load, cascade_load, warmup, db_connect)
+startup_timings = {}
+
+_lock = threading.RLock()
+_emotion_model = None
+_face_cascade = None
+_warmup_thread = None
+
+# Configure Model Path and Backend
+def set_model_path(path, backend=None):
+    """
+    Sets the emotion model path (and optionally the backend). Must be called
+    before the model is first loaded.
+    """
+    global model_path, model_backend
+    with _lock:
+        if _emotion_model is not None:
+            raise RuntimeError("Emotion model is already loaded; set the model path before first use.")
+        model_path = path
+        if backend is not None:
+            model_backend = backend
+
+# Resolve a Backend and Its Model Path
+def resolve_model(backend=None, path=None):
+    """
+    Returns (backend, model path) for worker processes that load their own
+    model. The backend defaults to the configured one; the path defaults to
+    the configured path for that backend and to the backend's default model
+    file for any other.
+    """
+    backend = backend or model_backend
+    if path is None:
+        path = model_path if backend == model_backend else DEFAULT_MODEL_PATHS.get(backend)
+    return backend, path
+
+# Lazy Accessor for the Emotion Model
+def get_emotion_model():
+    """
+    Returns the shared emotion model backend, loading it on first use. The
+    backend is wrapped in the prediction cache when PREDICTION_CACHE_SIZE > 0 (off by default).
+    """
+    global _emotion_model
+    if _emotion_model is None:
+        with _lock:
+            if _emotion_model is None:
+                import emotion_model
+                if model_backend == "remote":
+                    from inference_server import RemoteBackend
+                    _emotion_model = with_prediction_cache(RemoteBackend(model_path))
+                    return _emotion_model
+                if model_backend not in emotion_model.BACKENDS:
+                    raise ValueError(f"Invalid backend. Expected one of: {list(emotion_model.BACKENDS)}")
+                start = time.perf_counter()
+                emotion_model.BACKENDS[model_backend].import_runtime()  # timed separately from the model load
+                startup_timings["import"] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                backend = emotion_model.load_backend(model_backend, model_path)
+                startup_timings["model_load"] = time.perf_counter() - start
+
+                # With the cache enabled, near-identical crops from a still face reuse the last prediction
+                _emotion_model = with_prediction_cache(backend)
+    return _emotion_model
+
+# Prediction Cache Statistics
+def get_prediction_cache_stats():
+    """
+    Returns the prediction cache's hit/miss statistics, or None when the model
+    is not loaded yet or the cache is disabled. Never triggers a model load.
+    """
+    cache = getattr(_emotion_model, "cache", None)
+    return cache.get_stats() if cache is not None else None
+
+# Lazy Accessor for the Haar Cascade
+def get_face_cascade():
+    """
+    Returns the shared Haar Cascade classifier, loading it on first use.
+    """
+    global _face_cascade
+    if _face_cascade is None:
+        with _lock:
+            if _face_cascade is None:
+                from emotion_model import load_face_cascade
+                start = time.perf_counter()
+                _face_cascade = load_face_cascade()
+                startup_timings["cascade_load"] = time.perf_counter() - start
+    return _face_cascade
+
+# Lazy Accessor for the Database Repository
+def connect_database():
+    """
+    Creates the shared database repository and completes the server handshake.
+    """
+    from database import get_repository
+    start = time.perf_counter()
+    repository = get_repository()
+    repository.ping()
+    try:
+        repository.ensure_indexes()
+    except Exception as e:
+        logging.warning(f"Could not create database indexes (run migrate.py): {str(e)}")
+    startup_timings["db_connect"] = time.perf_counter() - start
+    return repository
+
+# Warm Up Models and Connections
+def warm_up():
+    """
+    Loads every shared resource and runs one dummy inference so the first real
+    analysis does not pay for graph tracing.
+    """
+    from emotion_model import predict_emotions_batch
+    try:
+        model = get_emotion_model()
+        get_face_cascade()
+        start = time.perf_counter()
+        predict_emotions_batch(model, np.zeros((1, 48, 48, 1), dtype=np.float32))
+        startup_timings["warmup"] = time.perf_counter() - start
+    except Exception as e:
+        logging.error(f"Background model warm-up failed: {str(e)}")
+    try:
+        connect_database()
+    except Exception as e:
+        logging.error(f"Background database warm-up failed: {str(e)}")
+    log_startup_timings()
+
+def warm_up_in_background():
+    """
+    Starts warm_up() on a daemon thread. Repeated calls reuse the running thread.
+    """
+    global _warmup_thread
+    with _lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=warm_up, name="model-warmup", daemon=True)
+            _warmup_thread.start()
+    return _warmup_thread
+
+# Startup Instrumentation
+def log_startup_timings():
+    """
+    Logs the startup cost breakdown collected so far.
+    """
+    breakdown = ", ".join(f"{name}={seconds * 1000:.1f} ms" for name, seconds in startup_timings.items())
+    logging.info(f"Startup timings: {breakdown}")
+    return dict(startup_timings)
@@ -0,0 +1,361 @@
+import argparse
+import datetime
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import logging
+import cv2
+from frame_reader import FrameReader
+from batch_analyze import init_worker, analyze_frame
+from metrics import metrics
+import model_registry
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Comma-separated camera sources: device indices, video files or stream URLs,
+# optionally named as name=source (e.g. "desk=0,door=rtsp://10.0.0.5/stream")
+CAMERA_SOURCES = os.environ.get("CAMERA_SOURCES", "0")
+CAMERA_ANALYSIS_FPS = float(os.environ.get("CAMERA_ANALYSIS_FPS", "5"))
+CAMERA_WORKER_START_TIMEOUT = float(os.environ.get("CAMERA_WORKER_START_TIMEOUT", "120"))  # seconds to load the model
+
+# Parse Camera Source Specifications
+def parse_sources(spec=CAMERA_SOURCES):
+    """
+    Turns "0,door=rtsp://host/stream,lobby.mp4" (or a list of such items) into
+    [(name, source)] pairs. Digits become device indices; unnamed sources are
+    called cam0, cam1, ...
+    """
+    items = spec.split(",") if isinstance(spec, str) else list(spec)
+    sources = []
+    for index, item in enumerate(item.strip() for item in items):
+        if not item:
+            continue
+        name, separator, source = item.partition("=")
+        if not separator or "://" in name:
+            name, source = f"cam{index}", item
+        sources.append((name, int(source) if source.isdigit() else source))
+    return sources
+
+# Paced Playback of Recorded Video
+class PacedCapture:
+    """
+    Wraps a VideoCapture on a video file so it delivers frames at the file's
+    own frame rate and loops at the end, standing in for a live camera or
+    RTSP stream in tests and benchmarks.
+    """
+
+    def __init__(self, path, loop=True):
+        self.path = path
+        self.capture = cv2.VideoCapture(path)
+        self.interval = 1.0 / (self.capture.get(cv2.CAP_PROP_FPS) or 30.0)
+        self.loop = loop
+        self.next_frame_at = time.perf_counter()
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def read(self):
+        delay = self.next_frame_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_frame_at = max(self.next_frame_at + self.interval, time.perf_counter() - self.interval)
+        ret, frame = self.capture.read()
+        if not ret and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.capture.read()
+        return ret, frame
+
+    def release(self):
+        self.capture.release()
+
+def open_source(source):
+    if isinstance(source, str) and os.path.isfile(source):
+        return PacedCapture(source)
+    return cv2.VideoCapture(source)
+
+# One Camera Stream
+class CameraStream:
+    """
+    A named source with its own reader thread, analysis rate limit and stats.
+    """
+
+    def __init__(self, name, source, analysis_fps=CAMERA_ANALYSIS_FPS, display_size=None):
+        self.name = name
+        self.source = source
+        self.analysis_fps = analysis_fps
+        self.capture = open_source(source)
+        self.reader = FrameReader(self.capture, display_size, name=f"frame-reader-{name}")
+        self.in_flight = False
+        self.next_due = 0.0
+        self.last_frame_id = 0
+        self.stats = {
+            "frames_skipped": 0,
+            "frames_analyzed": 0,
+            "faces": 0,
+            "errors": 0,
+            "latency_ms": 0.0,
+            "analysis_fps": 0.0,
+        }
+        self._last_finished = None
+
+    def start(self):
+        if not self.capture.isOpened():
+            raise Exception(f"Failed to open camera source {self.source!r} ({self.name})")
+        self.reader.start()
+        return self
+
+    def stop(self):
+        self.reader.stop()
+        self.capture.release()
+
+    def take_frame(self, now):
+        """
+        Returns the newest unseen frame if this stream is due and has no
+        frame in flight, else None. Frames passed over are counted as skipped.
+        """
+        if self.in_flight or now < self.next_due:
+            return None
+        frame_id, frame = self.reader.latest()
+        if frame is None or frame_id == self.last_frame_id:
+            return None
+        self.stats["frames_skipped"] += max(0, frame_id - self.last_frame_id - 1)
+        self.last_frame_id = frame_id
+        self.in_flight = True
+        self.next_due = now + (1.0 / self.analysis_fps if self.analysis_fps > 0 else 0.0)
+        return frame
+
+    def record(self, submitted_at, finished_at, faces=None):
+        self.in_flight = False
+        if faces is None:
+            self.stats["errors"] += 1
+            return
+        latency_ms = (finished_at - submitted_at) * 1000
+        self.stats["frames_analyzed"] += 1
+        self.stats["faces"] += len(faces)
+        self.stats["latency_ms"] = 0.9 * self.stats["latency_ms"] + 0.1 * latency_ms if self.stats["latency_ms"] else latency_ms
+        if self._last_finished is not None:
+            fps = 1.0 / max(finished_at - self._last_finished, 1e-6)
+            self.stats["analysis_fps"] = 0.9 * self.stats["analysis_fps"] + 0.1 * fps if self.stats["analysis_fps"] else fps
+        self._last_finished = finished_at
+        metrics.observe(f"camera.{self.name}.latency", latency_ms / 1000)
+
+# Worker Start-Up Handshake
+def init_camera_worker(backend, model_path, status):
+    """
+    Pool initializer that reports ("ready" | "error", pid, message) on
+    `status`, so a model that fails to load is reported instead of the pool
+    silently respawning workers that fail the same way.
+    """
+    try:
+        init_worker(backend, model_path)
+    except Exception as e:
+        status.put(("error", os.getpid(), f"{type(e).__name__}: {e}"))
+        raise
+    status.put(("ready", os.getpid(), None))
+
+# Fair Scheduling Across Cameras
+class MultiCameraAnalyzer:
+    """
+    Feeds frames from every CameraStream into one shared process pool (one
+    model per worker process, sized to the CPU count rather than the number of
+    cameras). A scheduler thread visits the streams round-robin, starting one
+    position further each pass, and submits at most one frame per stream at a
+    time and at most `max_in_flight` frames overall, so a fast or busy camera
+    cannot starve the others. Each result is passed to
+    on_result(camera_name, faces, captured_at).
+
+    The backend and model path default to model_registry's. start() blocks
+    until every worker has loaded the model and raises if one fails; a
+    worker that fails after a later respawn stops the analyzer and sets
+    `error`.
+    """
+
+    def __init__(self, sources, on_result, workers=None, analysis_fps=CAMERA_ANALYSIS_FPS,
+                 backend=None, model_path=None, max_in_flight=None, display_size=None,
+                 start_timeout=CAMERA_WORKER_START_TIMEOUT):
+        self.streams = [CameraStream(name, source, analysis_fps, display_size) for name, source in sources]
+        self.on_result = on_result
+        self.workers = workers or os.cpu_count()
+        self.max_in_flight = max_in_flight or self.workers * 2
+        self.backend, self.model_path = model_registry.resolve_model(backend, model_path)
+        self.start_timeout = start_timeout
+        self.pool = None
+        self.status = None
+        self.error = None
+        self.running = False
+        self.thread = None
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._next_stream = 0
+
+    def start(self):
+        self.status = multiprocessing.Queue()
+        self.pool = multiprocessing.Pool(self.workers, initializer=init_camera_worker,
+                                         initargs=(self.backend, self.model_path, self.status))
+        try:
+            self._await_workers()
+            for stream in self.streams:
+                stream.start()
+        except Exception:
+            self._close_pool()
+            for stream in self.streams:
+                stream.stop()
+            raise
+        self.running = True
+        self.thread = threading.Thread(target=self._schedule_loop, name="camera-scheduler", daemon=True)
+        self.thread.start()
+        logging.info(f"Analyzing {len(self.streams)} camera(s) with {self.workers} worker processes.")
+        return self
+
+    def stop(self):
+        self.running = False
+        self._wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        self._close_pool()
+        for stream in self.streams:
+            stream.stop()
+        logging.info(f"Multi-camera analysis stopped: {self.get_stats()}")
+
+    def _close_pool(self):
+        if self.pool:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def _await_workers(self):
+        ready = 0
+        deadline = time.monotonic() + self.start_timeout
+        while ready < self.workers:
+            try:
+                kind, pid, message = self.status.get(timeout=max(deadline - time.monotonic(), 0.0))
+            except queue.Empty:
+                raise Exception(f"Camera workers did not load the {self.backend} model within {self.start_timeout:.0f}s ({ready}/{self.workers} ready)")
+            if kind == "error":
+                logging.error(f"Camera worker {pid} failed to load the {self.backend} model from {self.model_path}: {message}")
+                raise Exception(f"Camera worker failed to load the {self.backend} model from {self.model_path}: {message}")
+            ready += 1
+
+    def _check_workers(self):
+        # Respawned workers (after a crash) report through the same queue
+        while True:
+            try:
+                kind, pid, message = self.status.get_nowait()
+            except queue.Empty:
+                return
+            if kind == "error":
+                self.error = f"Camera worker {pid} failed to load the {self.backend} model: {message}"
+                logging.error(f"{self.error}; stopping multi-camera analysis.")
+                self.running = False
+                return
+
+    def get_stats(self):
+        stats = {}
+        for stream in self.streams:
+            stats[stream.name] = dict(stream.stats, frames_captured=stream.reader.frame_id)
+        return stats
+
+    def _schedule_loop(self):
+        while self.running:
+            self._check_workers()
+            submitted = False
+            now = time.perf_counter()
+            count = len(self.streams)
+            for offset in range(count):
+                if self._in_flight >= self.max_in_flight:
+                    break
+                stream = self.streams[(self._next_stream + offset) % count]
+                frame = stream.take_frame(now)
+                if frame is not None:
+                    self._submit(stream, frame, now)
+                    submitted = True
+            self._next_stream = (self._next_stream + 1) % max(count, 1)
+            if not submitted:
+                # Woken early when a result frees a slot
+                self._wakeup.wait(0.005)
+                self._wakeup.clear()
+
+    def _submit(self, stream, frame, now):
+        with self._in_flight_lock:
+            self._in_flight += 1
+        captured_at = time.time()
+
+        def done(faces):
+            self._finish(stream, now, faces, captured_at)
+
+        def failed(error):
+            logging.error(f"Analysis failed for camera {stream.name}: {error}")
+            self._finish(stream, now, None, captured_at)
+
+        self.pool.apply_async(analyze_frame, (frame,), callback=done, error_callback=failed)
+
+    def _finish(self, stream, submitted_at, faces, captured_at):
+        # Runs on the pool's result thread
+        stream.record(submitted_at, time.perf_counter(), faces)
+        with self._in_flight_lock:
+            self._in_flight -= 1
+        self._wakeup.set()
+        if faces is not None:
+            try:
+                self.on_result(stream.name, faces, captured_at)
+            except Exception as e:
+                logging.error(f"Result handler failed for camera {stream.name}: {e}")
+
+def to_history_entry(camera, face, username, captured_at, daily_routine=""):
+    """
+    Builds an analysis_history document tagged with the camera it came from.
+    """
+    from stress_analysis import get_recommendation
+    return {
+        "timestamp": datetime.datetime.fromtimestamp(captured_at),
+        "emotion": face["emotion"],
+        "stress_level": face["stress_level"],
+        "user": username,
+        "recommendation": get_recommendation(face["stress_level"]),
+        "daily_routine": daily_routine,
+        "camera": camera,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze several cameras or streams with a shared worker pool.")
+    parser.add_argument("sources", nargs="*", help="Device indices, video files or stream URLs (name=source to name them). Defaults to CAMERA_SOURCES.")
+    parser.add_argument("--fps", type=float, default=CAMERA_ANALYSIS_FPS, help="Analysis rate limit per camera.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--backend", default=None, help="Inference backend (keras, tflite or onnxruntime; default EMOTION_MODEL_BACKEND).")
+    parser.add_argument("--model", default=None, help="Path to the emotion model (default EMOTION_MODEL_PATH or the backend's bundled model).")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run.")
+    parser.add_argument("--insert-user", help="Store results in analysis_history for this user, tagged by camera.")
+    args = parser.parse_args()
+
+    writer = None
+    if args.insert_user:
+        from write_behind import get_analysis_writer, shutdown_analysis_writer
+        writer = get_analysis_writer()
+
+    def on_result(camera, faces, captured_at):
+        if writer:
+            for face in faces:
+                writer.submit(to_history_entry(camera, face, args.insert_user, captured_at))
+
+    analyzer = MultiCameraAnalyzer(parse_sources(args.sources or CAMERA_SOURCES), on_result, args.workers,
+                                   args.fps, args.backend, args.model)
+    analyzer.start()
+    try:
+        time.sleep(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        analyzer.stop()
+        if args.insert_user:
+            shutdown_analysis_writer()
+    for name, stats in analyzer.get_stats().items():
+        print(f"{name}: {stats['frames_analyzed']} analyzed ({stats['analysis_fps']:.1f}/s), "
+              f"{stats['frames_skipped']} skipped, {stats['faces']} faces, {stats['latency_ms']:.0f} ms latency")
+
+if __name__ == "__main__":
+    main()
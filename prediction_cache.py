@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+import cv2
+import numpy as np
+from emotion_model import EmotionBackend, as_backend
+from metrics import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Cache settings (overridable through environment variables). The shared model is
+# only wrapped when PREDICTION_CACHE_SIZE > 0: entries carry no face identity, so a
+# loose tolerance can hand one face's scores to another. Measure the label agreement
+# with `benchmark.py cache` on a recording before enabling it or raising the tolerance.
+CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "0"))
+CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", "2.0"))
+CACHE_TOLERANCE = int(os.environ.get("PREDICTION_CACHE_TOLERANCE", "0"))
+
+HASH_SIZE = 16  # 16x16 difference hash = 256-bit fingerprint
+
+# Perceptual Fingerprint of a Preprocessed Crop
+def crop_fingerprint(face, hash_size=HASH_SIZE):
+    """
+    Difference hash of a preprocessed (48, 48[, 1]) face: the crop is shrunk
+    to (hash_size + 1) x hash_size and each bit records whether a pixel is
+    brighter than its right-hand neighbour. Returns the bits as a Python int.
+    Small shifts, noise and global brightness changes flip few or no bits.
+    """
+    crop = np.asarray(face, dtype=np.float32).reshape(face.shape[0], face.shape[1])
+    small = cv2.resize(crop, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = np.packbits(small[:, 1:] > small[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big")
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+# LRU + TTL Cache of Softmax Predictions
+class PredictionCache:
+    """
+    Maps crop fingerprints to softmax vectors. Holds at most `max_size`
+    entries (least recently used are evicted first); entries older than
+    `ttl` seconds are treated as misses so a changing expression is picked up.
+    A lookup matches any entry within `tolerance` differing hash bits; with
+    tolerance 0 only identical fingerprints match (O(1)), otherwise the
+    entries are scanned (O(max_size) integer XORs, still far cheaper than a
+    forward pass).
+    """
+
+    def __init__(self, max_size=256, ttl=CACHE_TTL, tolerance=CACHE_TOLERANCE):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.tolerance = tolerance
+        self.entries = OrderedDict()  # fingerprint -> (probabilities, stored_at)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def get(self, fingerprint, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            key = self._find(fingerprint, now)
+            if key is None:
+                self.stats["misses"] += 1
+                metrics.increment("prediction_cache.miss")
+                return None
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            metrics.increment("prediction_cache.hit")
+            return self.entries[key][0]
+
+    def _find(self, fingerprint, now):
+        entry = self.entries.get(fingerprint)
+        if entry is not None:
+            key = fingerprint
+        elif self.tolerance > 0:
+            key = min(self.entries, key=lambda other: hamming_distance(fingerprint, other), default=None)
+            if key is None or hamming_distance(fingerprint, key) > self.tolerance:
+                return None
+            entry = self.entries[key]
+        else:
+            return None
+        if now - entry[1] > self.ttl:
+            del self.entries[key]
+            self.stats["expired"] += 1
+            return None
+        return key
+
+    def put(self, fingerprint, probabilities, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.entries[fingerprint] = (probabilities, now)
+            self.entries.move_to_end(fingerprint)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self.entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+# Backend Wrapper That Consults the Cache
+class CachedBackend(EmotionBackend):
+    """
+    Wraps another backend so every predict() path (predict_emotion,
+    predict_emotions_batch, predict_emotion_probabilities) goes through the
+    cache. Only the crops that miss are sent to the model, as one batch.
+    `clock` supplies the time used for TTL checks (e.g. a video's own clock
+    when replaying a recording).
+    """
+
+    def __init__(self, backend, cache=None, clock=time.monotonic):
+        self.backend = as_backend(backend)
+        self.cache = cache or PredictionCache()
+        self.clock = clock
+        self.name = self.backend.name
+
+    @staticmethod
+    def import_runtime():
+        # The wrapped backend imported its runtime when it was loaded
+        return None
+
+    def predict(self, batch):
+        now = self.clock()
+        fingerprints = [crop_fingerprint(face) for face in batch]
+        cached = [self.cache.get(fingerprint, now) for fingerprint in fingerprints]
+        missing = [i for i, probabilities in enumerate(cached) if probabilities is None]
+        if missing:
+            predictions = np.asarray(self.backend.predict(np.ascontiguousarray(batch[missing])))
+            for i, probabilities in zip(missing, predictions):
+                # Copy: the backend may reuse its output buffer on the next call
+                cached[i] = probabilities.copy()
+                self.cache.put(fingerprints[i], cached[i], now)
+        return np.stack(cached)
+
+def with_prediction_cache(backend, max_size=CACHE_SIZE, ttl=CACHE_TTL, tolerance=CACHE_TOLERANCE):
+    """
+    Returns `backend` wrapped in a CachedBackend, or unchanged when max_size is 0.
+    """
+    if max_size <= 0:
+        return backend
+    return CachedBackend(backend, PredictionCache(max_size, ttl, tolerance))
@@ -0,0 +1,73 @@
+import logging
+import cv2
+import numpy as np
+from metrics import timed
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+FACE_SIZE = 48
+_COLOR_CONVERSIONS = {"bgr": cv2.COLOR_BGR2GRAY, "rgb": cv2.COLOR_RGB2GRAY, "bgra": cv2.COLOR_BGRA2GRAY}
+
+# Convert a Frame to Grayscale Once
+def to_gray(frame, color_order="bgr", dst=None):
+    """
+    Returns the frame as a single-channel uint8 image. Frames that are already
+    grayscale are returned as-is. `color_order` must match how the frame was
+    produced ("bgr" for OpenCV capture, "rgb" for PIL/Tk images). With `dst`
+    (a preallocated uint8 array of the frame's height and width) the result is
+    written into it instead of a new array.
+    """
+    if frame.ndim == 2:
+        return frame
+    if color_order not in _COLOR_CONVERSIONS:
+        raise ValueError(f"Invalid color order. Expected one of: {list(_COLOR_CONVERSIONS)}")
+    if dst is not None and dst.shape != frame.shape[:2]:
+        dst = None
+    return cv2.cvtColor(frame, _COLOR_CONVERSIONS[color_order], dst=dst)
+
+# Reusable Face Batch Buffer
+class FaceBatchBuffer:
+    """
+    Preallocated float32 (capacity, 48, 48, 1) model input plus a uint8
+    staging area of the same shape. fill() resizes each crop straight into
+    the staging area with cv2.resize(dst=...), then casts the batch into the
+    float buffer and scales it to [0, 1] in place, so steady-state
+    preprocessing allocates no arrays. Capacity doubles when a frame has more
+    faces than fit.
+
+    fill() returns a view into the buffer that is overwritten by the next
+    call; use one buffer per thread and finish with the batch (run inference)
+    before filling it again.
+    """
+
+    def __init__(self, capacity=8):
+        self.capacity = 0
+        self.staging = None
+        self.batch = None
+        self._reserve(capacity)
+
+    def _reserve(self, count):
+        if count <= self.capacity:
+            return
+        capacity = max(count, self.capacity * 2, 1)
+        self.staging = np.empty((capacity, FACE_SIZE, FACE_SIZE), dtype=np.uint8)
+        self.batch = np.empty((capacity, FACE_SIZE, FACE_SIZE, 1), dtype=np.float32)
+        self.capacity = capacity
+
+    @timed("preprocess")
+    def fill(self, gray_frame, faces):
+        """
+        Crops every (x, y, w, h) box from a grayscale frame and returns the
+        preprocessed (N, 48, 48, 1) float32 batch as a view into the buffer.
+        """
+        count = len(faces)
+        self._reserve(count)
+        for i, (x, y, w, h) in enumerate(faces):
+            # Crops are views of the frame; only the 48x48 result is written
+            cv2.resize(gray_frame[y:y+h, x:x+w], (FACE_SIZE, FACE_SIZE), dst=self.staging[i], interpolation=cv2.INTER_LINEAR)
+        batch = self.batch[:count]
+        # Cast, then scale in place: a mixed-dtype multiply would allocate ufunc cast buffers
+        np.copyto(batch, self.staging[:count, :, :, np.newaxis])
+        np.multiply(batch, np.float32(1.0 / 255.0), out=batch)
+        return batch
@@ -0,0 +1,199 @@
+import math
+import os
+import threading
+import time
+import logging
+from collections import deque
+import cv2
+import numpy as np
+from metrics import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# QoS settings (overridable through environment variables)
+QOS_TARGET_MS = float(os.environ.get("QOS_TARGET_MS", "150"))  # processing budget per analyzed frame
+QOS_CPU_HIGH = float(os.environ.get("QOS_CPU_HIGH", "0.85"))
+QOS_CPU_LOW = float(os.environ.get("QOS_CPU_LOW", "0.6"))
+QOS_MOTION_THRESHOLD = float(os.environ.get("QOS_MOTION_THRESHOLD", "2.0"))  # mean absolute difference, 0-255
+
+# Degradation levels, cheapest last. detection_scale multiplies the caller's
+# own detection resolution and rate_scale its analysis rate.
+QOS_LEVELS = (
+    {"name": "full", "detection_scale": 1.0, "scale_factor": 1.1, "rate_scale": 1.0, "motion_gate": False},
+    {"name": "low-resolution", "detection_scale": 0.5, "scale_factor": 1.1, "rate_scale": 1.0, "motion_gate": False},
+    {"name": "coarse-scales", "detection_scale": 0.5, "scale_factor": 1.25, "rate_scale": 1.0, "motion_gate": False},
+    {"name": "low-rate", "detection_scale": 0.5, "scale_factor": 1.25, "rate_scale": 0.5, "motion_gate": False},
+    {"name": "motion-gated", "detection_scale": 0.4, "scale_factor": 1.3, "rate_scale": 0.4, "motion_gate": True},
+)
+
+# System-Wide CPU Load
+class CpuSampler:
+    """
+    Returns the fraction of CPU time spent busy since the previous call, from
+    /proc/stat on Linux. Elsewhere it falls back to the 1-minute load average
+    divided by the CPU count, or None when neither is available.
+    """
+
+    def __init__(self):
+        self.previous = self._read_proc_stat()
+
+    @staticmethod
+    def _read_proc_stat():
+        try:
+            with open("/proc/stat") as f:
+                values = [int(v) for v in f.readline().split()[1:]]
+        except (OSError, ValueError):
+            return None
+        idle = values[3] + (values[4] if len(values) > 4 else 0)  # idle + iowait
+        return sum(values), idle
+
+    def __call__(self):
+        current = self._read_proc_stat()
+        if current is None or self.previous is None:
+            try:
+                return min(1.0, os.getloadavg()[0] / (os.cpu_count() or 1))
+            except (AttributeError, OSError):
+                return None
+        total, idle = current[0] - self.previous[0], current[1] - self.previous[1]
+        if total <= 0:
+            return None
+        self.previous = current
+        return 1.0 - idle / total
+
+# Load-Adaptive Quality of Service
+class QoSController:
+    """
+    Watches per-frame stage timings and CPU load and picks a degradation
+    level from QOS_LEVELS. Timings are averaged with a time constant of
+    `smoothing` seconds rather than per sample, so the average still tracks
+    the load when few frames are analyzed. When it exceeds `target_ms`
+    or CPU load exceeds `cpu_high`, it steps one level down (at most once per
+    `cooldown` seconds, so each step can take effect before the next). It
+    steps back up only after `recover_after` seconds with frame time under
+    `recover_ratio` * target and CPU under `cpu_low`, so it does not flap
+    between two levels. At levels with motion_gate, frames whose
+    difference from the last analyzed frame falls below `motion_threshold`
+    are skipped, except that one frame is still analyzed every
+    `max_gate_seconds`.
+
+    Thread-safe; observe() and should_skip() are called from the analysis
+    thread while get_stats() may be called from the UI.
+    """
+
+    def __init__(self, levels=QOS_LEVELS, target_ms=QOS_TARGET_MS, cpu_high=QOS_CPU_HIGH, cpu_low=QOS_CPU_LOW,
+                 motion_threshold=QOS_MOTION_THRESHOLD, cooldown=1.0, recover_after=5.0, recover_ratio=0.6,
+                 max_gate_seconds=2.0, smoothing=1.0, cpu_sampler=None, clock=time.monotonic):
+        self.levels = levels
+        self.target_ms = target_ms
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.motion_threshold = motion_threshold
+        self.cooldown = cooldown
+        self.recover_after = recover_after
+        self.recover_ratio = recover_ratio
+        self.max_gate_seconds = max_gate_seconds
+        self.smoothing = smoothing
+        self.cpu_sampler = cpu_sampler or CpuSampler()
+        self.clock = clock
+        self.level = 0
+        self.frame_ms = 0.0
+        self.cpu = None
+        self.stage_ms = {}
+        self.decisions = deque(maxlen=20)
+        self.frames_gated = 0
+        self._last_change = clock()
+        self._last_observed = None
+        self._headroom_since = None
+        self._reference = None  # thumbnail of the last analyzed frame
+        self._last_analyzed = None
+        self._lock = threading.Lock()
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def observe(self, stage_seconds):
+        """
+        Records one analyzed frame's stage durations ({"detect": s, ...}) and
+        re-evaluates the level. Returns the current level's settings.
+        """
+        total_ms = sum(stage_seconds.values()) * 1000
+        with self._lock:
+            now = self.clock()
+            # Weight of the new sample grows with the time since the previous one
+            alpha = 1.0 if self._last_observed is None else 1.0 - math.exp(-(now - self._last_observed) / self.smoothing)
+            self._last_observed = now
+            self.frame_ms += alpha * (total_ms - self.frame_ms)
+            for stage, seconds in stage_seconds.items():
+                previous = self.stage_ms.get(stage, seconds * 1000)
+                self.stage_ms[stage] = previous + alpha * (seconds * 1000 - previous)
+            self.cpu = self.cpu_sampler()
+            self._evaluate(now)
+            return self.settings
+
+    def _evaluate(self, now):
+        cpu = self.cpu if self.cpu is not None else 0.0
+        if self.frame_ms > self.target_ms or cpu > self.cpu_high:
+            self._headroom_since = None
+            if self.level < len(self.levels) - 1 and now - self._last_change >= self.cooldown:
+                reason = f"frame {self.frame_ms:.0f} ms > {self.target_ms:.0f} ms" if self.frame_ms > self.target_ms else f"cpu {cpu:.0%} > {self.cpu_high:.0%}"
+                self._change(self.level + 1, reason, now)
+        elif self.frame_ms < self.target_ms * self.recover_ratio and cpu < self.cpu_low:
+            if self._headroom_since is None:
+                self._headroom_since = now
+            if self.level > 0 and now - self._headroom_since >= self.recover_after and now - self._last_change >= self.cooldown:
+                self._change(self.level - 1, f"headroom: frame {self.frame_ms:.0f} ms, cpu {cpu:.0%}", now)
+                self._headroom_since = now
+        else:
+            self._headroom_since = None
+
+    def _change(self, level, reason, now):
+        direction = "degrade" if level > self.level else "recover"
+        self.decisions.append({
+            "time": time.time(),
+            "from": self.levels[self.level]["name"],
+            "to": self.levels[level]["name"],
+            "reason": reason,
+        })
+        logging.info(f"QoS {direction}: {self.levels[self.level]['name']} -> {self.levels[level]['name']} ({reason})")
+        metrics.increment(f"qos.{direction}")
+        self.level = level
+        self._last_change = now
+        if not self.levels[level]["motion_gate"]:
+            self._reference = None
+
+    def should_skip(self, gray_frame):
+        """
+        Motion gate: True when the current level gates on motion and the
+        frame barely differs from the last analyzed one. Compares 64x48
+        thumbnails, so the check costs far less than detection.
+        """
+        with self._lock:
+            if not self.settings["motion_gate"]:
+                return False
+            thumbnail = cv2.resize(gray_frame, (64, 48), interpolation=cv2.INTER_AREA)
+            now = self.clock()
+            stale = self._last_analyzed is None or now - self._last_analyzed >= self.max_gate_seconds
+            if self._reference is not None and not stale:
+                energy = float(np.mean(cv2.absdiff(thumbnail, self._reference)))
+                if energy < self.motion_threshold:
+                    self.frames_gated += 1
+                    metrics.increment("qos.frames_gated")
+                    return True
+            self._reference = thumbnail
+            self._last_analyzed = now
+            return False
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "level": self.level,
+                "level_name": self.settings["name"],
+                "frame_ms": self.frame_ms,
+                "target_ms": self.target_ms,
+                "cpu": self.cpu,
+                "stage_ms": dict(self.stage_ms),
+                "frames_gated": self.frames_gated,
+                "decisions": list(self.decisions),
+            }
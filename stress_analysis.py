@@ -1,26 +1,37 @@
 import logging
+import numpy as np
+from metrics import timed
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# Emotions in model output order, and the stress level each one maps to
+EMOTIONS = ("Angry", "Disgust", "Fear", "Happy", "Sad", "Surprise", "Neutral")
+EMOTION_STRESS_LEVELS = {
+    "Angry": "HIGH", "Disgust": "LOW", "Fear": "HIGH", "Happy": "LOW",
+    "Sad": "HIGH", "Surprise": "LOW", "Neutral": "MEDIUM",
+}
+
+# Numeric score per stress level, used for averages on the dashboard
+STRESS_SCORES = {"LOW": 0, "MEDIUM": 1, "HIGH": 2}
+STRESS_LEVELS = tuple(STRESS_SCORES)  # level id -> level name
+
+# Routine codes produced by tokenize_routine
+ROUTINE_NONE = 0  # no routine, or one that does not change the emotion-based level
+ROUTINE_HIGH = 1  # work without exercise
+ROUTINE_LOW = 2   # exercise or sleep
+
 # Calculate Stress Level Based on Emotion and Daily Routine
+@timed("stress_scoring")
 def calculate_stress_level(emotion, daily_routine=None):
     """
     Calculates the stress level based on the detected emotion and optional daily routine.
     """
     # Validate emotion input
-    valid_emotions = ["Angry", "Disgust", "Fear", "Happy", "Sad", "Surprise", "Neutral"]
-    if emotion not in valid_emotions:
+    stress_level = EMOTION_STRESS_LEVELS.get(emotion)
+    if stress_level is None:
         logging.error(f"Invalid emotion: {emotion}")
-        raise ValueError(f"Invalid emotion. Expected one of: {valid_emotions}")
-
-    # Emotion-based stress level
-    if emotion in ["Angry", "Fear", "Sad"]:
-        stress_level = "HIGH"
-    elif emotion in ["Neutral"]:
-        stress_level = "MEDIUM"
-    else:
-        stress_level = "LOW"
+        raise ValueError(f"Invalid emotion. Expected one of: {list(EMOTIONS)}")
 
     # Adjust stress level based on daily routine (if provided)
     if daily_routine:
@@ -28,40 +39,103 @@ def calculate_stress_level(emotion, daily_routine=None):
             logging.error("Daily routine must be a string.")
             raise ValueError("Daily routine must be a string.")
 
-        if "work" in daily_routine.lower() and "exercise" not in daily_routine.lower():
+        routine = tokenize_routine(daily_routine)
+        if routine == ROUTINE_HIGH:
             stress_level = "HIGH"
-        elif "exercise" in daily_routine.lower() or "sleep" in daily_routine.lower():
+        elif routine == ROUTINE_LOW:
             stress_level = "LOW"
 
-    logging.info(f"Calculated stress level: {stress_level}")
+    logging.debug("Calculated stress level: %s", stress_level)
     return stress_level
 
+# Tokenize a Daily Routine Once
+def tokenize_routine(daily_routine):
+    """
+    Reduces a free-text daily routine to one of the ROUTINE_* codes so it can
+    be scored many times without re-parsing.
+    """
+    if not daily_routine:
+        return ROUTINE_NONE
+    routine = daily_routine.lower()
+    has_exercise = "exercise" in routine
+    if "work" in routine and not has_exercise:
+        return ROUTINE_HIGH
+    if has_exercise or "sleep" in routine:
+        return ROUTINE_LOW
+    return ROUTINE_NONE
+
+# Lookup tables for score_batch
+_EMOTION_LEVEL_IDS = np.array([STRESS_LEVELS.index(EMOTION_STRESS_LEVELS[e]) for e in EMOTIONS], dtype=np.int8)
+_EMOTION_LEVEL_MATRIX = np.eye(len(STRESS_LEVELS), dtype=np.float32)[_EMOTION_LEVEL_IDS]  # (7, 3) one-hot
+_LEVEL_SCORES = np.array([STRESS_SCORES[level] for level in STRESS_LEVELS], dtype=np.float32)
+_ROUTINE_OVERRIDES = np.array([-1, STRESS_LEVELS.index("HIGH"), STRESS_LEVELS.index("LOW")], dtype=np.int8)
+
+# Score Many Predictions at Once
+@timed("stress_scoring_batch")
+def score_batch(emotions, routines=None):
+    """
+    Vectorized stress scoring. `emotions` is either an (N,) array of emotion
+    indices (EMOTIONS order) or an (N, 7) array of softmax probabilities; with
+    probabilities the level is the one with the most probability mass and the
+    numeric score is the probability-weighted mean. `routines` is an optional
+    (N,) array of ROUTINE_* codes (see tokenize_routine), or a single code for
+    all rows. Returns (level_ids, scores): level ids index STRESS_LEVELS and
+    RECOMMENDATIONS, scores are floats on the STRESS_SCORES scale.
+    """
+    emotions = np.asarray(emotions)
+    if emotions.ndim == 2:
+        level_mass = emotions.astype(np.float32, copy=False) @ _EMOTION_LEVEL_MATRIX
+        level_ids = np.argmax(level_mass, axis=1).astype(np.int8)
+        scores = level_mass @ _LEVEL_SCORES
+    else:
+        level_ids = _EMOTION_LEVEL_IDS[emotions]
+        scores = _LEVEL_SCORES[level_ids]
+
+    if routines is not None:
+        overrides = _ROUTINE_OVERRIDES[np.asarray(routines)]
+        overridden = overrides >= 0
+        if np.ndim(overridden) == 0:
+            overrides = np.full(len(level_ids), overrides, dtype=np.int8)
+            overridden = np.full(len(level_ids), bool(overridden))
+        level_ids = np.where(overridden, overrides, level_ids)
+        scores = np.where(overridden, _LEVEL_SCORES[overrides.clip(0)], scores)
+    return level_ids, scores
+
+# Recommendations, built once and looked up by stress level
+RECOMMENDATIONS = {
+    "HIGH": (
+        "1. Try deep breathing exercises or take a short walk.\n"
+        "2. Practice mindfulness or meditation for 10-15 minutes.\n"
+        "3. Take regular breaks during work to relax your mind.\n"
+        "4. Consider talking to a friend or counselor about your stress."
+    ),
+    "MEDIUM": (
+        "1. Listen to calming music or nature sounds.\n"
+        "2. Ensure you're getting enough sleep (7-8 hours per night).\n"
+        "3. Engage in light physical activity like yoga or stretching.\n"
+        "4. Maintain a balanced diet and stay hydrated."
+    ),
+    "LOW": (
+        "1. Keep up the good work! Stay consistent with your exercise and sleep routines.\n"
+        "2. Practice gratitude by writing down things you're thankful for.\n"
+        "3. Engage in hobbies or activities that bring you joy.\n"
+        "4. Help others or volunteer to boost your mood."
+    ),
+}
+RECOMMENDATIONS_BY_ID = tuple(RECOMMENDATIONS[level] for level in STRESS_LEVELS)
+
 # Get Recommendation Based on Stress Level
 def get_recommendation(stress_level):
     """
     Provides a recommendation based on the calculated stress level.
     """
-    if stress_level == "HIGH":
-        recommendation = (
-            "1. Try deep breathing exercises or take a short walk.\n"
-            "2. Practice mindfulness or meditation for 10-15 minutes.\n"
-            "3. Take regular breaks during work to relax your mind.\n"
-            "4. Consider talking to a friend or counselor about your stress."
-        )
-    elif stress_level == "MEDIUM":
-        recommendation = (
-            "1. Listen to calming music or nature sounds.\n"
-            "2. Ensure you're getting enough sleep (7-8 hours per night).\n"
-            "3. Engage in light physical activity like yoga or stretching.\n"
-            "4. Maintain a balanced diet and stay hydrated."
-        )
-    else:
-        recommendation = (
-            "1. Keep up the good work! Stay consistent with your exercise and sleep routines.\n"
-            "2. Practice gratitude by writing down things you're thankful for.\n"
-            "3. Engage in hobbies or activities that bring you joy.\n"
-            "4. Help others or volunteer to boost your mood."
-        )
+    # Anything other than HIGH or MEDIUM gets the LOW recommendation
+    recommendation = RECOMMENDATIONS.get(stress_level, RECOMMENDATIONS["LOW"])
+    logging.debug("Recommendation for stress level %s: %s", stress_level, recommendation)
+    return recommendation
 
-    logging.info(f"Recommendation for stress level {stress_level}: {recommendation}")
-    return recommendation
\ No newline at end of file
+def get_recommendation_by_id(level_id):
+    """
+    Returns the interned recommendation for a level id from score_batch.
+    """
+    return RECOMMENDATIONS_BY_ID[level_id]
@@ -0,0 +1,55 @@
+import json
+import pytest
+from benchmark import measure, compare_timing, benchmark_environment
+
+@pytest.fixture(scope="session")
+def benchmark_report(request):
+    """
+    Collects every benchmark's timing and writes them, with the environment,
+    to --benchmark-json at the end of the session.
+    """
+    results = {}
+    yield results
+    path = request.config.getoption("--benchmark-json")
+    if path and results:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"environment": benchmark_environment(), "results": results}, f, indent=2)
+
+@pytest.fixture(scope="session")
+def benchmark_baseline(request):
+    path = request.config.getoption("--benchmark-compare")
+    if not path:
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+@pytest.fixture
+def benchmark(request, benchmark_report, benchmark_baseline):
+    """
+    benchmark(name, func, repeats=None, warmup=3) times func over
+    --benchmark-rounds rounds, records the result and, against a baseline,
+    fails the test when the slowdown exceeds the noise-aware threshold.
+    """
+    config = request.config
+
+    def run(name, func, repeats=None, warmup=3):
+        timing = measure(func, repeats or config.getoption("--benchmark-repeats"), warmup,
+                         config.getoption("--benchmark-rounds"))
+        benchmark_report[name] = timing
+        previous = (benchmark_baseline or {}).get(name)
+        if previous is not None:
+            change, threshold = compare_timing(previous, timing, config.getoption("--benchmark-max-regression"))
+            if change > threshold:
+                pytest.fail(f"{name} regressed {change:+.1%} (limit {threshold:+.0%}): "
+                            f"{previous['median_ms']:.3f} -> {timing['median_ms']:.3f} ms median")
+        return timing
+
+    return run
+
+@pytest.fixture(scope="session")
+def emotion_backend(request):
+    from emotion_model import load_backend
+    try:
+        return load_backend(request.config.getoption("--benchmark-backend"), request.config.getoption("--benchmark-model"))
+    except Exception as e:
+        pytest.skip(f"emotion model unavailable: {e}")
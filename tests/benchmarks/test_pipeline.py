@@ -0,0 +1,104 @@
+import datetime
+import cv2
+import mongomock
+import numpy as np
+import pytest
+import database
+from benchmark import PIPELINE_RESOLUTIONS, synthetic_frames, load_face_frames
+from emotion_model import load_face_cascade, detect_faces, preprocess_face, preprocess_faces, predict_emotion, predict_emotions_batch
+from stress_analysis import calculate_stress_level, get_recommendation
+
+pytestmark = pytest.mark.benchmark
+
+# Detection -> Preprocessing -> Inference -> Scoring
+@pytest.fixture(scope="module")
+def face_cascade():
+    return load_face_cascade()
+
+@pytest.mark.parametrize("resolution", PIPELINE_RESOLUTIONS, ids=lambda r: f"{r[0]}x{r[1]}")
+def test_detect_faces(benchmark, face_cascade, resolution):
+    frames = synthetic_frames(resolution)
+    index = iter(range(10 ** 9))
+    benchmark(f"detect_faces[{resolution[0]}x{resolution[1]}]", lambda: detect_faces(face_cascade, frames[next(index) % len(frames)]))
+
+def test_detect_faces_recorded(benchmark, face_cascade, request):
+    samples = request.config.getoption("--benchmark-samples")
+    if not samples:
+        pytest.skip("no --benchmark-samples directory")
+    frames = load_face_frames(samples)
+    index = iter(range(10 ** 9))
+    benchmark("detect_faces[recorded]", lambda: detect_faces(face_cascade, frames[next(index) % len(frames)]))
+
+@pytest.fixture(scope="module")
+def gray_frame():
+    return cv2.cvtColor(synthetic_frames((640, 480))[0], cv2.COLOR_BGR2GRAY)
+
+def test_preprocess_face(benchmark, gray_frame, request):
+    crop = gray_frame[100:220, 200:320]
+    benchmark("preprocess_face", lambda: preprocess_face(crop), request.config.getoption("--benchmark-repeats") * 10)
+
+def test_preprocess_faces(benchmark, gray_frame, request):
+    boxes = [(x, 100, 120, 120) for x in range(0, 480, 60)]
+    benchmark("preprocess_faces[8]", lambda: preprocess_faces(gray_frame, boxes), request.config.getoption("--benchmark-repeats") * 10)
+
+def test_predict_emotion(benchmark, emotion_backend):
+    single = np.random.default_rng(0).random((1, 48, 48, 1), dtype=np.float32)
+    benchmark("predict_emotion", lambda: predict_emotion(emotion_backend, single))
+
+@pytest.mark.parametrize("batch_size", (8, 32))
+def test_predict_emotions_batch(benchmark, emotion_backend, batch_size):
+    batch = np.random.default_rng(0).random((batch_size, 48, 48, 1), dtype=np.float32)
+    benchmark(f"predict_emotions_batch[{batch_size}]", lambda: predict_emotions_batch(emotion_backend, batch))
+
+def test_stress_scoring(benchmark):
+    labels = [("Happy", "Sad", "Neutral", "Angry")[i % 4] for i in range(1000)]
+    benchmark("calculate_stress_level+get_recommendation[1000]",
+              lambda: [get_recommendation(calculate_stress_level(label, "work")) for label in labels])
+
+# Storage
+USERNAME = "benchmark"
+DB_ROWS = 5000
+
+@pytest.fixture(scope="module")
+def repository(request):
+    if request.config.getoption("--benchmark-mongodb"):
+        database.configure_client()
+    else:
+        database.configure_client(client=mongomock.MongoClient())
+    repository = database.get_mongo_repository()
+    repository.ensure_indexes()
+    repository.clear_history(USERNAME)
+    start = datetime.datetime(2024, 1, 1)
+    levels = ("LOW", "MEDIUM", "HIGH")
+    repository.insert_analyses([{
+        "user": USERNAME,
+        "timestamp": start + datetime.timedelta(minutes=7 * i),
+        "emotion": "Neutral",
+        "stress_level": levels[i % 3],
+        "recommendation": "",
+        "daily_routine": "",
+    } for i in range(DB_ROWS)])
+    yield repository
+    repository.clear_history(USERNAME)
+    repository.clear_history(f"{USERNAME}-bulk")
+    database.configure_client(client=None)
+
+def test_db_save_result(benchmark, repository):
+    entry = {"user": f"{USERNAME}-bulk", "timestamp": datetime.datetime(2024, 6, 1), "emotion": "Happy",
+             "stress_level": "LOW", "recommendation": "", "daily_routine": ""}
+    benchmark("db.save_result", lambda: repository.insert_analysis(dict(entry)))
+
+def test_db_insert_analyses(benchmark, repository):
+    entries = [{"user": f"{USERNAME}-bulk", "timestamp": datetime.datetime(2024, 6, 1) + datetime.timedelta(seconds=i),
+                "emotion": "Happy", "stress_level": "LOW"} for i in range(100)]
+    benchmark("db.insert_analyses[100]", lambda: repository.insert_analyses([dict(entry) for entry in entries]), 5, 1)
+
+def test_db_history_page(benchmark, repository):
+    benchmark("db.history_page", lambda: repository.fetch_history_page(USERNAME, page_size=50))
+
+def test_db_history_full(benchmark, repository, request):
+    benchmark("db.history_full", lambda: list(repository.find_history(USERNAME, {"_id": 0, "timestamp": 1, "stress_level": 1})),
+              max(3, request.config.getoption("--benchmark-repeats") // 4))
+
+def test_db_dashboard_summary(benchmark, repository):
+    benchmark("db.dashboard_summary", lambda: repository.stress_summary(USERNAME, "day"))
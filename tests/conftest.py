@@ -0,0 +1,73 @@
+import types
+import pytest
+import mongomock
+import credentials
+import database
+import local_store
+import model_registry
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks", "pipeline benchmarks (tests/benchmarks)")
+    group.addoption("--benchmarks", action="store_true", help="Run the benchmarks instead of skipping them.")
+    group.addoption("--benchmark-json", help="Write the benchmark report to this JSON file.")
+    group.addoption("--benchmark-compare", help="Baseline report to compare against; regressions fail their test.")
+    group.addoption("--benchmark-max-regression", type=float, default=0.2, help="Smallest slowdown that fails (0.2 = 20%%).")
+    group.addoption("--benchmark-rounds", type=int, default=5, help="Timed rounds per benchmark.")
+    group.addoption("--benchmark-repeats", type=int, default=20, help="Timed calls per round.")
+    group.addoption("--benchmark-model", default=model_registry.DEFAULT_MODEL_PATH, help="Emotion model for the inference benchmarks.")
+    group.addoption("--benchmark-backend", default="keras", help="Backend for the inference benchmarks.")
+    group.addoption("--benchmark-samples", help="Directory of recorded face images to also detect on.")
+    group.addoption("--benchmark-mongodb", action="store_true", help="Time queries against MONGO_URI instead of mongomock.")
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmarks"):
+        return
+    skip = pytest.mark.skip(reason="benchmarks run with --benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+@pytest.fixture(autouse=True)
+def fast_scrypt(monkeypatch):
+    # Cheap KDF settings; the hash format and verification path stay the same
+    monkeypatch.setattr(credentials, "SCRYPT_N", 2 ** 10)
+
+@pytest.fixture
+def remote():
+    """
+    The shared StressRepository, backed by an in-memory mongomock client.
+    """
+    database.configure_client(client=mongomock.MongoClient())
+    repository = database.get_mongo_repository()
+    repository.ensure_indexes()
+    yield repository
+    database.configure_client(client=None)
+
+@pytest.fixture
+def local(tmp_path, monkeypatch, remote):
+    """
+    A fresh SQLite store installed as the app's repository, with a SyncWorker
+    that is driven by calling sync_once() instead of a background thread.
+    """
+    repository = local_store.SQLiteRepository(str(tmp_path / "local.db"))
+    monkeypatch.setattr(database, "STORAGE_BACKEND", "sqlite")
+    monkeypatch.setattr(local_store, "_local_repository", repository)
+    monkeypatch.setattr(local_store, "sync_worker", local_store.SyncWorker(repository))
+    return repository
+
+@pytest.fixture
+def outage(local, monkeypatch):
+    """
+    Makes MongoDB unreachable for the local store's sync worker until
+    `outage.down` is set to False.
+    """
+    state = types.SimpleNamespace(down=True)
+    reachable = local_store.sync_worker._remote
+
+    def remote_or_fail():
+        if state.down:
+            raise ConnectionError("MongoDB is unreachable")
+        return reachable()
+
+    monkeypatch.setattr(local_store.sync_worker, "_remote", remote_or_fail)
+    return state
@@ -0,0 +1,53 @@
+import datetime
+import cv2
+import numpy as np
+import pytest
+import model_registry
+from batch_analyze import build_work_items, iter_frames, to_history_entries
+
+@pytest.fixture
+def video(tmp_path):
+    """
+    A 25-frame MJPEG video whose frame i is filled with brightness 10 * i.
+    """
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10.0, (64, 48))
+    for i in range(25):
+        writer.write(np.full((48, 64, 3), 10 * i, dtype=np.uint8))
+    writer.release()
+    return path
+
+def test_videos_are_split_into_chunks(video, tmp_path):
+    image = str(tmp_path / "face.png")
+    cv2.imwrite(image, np.zeros((48, 64, 3), dtype=np.uint8))
+    (tmp_path / "notes.txt").write_text("skipped")
+
+    items = build_work_items([str(tmp_path)], chunk_frames=10, frame_step=2)
+    assert items == [
+        ("video", video, 0, 10, 2), ("video", video, 10, 20, 2), ("video", video, 20, 25, 2),
+        ("image", image, 0, 1, 1),
+    ]
+
+def test_frame_step_skips_frames_within_each_chunk(video):
+    items = build_work_items([video], chunk_frames=10, frame_step=3)
+    frames = [(index, offset, int(round(frame.mean() / 10))) for item in items for index, offset, frame in iter_frames(item)]
+    assert [index for index, _, _ in frames] == [0, 3, 6, 9, 10, 13, 16, 19, 20, 23]
+    # Offsets follow the video's frame rate and the decoded frames are the right ones
+    assert all(offset == pytest.approx(index / 10.0) for index, offset, _ in frames)
+    assert all(brightness == index for index, _, brightness in frames)
+
+def test_history_entries_keep_their_order_within_a_video():
+    started_at = datetime.datetime(2026, 1, 1, 9, 0)
+    rows = [{"source": "clip.avi", "frame": frame, "offset_seconds": frame / 10, "emotion": "Happy", "stress_level": "LOW"}
+            for frame in (0, 5, 12)]
+    entries = to_history_entries(rows, "alice", started_at)
+    assert [entry["timestamp"] for entry in entries] == [
+        started_at, started_at + datetime.timedelta(seconds=0.5), started_at + datetime.timedelta(seconds=1.2),
+    ]
+
+def test_model_path_follows_the_backend(monkeypatch):
+    monkeypatch.setattr(model_registry, "model_backend", "keras")
+    monkeypatch.setattr(model_registry, "model_path", "/models/custom.h5")
+    assert model_registry.resolve_model() == ("keras", "/models/custom.h5")
+    assert model_registry.resolve_model("tflite") == ("tflite", model_registry.DEFAULT_MODEL_PATHS["tflite"])
+    assert model_registry.resolve_model("onnxruntime", "/tmp/m.onnx") == ("onnxruntime", "/tmp/m.onnx")
@@ -0,0 +1,25 @@
+from benchmark import compare_results, compare_timing, timing_noise
+
+def timing(*round_medians):
+    ordered = sorted(round_medians)
+    return {"median_ms": ordered[len(ordered) // 2], "round_medians": list(round_medians)}
+
+def test_stable_slowdown_is_a_regression():
+    change, threshold = compare_timing(timing(10.0, 10.1, 9.9, 10.0, 10.05), timing(13.0, 13.1, 12.9, 13.0, 13.05))
+    assert change > threshold == 0.2
+
+def test_noisy_benchmark_needs_a_larger_slowdown():
+    previous = timing(10.0, 13.0, 8.0, 11.0, 9.0)
+    assert timing_noise(previous) > 0.1
+    change, threshold = compare_timing(previous, timing(13.0, 16.0, 11.0, 14.0, 12.0))
+    assert 0.2 < change < threshold
+
+def test_one_disturbed_round_is_not_a_regression():
+    previous = timing(10.0, 10.0, 10.1, 9.9, 10.0)
+    change, threshold = compare_timing(previous, timing(10.0, 25.0, 10.1, 9.9, 10.0))
+    assert change <= threshold
+
+def test_single_round_baselines_still_compare():
+    regressions = compare_results({"results": {"a": {"median_ms": 1.0}, "b": {"median_ms": 1.0}}},
+                                  {"results": {"a": {"median_ms": 1.5}, "b": {"median_ms": 1.1}}})
+    assert [name for name, *_ in regressions] == ["a"]
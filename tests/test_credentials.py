@@ -0,0 +1,61 @@
+import pytest
+import credentials
+import database
+from credentials import SessionManager
+
+def test_needs_rehash_after_a_cost_change(monkeypatch):
+    stored = credentials.hash_password("secret")
+    assert credentials.verify_password("secret", stored) == (True, False)
+    assert credentials.verify_password("wrong", stored) == (False, False)
+
+    monkeypatch.setattr(credentials, "SCRYPT_N", 2 ** 11)
+    assert credentials.verify_password("secret", stored) == (True, True)
+    # A wrong password never asks for a rehash
+    assert credentials.verify_password("wrong", stored) == (False, False)
+
+def test_legacy_hashes_always_need_a_rehash():
+    stored = credentials.legacy_sha256("secret")
+    assert credentials.verify_password("secret", stored) == (True, True)
+    assert credentials.verify_password("wrong", stored)[0] is False
+
+def test_malformed_hash_is_rejected():
+    assert credentials.verify_password("secret", "scrypt$not-a-hash") == (False, False)
+
+def test_token_round_trip_and_revocation():
+    sessions = SessionManager(secret="test-secret")
+    token = sessions.issue("alice")
+    assert sessions.verify(token) == "alice"
+    sessions.revoke(token)
+    assert sessions.verify(token) is None
+    # Other tokens of the same user stay valid
+    assert sessions.verify(sessions.issue("alice")) == "alice"
+
+def test_expired_token_is_rejected(monkeypatch):
+    sessions = SessionManager(secret="test-secret", ttl=60)
+    monkeypatch.setattr(credentials.time, "time", lambda: 1000.0)
+    token = sessions.issue("alice")
+    monkeypatch.setattr(credentials.time, "time", lambda: 1060.0)
+    assert sessions.verify(token) == "alice"
+    monkeypatch.setattr(credentials.time, "time", lambda: 1061.0)
+    assert sessions.verify(token) is None
+
+@pytest.mark.parametrize("tamper", [
+    lambda token: token.replace(token.split(".")[0], credentials._b64encode(b"mallory"), 1),
+    lambda token: ".".join(token.split(".")[:1] + ["9999999999"] + token.split(".")[2:]),
+    lambda token: token[:-2] + ("AA" if not token.endswith("AA") else "BB"),
+    lambda token: token.rsplit(".", 1)[0],
+    lambda token: None,
+])
+def test_tampered_token_is_rejected(tamper):
+    sessions = SessionManager(secret="test-secret")
+    assert sessions.verify(tamper(sessions.issue("alice"))) is None
+
+def test_tokens_from_another_secret_are_rejected():
+    assert SessionManager(secret="other-secret").verify(SessionManager(secret="test-secret").issue("alice")) is None
+
+def test_logout_revokes_the_session(local):
+    assert database.register_user("alice", "secret")
+    token = database.login_user("alice", "secret")
+    assert database.authenticate_session(token) == "alice"
+    database.logout_session(token)
+    assert database.authenticate_session(token) is None
@@ -0,0 +1,41 @@
+import datetime
+import numpy as np
+import matplotlib.dates as mdates
+from dashboard import StressDashboard, timeline_series
+
+LINE_RGB = (0xc0, 0x39, 0x2b)
+
+def _line_pixels(dashboard):
+    pixels = np.asarray(dashboard.canvas.buffer_rgba())[:, :, :3]
+    return np.all(pixels == LINE_RGB, axis=-1)
+
+def test_append_keeps_the_drawn_history():
+    dashboard = StressDashboard()
+    start = datetime.datetime(2026, 1, 1)
+    timestamps = [start + datetime.timedelta(minutes=i) for i in range(200)]
+    dashboard.set_history(mdates.date2num(timestamps), np.tile([0.0, 2.0], 100))
+    dashboard.canvas.draw()
+    history = _line_pixels(dashboard)
+    assert history.any()
+
+    dashboard.append(timestamps[-1] + datetime.timedelta(minutes=1), 1.0)
+    # Blitted in place (no full redraw), and every history pixel is still there
+    after = _line_pixels(dashboard)
+    assert after[history].all()
+    assert after.sum() > history.sum()
+    dashboard.close()
+
+def test_timeline_is_a_bounded_window_of_recent_history(remote):
+    start = datetime.datetime(2026, 1, 1)
+    levels = ["LOW"] * 99 + ["HIGH"]
+    remote.insert_analyses([{"user": "alice", "timestamp": start + datetime.timedelta(hours=i), "emotion": "Neutral",
+                             "stress_level": levels[i % 100]} for i in range(60 * 24)])
+    summary = remote.stress_summary("alice", "day")
+
+    x, y = timeline_series(remote, "alice", summary, days=10, points=200)
+    assert len(x) <= 200
+    # Only the last ten days are queried, up to the latest analysis
+    assert x[0] >= mdates.date2num(start + datetime.timedelta(days=50))
+    assert x[-1] <= mdates.date2num(start + datetime.timedelta(hours=60 * 24 - 1))
+    # Downsampling keeps the short HIGH spikes
+    assert y.max() == 2.0 and y.min() == 0.0
@@ -0,0 +1,51 @@
+import datetime
+import time
+import pyarrow.dataset as ds
+from bson import ObjectId
+import export_history
+
+def _entry(user, when, **fields):
+    return dict({"_id": ObjectId.from_datetime(when), "user": user, "timestamp": when,
+                 "emotion": "Happy", "stress_level": "LOW"}, **fields)
+
+def _exported_ids(output_dir):
+    return sorted(ds.dataset(str(output_dir), format="parquet", partitioning="hive").to_table(columns=["_id"])["_id"].to_pylist())
+
+def _export(collection, output_dir, settle=0):
+    # Stamps from the same millisecond as the run's cut-off may compare either way
+    time.sleep(0.002)
+    return export_history.run_export(collection, str(output_dir), settle=settle)
+
+def test_late_synced_entries_are_exported(remote, tmp_path):
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    remote.insert_analyses([_entry("alice", now - datetime.timedelta(minutes=5))])
+    first = _export(remote.collection, tmp_path)
+
+    # Analyzed offline two days ago, so its _id sorts before the first run's
+    late = _entry("bob", now - datetime.timedelta(days=2))
+    remote.insert_analyses([late])
+    second = _export(remote.collection, tmp_path)
+    third = _export(remote.collection, tmp_path)
+
+    assert [first["rows"], second["rows"], third["rows"]] == [1, 1, 0]
+    assert str(late["_id"]) in _exported_ids(tmp_path)
+
+def test_recent_stamps_wait_for_the_next_run(remote, tmp_path):
+    remote.insert_analyses([_entry("alice", datetime.datetime(2026, 1, 1))])
+    assert _export(remote.collection, tmp_path, settle=3600)["rows"] == 0
+    assert _export(remote.collection, tmp_path)["rows"] == 1
+
+def test_export_made_by_id_is_continued(remote, tmp_path):
+    # Written before synced_at existed, and exported by the old _id mark
+    old = [_entry("alice", datetime.datetime(2026, 1, day)) for day in (1, 2)]
+    remote.collection.insert_many(old)
+    export_history.write_state(str(tmp_path), {"format": "parquet", "last_id": str(old[0]["_id"])})
+
+    late = _entry("bob", datetime.datetime(2025, 12, 31))
+    remote.insert_analyses([late])
+    summary = _export(remote.collection, tmp_path)
+
+    assert summary["rows"] == 2
+    assert _exported_ids(tmp_path) == sorted([str(old[1]["_id"]), str(late["_id"])])
+    state = export_history.read_state(str(tmp_path))
+    assert "last_id" not in state and state["last_synced_at"]
@@ -0,0 +1,79 @@
+import numpy as np
+from face_tracker import FaceTracker, Track, box_iou
+
+FACE = np.random.default_rng(0).integers(0, 256, (40, 40), dtype=np.uint8)
+OTHER_FACE = np.random.default_rng(1).integers(0, 256, (40, 40), dtype=np.uint8)
+
+class ScriptedCascade:
+    """
+    Returns the next scripted list of (x, y, w, h) boxes on every call.
+    """
+
+    def __init__(self, *detections):
+        self.detections = list(detections)
+        self.calls = 0
+
+    def detectMultiScale(self, image, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)):
+        self.calls += 1
+        return np.array(self.detections.pop(0), dtype=np.int32).reshape(-1, 4)
+
+def frame_with(*faces):
+    frame = np.zeros((240, 320), dtype=np.uint8)
+    for patch, (x, y) in faces:
+        frame[y:y+40, x:x+40] = patch
+    return frame
+
+def test_ids_stay_stable_between_detections():
+    cascade = ScriptedCascade([(50, 60, 40, 40)], [(62, 60, 40, 40)])
+    tracker = FaceTracker(cascade, detect_every=3, detection_scale=1.0)
+
+    ids = []
+    for x in (50, 54, 58, 62):
+        tracks = tracker.update(frame_with((FACE, (x, 60))))
+        ids.append([track.track_id for track in tracks])
+        # Followed by template matching in between detections
+        assert tracks[0].box[:2] == (x, 60)
+    assert ids == [[1], [1], [1], [1]]
+    assert cascade.calls == 2  # frames 0 and 3 only
+
+def test_missed_track_is_dropped_after_max_missed():
+    cascade = ScriptedCascade([(50, 60, 40, 40)], [], [], [])
+    tracker = FaceTracker(cascade, detect_every=1, detection_scale=1.0, max_missed=2)
+    frame = frame_with((FACE, (50, 60)))
+
+    assert [t.track_id for t in tracker.update(frame)] == [1]
+    assert [t.track_id for t in tracker.update(frame)] == [1]  # missed once
+    assert [t.track_id for t in tracker.update(frame)] == [1]  # missed twice
+    assert tracker.update(frame) == []
+
+def test_new_face_gets_a_new_id_and_old_one_is_matched_by_iou():
+    cascade = ScriptedCascade([(50, 60, 40, 40)], [(200, 100, 40, 40), (55, 62, 40, 40)])
+    tracker = FaceTracker(cascade, detect_every=1, detection_scale=1.0)
+    tracker.update(frame_with((FACE, (50, 60))))
+
+    tracks = tracker.update(frame_with((FACE, (55, 62)), (OTHER_FACE, (200, 100))))
+    assert {track.track_id: track.box for track in tracks} == {2: (200, 100, 40, 40), 1: (55, 62, 40, 40)}
+    assert box_iou((50, 60, 40, 40), (55, 62, 40, 40)) >= tracker.iou_threshold
+
+def test_lost_face_forces_a_detection_on_the_next_frame():
+    cascade = ScriptedCascade([(50, 60, 40, 40)], [])
+    tracker = FaceTracker(cascade, detect_every=10, detection_scale=1.0)
+    tracker.update(frame_with((FACE, (50, 60))))
+
+    assert tracker.update(frame_with()) == []  # template no longer matches
+    tracker.update(frame_with())
+    assert cascade.calls == 2
+
+def test_smoothed_emotion_is_the_recent_majority():
+    track = Track(1, (0, 0, 40, 40), frame_with(), history=3)
+    assert track.smoothed_emotion() is None
+    for emotion in ("Happy", "Sad", "Sad", "Happy", "Happy"):
+        track.add_emotion(emotion)
+    # Only the last three labels count
+    assert list(track.emotions) == ["Sad", "Happy", "Happy"]
+    assert track.smoothed_emotion() == "Happy"
+
+def test_box_iou():
+    assert box_iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert box_iou((0, 0, 10, 10), (5, 0, 10, 10)) == 50 / 150
+    assert box_iou((0, 0, 10, 10), (20, 20, 10, 10)) == 0.0
@@ -0,0 +1,73 @@
+import datetime
+import pytest
+from bson import ObjectId
+import history_viewer
+import local_store
+from database import page_key
+from history_viewer import HistoryViewer
+
+START = datetime.datetime(2026, 1, 1, 9, 0)
+
+@pytest.fixture(params=["mongodb", "sqlite"])
+def repository(request, remote, tmp_path):
+    if request.param == "sqlite":
+        return local_store.SQLiteRepository(str(tmp_path / "local.db"))
+    return remote
+
+@pytest.fixture
+def history(repository):
+    """
+    Seven entries of alice's, several sharing a timestamp, inserted out of
+    order, plus one of bob's. Returns alice's page keys in page order.
+    """
+    minutes = [2, 0, 1, 0, 1, 0, 2]
+    entries = [{"_id": ObjectId(), "user": "alice", "timestamp": START + datetime.timedelta(minutes=m),
+                "emotion": "Happy", "stress_level": "LOW", "recommendation": "Relax", "daily_routine": "work"}
+               for m in minutes]
+    entries.append({"_id": ObjectId(), "user": "bob", "timestamp": START, "emotion": "Sad", "stress_level": "HIGH"})
+    repository.insert_analyses(list(reversed(entries)))
+    # The SQLite store keys pages on its row id rather than the ObjectId
+    everything = repository.fetch_history_page("alice", page_size=100)
+    assert len(everything) == 7
+    return sorted(page_key(document) for document in everything)
+
+def _keys(documents):
+    return [page_key(document) for document in documents]
+
+def test_pages_forward_through_equal_timestamps(repository, history):
+    pages = [repository.fetch_history_page("alice", page_size=3)]
+    while len(pages[-1]) == 3:
+        pages.append(repository.fetch_history_page("alice", page_size=3, after=page_key(pages[-1][-1])))
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    # The id tiebreak splits the three 9:00 entries without skipping or repeating any
+    assert _keys(document for page in pages for document in page) == history
+
+def test_pages_backward_from_the_end(repository, history):
+    last = repository.fetch_history_page("alice", page_size=2, after=history[4])
+    assert _keys(last) == history[5:]
+
+    earlier = repository.fetch_history_page("alice", page_size=2, before=page_key(last[0]))
+    assert _keys(earlier) == history[3:5]
+    first = repository.fetch_history_page("alice", page_size=4, before=page_key(earlier[0]))
+    assert _keys(first) == history[:3]
+    assert repository.fetch_history_page("alice", page_size=2, before=page_key(first[0])) == []
+
+def test_projection_keeps_the_page_key(repository, history):
+    page = repository.fetch_history_page("alice", page_size=2, projection={"_id": 0, "emotion": 1})
+    assert [sorted(document) for document in page] == [["_id", "emotion", "timestamp"]] * 2
+
+def test_closed_viewer_ignores_a_late_page(monkeypatch, remote):
+    # Bypasses Tk: only the worker-side hand-off is exercised
+    viewer = object.__new__(HistoryViewer)
+    viewer.username, viewer.page_size = "alice", 2
+
+    def closed(*args):
+        raise RuntimeError("main thread is not in main loop")
+
+    viewer.after = closed
+    monkeypatch.setattr(history_viewer, "get_repository", lambda: remote)
+    viewer._fetch_worker(None, None)
+
+    monkeypatch.setattr(history_viewer, "get_repository", lambda: None)  # fetching fails too
+    viewer._fetch_worker(None, None)
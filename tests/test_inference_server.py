@@ -0,0 +1,78 @@
+import asyncio
+import numpy as np
+import pytest
+from inference_server import InferenceServer, MicroBatcher, array_header
+
+class FakeModel:
+    """
+    Returns one row per face; fails malformed batches and any batch
+    containing a face filled with -1.
+    """
+
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, batch):
+        self.batches.append(len(batch))
+        if batch.shape[1:] != (48, 48, 1):
+            raise ValueError("bad input shape")
+        if (batch == -1).all(axis=(1, 2, 3)).any():
+            raise RuntimeError("poisoned face")
+        return batch[:, :7, 0, 0].copy()
+
+def faces(count, value=0.5):
+    return np.full((count, 48, 48, 1), value, dtype=np.float32)
+
+async def _with_batcher(model, scenario, max_wait=0.05):
+    batcher = MicroBatcher(model, max_batch_size=32, max_wait=max_wait)
+    batcher.queue = asyncio.Queue()
+    runner = asyncio.ensure_future(batcher.run())
+    try:
+        return await scenario(batcher)
+    finally:
+        runner.cancel()
+
+def test_failing_request_does_not_fail_its_batch_mates():
+    model = FakeModel()
+
+    async def scenario(batcher):
+        return await asyncio.gather(
+            batcher.submit(faces(2)), batcher.submit(faces(1, -1.0)), batcher.submit(faces(3)),
+            return_exceptions=True,
+        )
+
+    good, bad, other = asyncio.run(_with_batcher(model, scenario))
+    assert good.shape == (2, 7) and other.shape == (3, 7)
+    assert isinstance(bad, RuntimeError)
+    assert model.batches[0] == 6  # tried together first
+
+def test_batcher_keeps_running_after_a_malformed_batch():
+    model = FakeModel()
+
+    async def scenario(batcher):
+        # Cannot be concatenated with a well-formed batch
+        mismatched = batcher.submit(np.zeros((1, 10, 10, 1), dtype=np.float32))
+        results = await asyncio.gather(mismatched, batcher.submit(faces(1)), return_exceptions=True)
+        # Not even an array: fails while the batch is being collected
+        broken = await asyncio.gather(batcher.submit(None), return_exceptions=True)
+        return results + broken, await batcher.submit(faces(4))
+
+    (mismatched, good, broken), later = asyncio.run(_with_batcher(model, scenario))
+    assert isinstance(mismatched, ValueError)
+    assert isinstance(broken, TypeError)
+    assert good.shape == (1, 7)
+    assert later.shape == (4, 7)
+
+@pytest.mark.parametrize("array", [
+    np.zeros((2, 48, 48, 1), dtype=np.float64),
+    np.zeros((2, 48, 48), dtype=np.float32),
+    np.zeros((0, 48, 48, 1), dtype=np.float32),
+])
+def test_predict_rejects_malformed_faces(array):
+    server = InferenceServer(FakeModel(), detect_workers=1)
+
+    async def dispatch():
+        return await server._dispatch(array_header(array, op="predict"), array.tobytes())
+
+    with pytest.raises(ValueError):
+        asyncio.run(dispatch())
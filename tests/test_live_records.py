@@ -0,0 +1,52 @@
+import datetime
+import sqlite3
+import numpy as np
+import gui
+import local_store
+from emotion_smoothing import EmotionAggregator
+from write_behind import AnalysisWriter
+
+HAPPY = np.array([0, 0, 0, 1, 0, 0, 0], dtype=np.float32)
+
+def test_closed_window_keeps_its_statistics_through_the_writer(local, remote, monkeypatch, tmp_path):
+    monkeypatch.setattr(gui, "current_user", "alice")
+    aggregator = EmotionAggregator(window_seconds=60.0)
+    start = datetime.datetime(2026, 3, 1, 9, 0).timestamp()
+    for second in range(0, 61, 5):
+        records = aggregator.update(1, HAPPY, start + second)
+    window = records[-1]
+    assert window["reason"] == "window"
+
+    writer = AnalysisWriter(repository=local, journal_path=str(tmp_path / "journal.jsonl"))
+    writer.submit(gui.analysis_entry(window["emotion"], window["stress_level"], **gui.live_record_fields(window)))
+    writer.flush()
+    local_store.sync_worker.sync_once()
+
+    for repository in (local, remote):
+        entry, = repository.find_history("alice")
+        assert entry["timestamp"] == datetime.datetime(2026, 3, 1, 9, 1)
+        assert entry["window_start"] == datetime.datetime(2026, 3, 1, 9, 0)
+        assert entry["frames"] == 13
+        assert entry["mean_score"] == 0.0
+
+def test_state_change_records_carry_no_window_fields(local, monkeypatch):
+    monkeypatch.setattr(gui, "current_user", "alice")
+    record = EmotionAggregator().update(1, HAPPY, datetime.datetime(2026, 3, 1, 9, 0).timestamp())[0]
+    local.insert_analysis(gui.analysis_entry(record["emotion"], record["stress_level"], **gui.live_record_fields(record)))
+
+    entry, = local.find_history("alice")
+    assert entry["timestamp"] == datetime.datetime(2026, 3, 1, 9, 0)
+    assert "frames" not in entry and "window_start" not in entry and "camera" not in entry
+
+def test_history_table_gains_window_columns(tmp_path):
+    path = str(tmp_path / "old.db")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE analysis_history (id INTEGER PRIMARY KEY AUTOINCREMENT, mongo_id TEXT NOT NULL UNIQUE,"
+                       " user TEXT, timestamp TEXT NOT NULL, emotion TEXT, stress_level TEXT, score REAL, recommendation TEXT,"
+                       " daily_routine TEXT, day TEXT, week TEXT, month TEXT, synced INTEGER NOT NULL DEFAULT 0)")
+    connection.commit()
+    connection.close()
+
+    repository = local_store.SQLiteRepository(path)
+    columns = {row[1] for row in repository.connection.execute("PRAGMA table_info(analysis_history)")}
+    assert set(local_store.OPTIONAL_COLUMNS) <= columns
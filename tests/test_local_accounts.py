@@ -0,0 +1,102 @@
+import credentials
+import database
+import local_store
+
+def test_local_signup_never_overwrites_remote_account(local, remote, outage):
+    remote.insert_user({"username": "alice", "password": credentials.hash_password("original")})
+    # Signed up offline on a machine that has never seen alice
+    assert database.register_user("alice", "attacker")
+    outage.down = False
+    local_store.sync_worker.sync_once()
+
+    stored = remote.find_user("alice")["password"]
+    assert credentials.verify_password("original", stored)[0]
+    assert not credentials.verify_password("attacker", stored)[0]
+    assert local.find_user("alice")["status"] == local_store.USER_CONFLICT
+    assert database.login_user("alice", "attacker") is None
+
+def test_rehash_of_remote_account_is_pushed(local, remote):
+    remote.insert_user({"username": "bob", "password": credentials.legacy_sha256("secret")})
+    assert database.login_user("bob", "secret")
+    local_store.sync_worker.sync_once()
+
+    stored = remote.find_user("bob")["password"]
+    assert not credentials.is_legacy_hash(stored)
+    assert credentials.verify_password("secret", stored)[0]
+
+def test_local_signup_is_pushed_when_name_is_free(local, remote, outage):
+    assert database.register_user("carol", "pw")
+    outage.down = False
+    local_store.sync_worker.sync_once()
+
+    assert credentials.verify_password("pw", remote.find_user("carol")["password"])[0]
+    assert local.find_user("carol")["status"] == local_store.USER_REMOTE
+    assert database.login_user("carol", "pw")
+
+def test_signup_is_refused_when_name_is_taken_remotely(local, remote):
+    remote.insert_user({"username": "dave", "password": credentials.hash_password("original")})
+    assert not database.register_user("dave", "attacker")
+    assert credentials.verify_password("original", local.find_user("dave")["password"])[0]
+
+def test_online_signup_is_claimed_immediately(local, remote):
+    assert database.register_user("erin", "pw")
+    assert local.find_user("erin")["status"] == local_store.USER_REMOTE
+    assert remote.find_user("erin")
+
+def test_history_of_provisional_account_waits_for_the_claim(local, remote, outage):
+    assert database.register_user("frank", "pw")
+    local.insert_analysis({"user": "frank", "emotion": "Happy", "stress_level": "LOW"})
+    local.clear_history("frank")
+    local.insert_analysis({"user": "frank", "emotion": "Sad", "stress_level": "HIGH"})
+    outage.down = False
+
+    # Name taken by someone else meanwhile: nothing of frank's reaches their account
+    remote.insert_user({"username": "frank", "password": credentials.hash_password("other")})
+    remote.insert_analysis({"user": "frank", "emotion": "Neutral", "stress_level": "MEDIUM"})
+    local_store.sync_worker.sync_once()
+    assert local.find_user("frank")["status"] == local_store.USER_CONFLICT
+    assert [d["emotion"] for d in remote.find_history("frank")] == ["Neutral"]
+
+def test_history_of_provisional_account_is_pushed_once_claimed(local, remote, outage):
+    assert database.register_user("grace", "pw")
+    local.insert_analysis({"user": "grace", "emotion": "Happy", "stress_level": "LOW"})
+    local_store.sync_worker.sync_once()
+    outage.down = False
+    local_store.sync_worker.sync_once()
+    assert [d["emotion"] for d in remote.find_history("grace")] == ["Happy"]
+
+def test_failed_sync_skips_remote_probes_until_the_next_success(local, remote, outage, monkeypatch):
+    local_store.sync_worker.sync_once()
+    assert local_store.sync_worker.online is False
+    calls = []
+    monkeypatch.setattr(local_store.sync_worker, "_remote", lambda: calls.append(1) or remote)
+
+    # Neither waits on MongoDB while it is known to be down
+    assert database.register_user("heidi", "pw")
+    assert local.find_user("ivan") is None
+    assert calls == []
+    assert local.find_user("heidi")["status"] == local_store.USER_LOCAL
+
+    local_store.sync_worker.sync_once()
+    assert local_store.sync_worker.online is True
+    assert local.find_user("heidi")["status"] == local_store.USER_REMOTE
+
+def test_stop_skips_the_final_sync_while_a_sync_is_running(local, monkeypatch):
+    import threading
+    release = threading.Event()
+    running = threading.Event()
+    syncs = []
+
+    def slow_sync():
+        syncs.append(threading.current_thread().name)
+        running.set()
+        release.wait(5.0)
+
+    # stop() joins for interval + 5 s: give up after 0.1 s instead
+    worker = local_store.SyncWorker(local, interval=-4.9)
+    monkeypatch.setattr(worker, "sync_once", slow_sync)
+    worker.start()
+    running.wait(5.0)
+    worker.stop()
+    release.set()
+    assert syncs == ["mongo-sync"]
@@ -0,0 +1,142 @@
+import datetime
+import os
+import uuid
+import mongomock
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError, PyMongoError
+import database
+import migrate
+
+@pytest.fixture
+def mongo_db():
+    """
+    A scratch database on the real MongoDB at MONGO_TEST_URI (explain() and
+    time-series collections are not emulated by mongomock); skipped when unset.
+    """
+    uri = os.environ.get("MONGO_TEST_URI")
+    if not uri:
+        pytest.skip("MONGO_TEST_URI is not set")
+    client = MongoClient(uri, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        pytest.skip(f"MongoDB at MONGO_TEST_URI is unreachable: {e}")
+    name = f"stress_test_{uuid.uuid4().hex[:8]}"
+    yield client[name]
+    client.drop_database(name)
+    client.close()
+
+def _history(db, count=50):
+    start = datetime.datetime(2026, 1, 1)
+    db.analysis_history.insert_many([
+        {"user": f"user{i % 5}", "timestamp": start + datetime.timedelta(minutes=i), "emotion": "Happy", "stress_level": "LOW"}
+        for i in range(count)
+    ])
+
+# Against mongomock
+def test_unparseable_timestamps_are_reported():
+    collection = mongomock.MongoClient().db.analysis_history
+    collection.insert_many([{"timestamp": "2026-01-01 10:00:00"}, {"_id": "bad", "timestamp": "yesterday"}])
+    converted, unparseable = migrate.migrate_timestamps(collection)
+    assert (converted, unparseable) == (1, ["bad"])
+    assert collection.find_one({"_id": "bad"})["timestamp"] == "yesterday"
+
+def test_failed_conversion_restores_the_collection():
+    # mongomock cannot create time-series collections, so the copy fails half way
+    db = mongomock.MongoClient().db
+    _history(db, 10)
+    with pytest.raises(Exception, match="Time-series conversion"):
+        migrate.convert_to_timeseries(db)
+    assert db.list_collection_names() == ["analysis_history"]
+    assert db.analysis_history.count_documents({}) == 10
+
+def test_existing_backup_blocks_conversion():
+    db = mongomock.MongoClient().db
+    _history(db, 1)
+    db.analysis_history_backup.insert_one({"old": True})
+    with pytest.raises(Exception, match="already exists"):
+        migrate.convert_to_timeseries(db)
+    assert db.analysis_history.count_documents({}) == 1
+
+def test_duplicate_usernames_are_archived_before_the_unique_index():
+    db = mongomock.MongoClient().db
+    db.users.insert_many([{"username": "alice", "password": "first"}, {"username": "bob", "password": "x"},
+                          {"username": "alice", "password": "second"}])
+    duplicates = migrate.find_duplicate_usernames(db.users)
+    assert list(duplicates) == ["alice"]
+    assert migrate.dedupe_usernames(db.users, duplicates) == 1
+    assert db.users.find_one({"username": "alice"})["password"] == "first"
+    assert db.users_duplicates.find_one({"username": "alice"})["password"] == "second"
+    database.StressRepository(db.analysis_history, db.users).ensure_indexes()
+
+def test_retried_write_to_a_timeseries_collection_is_refused():
+    # mongomock has no time-series collections; the repository is told it writes to one
+    db = mongomock.MongoClient().db
+    repository = database.StressRepository(db.analysis_history, db.users, timeseries=True)
+    entry = {"_id": "a1", "user": "alice", "timestamp": datetime.datetime(2026, 1, 1), "emotion": "Happy", "stress_level": "LOW"}
+    repository.insert_analysis(dict(entry))
+    with pytest.raises(DuplicateKeyError):
+        repository.insert_analysis(dict(entry))
+    assert db.analysis_history.count_documents({}) == 1
+
+def test_retried_batch_to_a_timeseries_collection_is_not_duplicated():
+    db = mongomock.MongoClient().db
+    repository = database.StressRepository(db.analysis_history, db.users, timeseries=True)
+    start = datetime.datetime(2026, 1, 1)
+    batch = [{"_id": f"a{i}", "user": "alice", "timestamp": start + datetime.timedelta(minutes=i),
+              "emotion": "Happy", "stress_level": "LOW"} for i in range(3)]
+    assert repository.insert_analyses([dict(entry) for entry in batch[:2]]) == 2
+    assert repository.insert_analyses([dict(entry) for entry in batch]) == 1
+    assert db.analysis_history.count_documents({}) == 3
+    assert repository.stress_summary("alice")[0]["count"] == 3
+
+class ExplainedCursor:
+    def __init__(self, plan):
+        self.plan = plan
+
+    def explain(self):
+        return {"queryPlanner": {"winningPlan": self.plan}}
+
+@pytest.mark.parametrize("plan, uses_index", [
+    ({"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}, True),
+    ({"queryPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}, "slotBasedPlan": {}}, True),
+    ({"stage": "COLLSCAN"}, False),
+])
+def test_explain_plan_shapes(plan, uses_index):
+    assert migrate.explain_uses_index(ExplainedCursor(plan)) is uses_index
+
+# Against a real MongoDB
+def test_queries_are_served_by_indexes(mongo_db):
+    _history(mongo_db)
+    mongo_db.users.insert_one({"username": "user0", "password": "x"})
+    repository = database.StressRepository(mongo_db.analysis_history, mongo_db.users)
+    repository.ensure_indexes()
+    assert migrate.verify_indexes(repository, "user0") == {
+        "history": True, "history_range": True, "clear_history": True, "username_lookup": True,
+    }
+
+def test_collection_scan_is_detected(mongo_db):
+    _history(mongo_db)
+    assert not migrate.explain_uses_index(mongo_db.analysis_history.find({"emotion": "Happy"}))
+
+def test_timeseries_conversion(mongo_db):
+    version = tuple(int(part) for part in mongo_db.client.server_info()["version"].split(".")[:2])
+    if version < (7, 0):
+        pytest.skip("time-series conversion needs MongoDB 7.0+")
+    _history(mongo_db, 20)
+    mongo_db.analysis_history.insert_one({"user": "user0", "timestamp": "not a date"})
+    result = migrate.convert_to_timeseries(mongo_db)
+
+    assert result == {"copied": 20, "skipped": 1}
+    assert "timeseries" in mongo_db.analysis_history.options()
+    assert mongo_db.analysis_history.count_documents({}) == 20
+    assert mongo_db.analysis_history_backup.count_documents({}) == 21
+
+    # The collection itself accepts a repeated _id; the repository must not
+    repository = database.StressRepository(mongo_db.analysis_history, mongo_db.users)
+    assert repository.is_timeseries()
+    entry = mongo_db.analysis_history.find_one({"user": "user0"})
+    with pytest.raises(DuplicateKeyError):
+        repository.insert_analysis(entry)
+    assert mongo_db.analysis_history.count_documents({}) == 20
@@ -0,0 +1,40 @@
+import multiprocessing
+import cv2
+import numpy as np
+import pytest
+import model_registry
+import multi_camera
+from multi_camera import MultiCameraAnalyzer
+
+@pytest.fixture
+def video(tmp_path):
+    path = str(tmp_path / "camera.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10.0, (64, 48))
+    for _ in range(5):
+        writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    writer.release()
+    return path
+
+def test_defaults_to_the_registry_model(video, monkeypatch):
+    monkeypatch.setattr(model_registry, "model_backend", "tflite")
+    monkeypatch.setattr(model_registry, "model_path", "/models/custom.tflite")
+    analyzer = MultiCameraAnalyzer([("cam", video)], lambda *args: None, workers=1)
+    assert (analyzer.backend, analyzer.model_path) == ("tflite", "/models/custom.tflite")
+    onnx = MultiCameraAnalyzer([("cam", video)], lambda *args: None, workers=1, backend="onnxruntime")
+    assert onnx.model_path == model_registry.DEFAULT_MODEL_PATHS["onnxruntime"]
+
+def test_model_load_failure_is_reported(video):
+    analyzer = MultiCameraAnalyzer([("cam", video)], lambda *args: None, workers=2, backend="no-such-backend", start_timeout=30)
+    with pytest.raises(Exception, match="no-such-backend"):
+        analyzer.start()
+    assert analyzer.pool is None
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="needs forked workers")
+def test_start_waits_for_ready_workers(video, monkeypatch):
+    # Workers are forked, so they inherit the stubbed loader
+    monkeypatch.setattr(multi_camera, "init_worker", lambda backend, model_path: None)
+    analyzer = MultiCameraAnalyzer([("cam", video)], lambda *args: None, workers=2, start_timeout=30).start()
+    try:
+        assert analyzer.running and analyzer.error is None
+    finally:
+        analyzer.stop()
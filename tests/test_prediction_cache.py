@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from emotion_model import EmotionBackend
+from prediction_cache import CachedBackend, PredictionCache, crop_fingerprint, hamming_distance, with_prediction_cache
+
+def _scores(label):
+    scores = np.zeros(7, dtype=np.float32)
+    scores[label] = 1.0
+    return scores
+
+def _face(seed):
+    return np.random.default_rng(seed).random((48, 48, 1), dtype=np.float32)
+
+class CountingBackend(EmotionBackend):
+    """
+    Scores each face by its mean brightness and records every batch it sees.
+    """
+    name = "counting"
+
+    def __init__(self):
+        self.batches = []
+
+    @staticmethod
+    def import_runtime():
+        return None
+
+    def predict(self, batch):
+        self.batches.append(len(batch))
+        return np.stack([_scores(int(face.mean() * 7) % 7) for face in batch])
+
+def test_hit_and_miss():
+    cache = PredictionCache(max_size=4, ttl=10.0, tolerance=0)
+    assert cache.get(0b1010, now=0.0) is None
+    cache.put(0b1010, _scores(3), now=0.0)
+    np.testing.assert_array_equal(cache.get(0b1010, now=1.0), _scores(3))
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["size"], stats["hit_rate"]) == (1, 1, 1, 0.5)
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_size=2, ttl=10.0, tolerance=0)
+    cache.put(1, _scores(1), now=0.0)
+    cache.put(2, _scores(2), now=0.0)
+    assert cache.get(1, now=0.0) is not None  # 2 is now the least recently used
+    cache.put(3, _scores(3), now=0.0)
+    assert cache.get(2, now=0.0) is None
+    assert cache.get(1, now=0.0) is not None and cache.get(3, now=0.0) is not None
+    assert cache.get_stats()["evictions"] == 1
+
+def test_entries_expire_after_the_ttl():
+    cache = PredictionCache(max_size=4, ttl=2.0, tolerance=0)
+    cache.put(1, _scores(1), now=0.0)
+    assert cache.get(1, now=2.0) is not None
+    assert cache.get(1, now=2.5) is None
+    assert cache.get_stats()["expired"] == 1 and cache.get_stats()["size"] == 0
+
+@pytest.mark.parametrize("flipped, hit", [(0, True), (2, True), (3, False)])
+def test_tolerance_boundary(flipped, hit):
+    cache = PredictionCache(max_size=4, ttl=10.0, tolerance=2)
+    fingerprint = 0b11110000
+    cache.put(fingerprint, _scores(1), now=0.0)
+    nearby = fingerprint ^ ((1 << flipped) - 1)
+    assert hamming_distance(fingerprint, nearby) == flipped
+    assert (cache.get(nearby, now=0.0) is not None) is hit
+
+def test_exact_cache_never_matches_a_different_crop():
+    cache = PredictionCache(max_size=4, ttl=10.0, tolerance=0)
+    cache.put(crop_fingerprint(_face(0)), _scores(1), now=0.0)
+    assert cache.get(crop_fingerprint(_face(1)), now=0.0) is None
+
+def test_only_misses_reach_the_backend():
+    backend = CountingBackend()
+    now = [0.0]
+    cached = CachedBackend(backend, PredictionCache(max_size=8, ttl=2.0, tolerance=0), clock=lambda: now[0])
+    seen, new = _face(0), _face(1)
+
+    first = cached.predict(np.stack([seen]))
+    second = cached.predict(np.stack([seen, new, seen]))
+    assert backend.batches == [1, 1]  # only `new` was sent the second time
+    np.testing.assert_array_equal(second, CountingBackend().predict(np.stack([seen, new, seen])))
+    np.testing.assert_array_equal(second[0], first[0])
+
+    now[0] = 5.0  # past the TTL: everything is predicted again, as one batch
+    cached.predict(np.stack([seen, new]))
+    assert backend.batches[2] == 2
+
+def test_cache_is_off_by_default():
+    backend = CountingBackend()
+    assert with_prediction_cache(backend) is backend
+    assert isinstance(with_prediction_cache(backend, max_size=16), CachedBackend)
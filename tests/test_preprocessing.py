@@ -0,0 +1,58 @@
+import tracemalloc
+import numpy as np
+import pytest
+from emotion_model import preprocess_faces
+from preprocessing import FACE_SIZE, FaceBatchBuffer, to_gray
+
+BOXES = [(40 + 140 * i, 120, 120, 140) for i in range(4)]
+# Less than a single 48x48 uint8 crop: nothing the size of an image may be allocated per frame
+FRAME_ALLOCATION_BOUND = FACE_SIZE * FACE_SIZE
+
+@pytest.fixture
+def gray_frame():
+    return np.random.default_rng(0).integers(0, 256, (480, 640), dtype=np.uint8)
+
+def _traced(func, frames=50):
+    """
+    Runs func once to warm up, then returns the peak bytes traced during one
+    call and the bytes still allocated per call after `frames` calls.
+    """
+    func()
+    tracemalloc.start()
+    try:
+        base, _ = tracemalloc.get_traced_memory()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        before = tracemalloc.take_snapshot()
+        for _ in range(frames):
+            func()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    retained = sum(stat.size_diff for stat in after.compare_to(before, "filename")) / frames
+    return peak - base, retained
+
+def test_reused_buffer_allocates_no_arrays_per_frame(gray_frame):
+    buffer = FaceBatchBuffer()
+    peak, retained = _traced(lambda: buffer.fill(gray_frame, BOXES))
+    assert peak < FRAME_ALLOCATION_BOUND
+    assert retained < FRAME_ALLOCATION_BOUND
+
+    # The one-shot path allocates at least the float32 batch itself
+    one_shot_peak, _ = _traced(lambda: preprocess_faces(gray_frame, BOXES))
+    assert one_shot_peak >= len(BOXES) * FACE_SIZE * FACE_SIZE * 4
+
+def test_buffer_matches_one_shot_preprocessing(gray_frame):
+    buffer = FaceBatchBuffer(capacity=1)
+    batch = buffer.fill(gray_frame, BOXES)
+    assert buffer.capacity >= len(BOXES)
+    assert batch.dtype == np.float32 and batch.shape == (len(BOXES), FACE_SIZE, FACE_SIZE, 1)
+    np.testing.assert_allclose(batch, preprocess_faces(gray_frame, BOXES), atol=1e-6)
+
+def test_gray_conversion_writes_into_dst():
+    frame = np.random.default_rng(1).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    dst = np.empty((480, 640), dtype=np.uint8)
+    gray = to_gray(frame, "rgb", dst=dst)
+    assert gray is dst
+    _, retained = _traced(lambda: to_gray(frame, "rgb", dst=dst))
+    assert retained < FRAME_ALLOCATION_BOUND
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+import live_analysis
+from emotion_model import EmotionBackend
+from live_analysis import LiveAnalyzer
+from qos import QOS_LEVELS, QoSController
+
+FRAME_INTERVAL = 0.2  # 5 analyses per second
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+class FakeCascade:
+    """
+    Costs `full_ms` * load on a 640x480 frame at scaleFactor 1.1, less on
+    smaller frames and coarser scale steps, and always finds one face.
+    """
+
+    def __init__(self, clock, full_ms=60.0):
+        self.clock = clock
+        self.full_ms = full_ms
+        self.load = 1.0
+
+    def detectMultiScale(self, image, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)):
+        h, w = image.shape[:2]
+        cost = self.full_ms * (h * w / (640 * 480)) * (np.log(1.1) / np.log(scaleFactor))
+        self.clock.advance(cost * self.load / 1000)
+        return np.array([[w // 4, h // 4, w // 2, h // 2]], dtype=np.int32)
+
+class FakeSlowBackend(EmotionBackend):
+    """
+    Takes `delay_ms` * the cascade's load per batch on the fake clock.
+    """
+    name = "fake"
+
+    def __init__(self, cascade, delay_ms=20.0):
+        self.cascade = cascade
+        self.delay_ms = delay_ms
+        self.batches = 0
+
+    @staticmethod
+    def import_runtime():
+        return None
+
+    def predict(self, batch):
+        self.batches += 1
+        self.cascade.clock.advance(self.delay_ms * self.cascade.load / 1000)
+        return np.full((len(batch), 7), 1 / 7, dtype=np.float32)
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    # Stage timings come from the same clock the controller reads
+    monkeypatch.setattr(live_analysis.time, "perf_counter", clock)
+    return clock
+
+def _run(analyzer, clock, seconds):
+    levels = []
+    end = clock.now + seconds
+    while clock.now < end:
+        analyzer.analyze_frame(analyzer.frame)
+        clock.advance(FRAME_INTERVAL)
+        levels.append(analyzer.qos.level)
+    return levels
+
+def test_controller_degrades_under_load_and_recovers(clock):
+    cascade = FakeCascade(clock)
+    backend = FakeSlowBackend(cascade)
+    qos = QoSController(target_ms=150.0, cpu_sampler=lambda: 0.2, clock=clock)
+    analyzer = LiveAnalyzer(None, backend, cascade, on_result=None, qos=qos)
+    analyzer.frame = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+
+    assert set(_run(analyzer, clock, 5)) == {0}
+
+    cascade.load = 6.0
+    loaded = _run(analyzer, clock, 10)
+    assert max(loaded) == len(QOS_LEVELS) - 1
+    # One step per cooldown, never straight to the bottom
+    assert all(later - earlier <= 1 for earlier, later in zip(loaded, loaded[1:]))
+    # The motion gate still analyzes a frame of the static scene every max_gate_seconds
+    assert qos.frames_gated > 0
+    gated_batches = backend.batches
+
+    cascade.load = 1.0
+    recovered = _run(analyzer, clock, 60)
+    assert recovered[-1] == 0
+    assert backend.batches > gated_batches
+    index = {level["name"]: i for i, level in enumerate(QOS_LEVELS)}
+    directions = [index[decision["to"]] - index[decision["from"]] for decision in qos.decisions]
+    assert directions == [1] * (len(QOS_LEVELS) - 1) + [-1] * (len(QOS_LEVELS) - 1)
+
+def test_cpu_load_alone_degrades(clock):
+    cpu = {"load": 0.95}
+    qos = QoSController(target_ms=150.0, cpu_sampler=lambda: cpu["load"], clock=clock)
+    qos.observe({"detect": 0.01})
+    clock.advance(1.0)
+    qos.observe({"detect": 0.01})
+    assert qos.level == 1
+
+    cpu["load"] = 0.2
+    for _ in range(10):
+        clock.advance(1.0)
+        qos.observe({"detect": 0.01})
+    assert qos.level == 0
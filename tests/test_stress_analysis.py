@@ -0,0 +1,51 @@
+import itertools
+import numpy as np
+import pytest
+from stress_analysis import (EMOTIONS, RECOMMENDATIONS_BY_ID, STRESS_LEVELS, STRESS_SCORES, calculate_stress_level,
+                             get_recommendation, get_recommendation_by_id, score_batch, tokenize_routine)
+
+ROUTINES = [None, "", "work all day", "work then exercise", "sleep in", "reading"]
+
+def test_batch_matches_scalar_scoring_without_routines():
+    indices = np.arange(len(EMOTIONS))
+    level_ids, scores = score_batch(indices)
+    for index, level_id, score in zip(indices, level_ids, scores):
+        level = calculate_stress_level(EMOTIONS[index])
+        assert STRESS_LEVELS[level_id] == level
+        assert score == STRESS_SCORES[level]
+
+@pytest.mark.parametrize("routine", ROUTINES)
+def test_batch_matches_scalar_scoring_with_a_routine(routine):
+    indices = np.arange(len(EMOTIONS))
+    expected = [calculate_stress_level(emotion, routine) for emotion in EMOTIONS]
+    # One code for the whole batch, and one code per row
+    for routines in (tokenize_routine(routine), np.full(len(indices), tokenize_routine(routine))):
+        level_ids, scores = score_batch(indices, routines)
+        assert [STRESS_LEVELS[i] for i in level_ids] == expected
+        assert list(scores) == [STRESS_SCORES[level] for level in expected]
+
+def test_mixed_routines_per_row():
+    pairs = list(itertools.product(range(len(EMOTIONS)), ROUTINES))
+    level_ids, _ = score_batch(np.array([i for i, _ in pairs]), np.array([tokenize_routine(r) for _, r in pairs]))
+    assert [STRESS_LEVELS[i] for i in level_ids] == [calculate_stress_level(EMOTIONS[i], r) for i, r in pairs]
+
+def test_probabilities_are_weighted():
+    probabilities = np.array([
+        [0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0],  # Happy: all LOW
+        [0.3, 0.0, 0.3, 0.0, 0.0, 0.0, 0.4],  # 0.6 HIGH, 0.4 MEDIUM
+        [0.0, 0.2, 0.0, 0.2, 0.0, 0.2, 0.4],  # 0.6 LOW beats the likeliest label (Neutral)
+    ], dtype=np.float32)
+    level_ids, scores = score_batch(probabilities)
+    assert [STRESS_LEVELS[i] for i in level_ids] == ["LOW", "HIGH", "LOW"]
+    np.testing.assert_allclose(scores, [0.0, 0.6 * 2 + 0.4 * 1, 0.4 * 1], rtol=1e-6)
+
+    # A routine override wins over the weighted score
+    level_ids, scores = score_batch(probabilities, tokenize_routine("work"))
+    assert [STRESS_LEVELS[i] for i in level_ids] == ["HIGH"] * 3
+    assert list(scores) == [2.0] * 3
+
+def test_recommendations_by_id_match_by_name():
+    level_ids, _ = score_batch(np.arange(len(EMOTIONS)))
+    for level_id in level_ids:
+        assert get_recommendation_by_id(level_id) is get_recommendation(STRESS_LEVELS[level_id])
+    assert len(RECOMMENDATIONS_BY_ID) == len(STRESS_LEVELS)
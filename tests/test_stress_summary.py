@@ -0,0 +1,20 @@
+import datetime
+
+def _entries(user, levels, start=datetime.datetime(2026, 2, 1, 9, 0)):
+    return [{"user": user, "timestamp": start + datetime.timedelta(days=i // 2), "emotion": "Happy", "stress_level": level}
+            for i, level in enumerate(levels)]
+
+def test_history_written_before_rollups_is_summarized(remote):
+    # Inserted behind the repository's back, so no rollups exist for it
+    remote.collection.insert_many(_entries("alice", ["LOW", "HIGH", "MEDIUM"]))
+    assert remote.rollup_collection.count_documents({}) == 0
+
+    summary = remote.stress_summary("alice", "day")
+    assert summary == remote.aggregate_stress_summary("alice", "day")
+    assert [row["count"] for row in summary] == [2, 1]
+
+def test_rollups_match_the_aggregation(remote):
+    remote.insert_analyses(_entries("alice", ["LOW", "HIGH", "MEDIUM", "LOW"]))
+    for period in ("day", "week", "month"):
+        assert remote.stress_summary("alice", period) == remote.aggregate_stress_summary("alice", period)
+    assert remote.stress_summary("bob", "day") == []
@@ -0,0 +1,149 @@
+import datetime
+import threading
+import time
+from bson import json_util
+from write_behind import AnalysisWriter
+
+def _entry(user="alice", minute=0):
+    return {"user": user, "timestamp": datetime.datetime(2026, 1, 1, 9, minute), "emotion": "Happy", "stress_level": "LOW"}
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+class FlakyRepository:
+    """
+    Delegates to a real repository but raises on the insert_analyses calls
+    whose (1-based) numbers are in `failures`.
+    """
+
+    def __init__(self, repository, failures=()):
+        self.repository = repository
+        self.failures = set(failures)
+        self.calls = []
+
+    def insert_analyses(self, entries):
+        self.calls.append(len(entries))
+        if len(self.calls) in self.failures:
+            raise ConnectionError("MongoDB is unreachable")
+        return self.repository.insert_analyses(entries)
+
+def test_batch_is_flushed_once_full(remote, tmp_path):
+    repository = FlakyRepository(remote)
+    writer = AnalysisWriter(repository=repository, batch_size=3, flush_interval=30.0,
+                            journal_path=str(tmp_path / "journal.jsonl")).start()
+    try:
+        for minute in range(3):
+            writer.submit(_entry(minute=minute))
+        # Well before the flush interval
+        assert _wait_for(lambda: writer.get_metrics()["written"] == 3)
+        assert repository.calls == [3]
+    finally:
+        writer.running = False
+
+def test_partial_batch_is_flushed_after_the_interval(remote, tmp_path):
+    repository = FlakyRepository(remote)
+    writer = AnalysisWriter(repository=repository, batch_size=100, flush_interval=0.05,
+                            journal_path=str(tmp_path / "journal.jsonl")).start()
+    try:
+        writer.submit(_entry())
+        assert _wait_for(lambda: writer.get_metrics()["written"] == 1)
+        assert repository.calls == [1]
+    finally:
+        writer.close()
+
+def test_failed_flush_is_retried_then_spilled(remote, tmp_path):
+    journal = tmp_path / "journal.jsonl"
+    repository = FlakyRepository(remote, failures={1, 2})
+    writer = AnalysisWriter(repository=repository, journal_path=str(journal), max_retries=1)
+    writer.submit(_entry())
+    writer.flush()
+
+    metrics = writer.get_metrics()
+    assert repository.calls == [1, 1]
+    assert (metrics["failed_flushes"], metrics["spilled"], metrics["written"]) == (2, 1, 0)
+    spilled, = [json_util.loads(line) for line in journal.read_text().splitlines()]
+
+    # The next successful flush replays it under the same _id
+    writer.submit(_entry(minute=1))
+    writer.flush()
+    assert not journal.exists()
+    assert remote.collection.count_documents({"_id": spilled["_id"]}) == 1
+    assert remote.collection.count_documents({}) == 2
+
+def test_full_queue_blocks_before_spilling(tmp_path):
+    journal = tmp_path / "journal.jsonl"
+    writer = AnalysisWriter(journal_path=str(journal), max_queue=1, put_timeout=1.0)
+    writer.submit(_entry(minute=0))
+
+    # A consumer frees the slot while submit() is waiting
+    threading.Timer(0.1, writer.queue.get).start()
+    started = time.monotonic()
+    writer.submit(_entry(minute=1))
+    assert time.monotonic() - started >= 0.1
+    assert writer.get_metrics()["spilled"] == 0 and not journal.exists()
+
+    # Nobody frees it: the entry goes to the journal after put_timeout
+    writer.put_timeout = 0.05
+    writer.submit(_entry(minute=2))
+    assert writer.get_metrics()["spilled"] == 1
+    assert json_util.loads(journal.read_text())["timestamp"] == datetime.datetime(2026, 1, 1, 9, 2)
+
+def test_replay_that_fails_part_way_does_not_duplicate(remote, tmp_path):
+    # Written before submit() assigned ids
+    journal = tmp_path / "journal.jsonl"
+    journal.write_text("".join(json_util.dumps(_entry(minute=i)) + "\n" for i in range(5)))
+    repository = FlakyRepository(remote, failures={2})
+    writer = AnalysisWriter(repository=repository, journal_path=str(journal), batch_size=2)
+
+    writer._replay_journal(repository)
+    assert repository.calls == [2, 2]
+    assert journal.exists() and remote.collection.count_documents({}) == 2
+
+    writer._replay_journal(repository)
+    assert not journal.exists()
+    assert remote.collection.count_documents({}) == 5
+
+def test_entries_spilled_during_a_replay_are_kept(remote, tmp_path):
+    journal = tmp_path / "journal.jsonl"
+    writer = AnalysisWriter(journal_path=str(journal), max_queue=1, put_timeout=0.01)
+    writer.submit(_entry(minute=0))
+    writer.submit(_entry(minute=1))
+
+    class SpillingRepository:
+        def insert_analyses(self, entries):
+            # Another thread spills while the replay is inserting
+            writer.submit(_entry(minute=2))
+            return remote.insert_analyses(entries)
+
+    writer._replay_journal(SpillingRepository())
+    kept, = [json_util.loads(line) for line in journal.read_text().splitlines()]
+    assert kept["timestamp"] == datetime.datetime(2026, 1, 1, 9, 2)
+    assert remote.collection.count_documents({}) == 1
+
+def test_journal_left_by_an_earlier_run_is_replayed_at_start(remote, tmp_path):
+    journal = tmp_path / "journal.jsonl"
+    journal.write_text("".join(json_util.dumps(_entry(minute=i)) + "\n" for i in range(3)))
+
+    writer = AnalysisWriter(repository=remote, journal_path=str(journal), flush_interval=0.05).start()
+    try:
+        _wait_for(lambda: not journal.exists())
+    finally:
+        writer.close()
+
+    assert not journal.exists()
+    assert remote.collection.count_documents({"user": "alice"}) == 3
+    assert writer.get_metrics()["replayed"] == 3
+
+def test_submit_does_not_raise_when_the_journal_is_unwritable(tmp_path):
+    # A full queue spills to the journal, whose directory does not exist
+    writer = AnalysisWriter(journal_path=str(tmp_path / "missing" / "journal.jsonl"), max_queue=1, put_timeout=0.01)
+    writer.submit(_entry(minute=0))
+    writer.submit(_entry(minute=1))
+
+    metrics = writer.get_metrics()
+    assert metrics["submitted"] == 2
+    assert metrics["dropped"] == 1 and metrics["spilled"] == 0
+    assert metrics["queue_depth"] == 1
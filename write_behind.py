@@ -0,0 +1,251 @@
+import os
+import queue
+import threading
+import time
+import logging
+from bson import ObjectId, json_util
+from database import get_repository
+from metrics import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Write-behind settings (overridable through environment variables)
+WRITE_BATCH_SIZE = int(os.environ.get("ANALYSIS_WRITE_BATCH_SIZE", "100"))
+WRITE_FLUSH_INTERVAL = float(os.environ.get("ANALYSIS_WRITE_FLUSH_INTERVAL", "1.0"))
+WRITE_QUEUE_SIZE = int(os.environ.get("ANALYSIS_WRITE_QUEUE_SIZE", "10000"))
+JOURNAL_PATH = os.environ.get("ANALYSIS_JOURNAL_PATH", "analysis_journal.jsonl")
+
+# Buffered, Batched Writer for Analysis Results
+class AnalysisWriter:
+    """
+    Collects analysis documents and writes them with insert_many(ordered=False)
+    once `batch_size` documents are waiting or `flush_interval` seconds have
+    passed. submit() blocks for at most `put_timeout` seconds when the queue is
+    full (backpressure); after that the document goes straight to the on-disk
+    journal. Failed flushes are retried with backoff and then spilled to the
+    journal, which is replayed when the writer starts and after the next
+    successful flush. Documents that cannot be journaled either are logged
+    and counted as dropped.
+    """
+
+    def __init__(self, repository=None, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL,
+                 max_queue=WRITE_QUEUE_SIZE, journal_path=JOURNAL_PATH, max_retries=3, put_timeout=0.5):
+        self.repository = repository
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.journal_path = journal_path
+        self.max_retries = max_retries
+        self.put_timeout = put_timeout
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.running = False
+        self.thread = None
+        self._flush_lock = threading.Lock()
+        self._journal_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self.metrics = {
+            "submitted": 0,
+            "written": 0,
+            "flushes": 0,
+            "failed_flushes": 0,
+            "spilled": 0,
+            "replayed": 0,
+            "dropped": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+        }
+
+    def start(self):
+        """
+        Starts the background thread, which first replays any journal left
+        by an earlier run.
+        """
+        self.running = True
+        self.thread = threading.Thread(target=self._flush_loop, name="analysis-writer", daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        """
+        Stops the background thread and flushes everything still buffered.
+        """
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=self.flush_interval + 5.0)
+            self.thread = None
+        self.flush()
+        logging.info(f"Analysis writer closed: {self.get_metrics()}")
+
+    def get_metrics(self):
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        metrics["queue_depth"] = self.queue.qsize()
+        return metrics
+
+    def _count(self, name, amount=1):
+        with self._metrics_lock:
+            self.metrics[name] += amount
+
+    def submit(self, entry):
+        """
+        Queues one analysis document. Never raises on database or journal problems.
+        """
+        self._count("submitted")
+        # Journaled entries keep this id, so a replay that is retried skips what it already stored
+        entry.setdefault("_id", ObjectId())
+        try:
+            self.queue.put(entry, timeout=self.put_timeout)
+        except queue.Full:
+            logging.warning("Analysis write queue is full; spilling to the journal.")
+            self._spill([entry])
+
+    # Background Flushing
+    def _flush_loop(self):
+        self._replay_pending()
+        while self.running:
+            batch = self._drain(block=True)
+            if batch:
+                self._write(batch)
+
+    def _drain(self, block):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if block and timeout > 0:
+                    batch.append(self.queue.get(timeout=timeout))
+                else:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _replay_pending(self):
+        with self._flush_lock:
+            try:
+                self._replay_journal(self.repository or get_repository())
+            except Exception as e:
+                logging.error(f"Failed to replay analysis journal: {str(e)}")
+
+    def flush(self):
+        """
+        Synchronously writes everything currently queued.
+        """
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                break
+            self._write(batch)
+
+    def _write(self, batch):
+        with self._flush_lock:
+            repository = self.repository or get_repository()
+            # Assign ids up front so a retried insert_many skips what was already stored
+            for entry in batch:
+                entry.setdefault("_id", ObjectId())
+            for attempt in range(self.max_retries + 1):
+                start = time.perf_counter()
+                try:
+                    repository.insert_analyses(batch)
+                    self._record_flush(len(batch), time.perf_counter() - start)
+                    self._replay_journal(repository)
+                    return
+                except Exception as e:
+                    self._count("failed_flushes")
+                    logging.error(f"Failed to save {len(batch)} analysis results (attempt {attempt + 1}): {str(e)}")
+                    if attempt < self.max_retries:
+                        time.sleep(min(0.5 * 2 ** attempt, 5.0))
+            self._spill(batch)
+
+    def _record_flush(self, count, seconds):
+        with self._metrics_lock:
+            self.metrics["written"] += count
+            self.metrics["flushes"] += 1
+            self.metrics["last_flush_ms"] = seconds * 1000
+            self.metrics["max_flush_ms"] = max(self.metrics["max_flush_ms"], seconds * 1000)
+        metrics.observe("analysis_writer.flush", seconds)
+
+    # On-Disk Journal
+    def _spill(self, entries):
+        try:
+            with self._journal_lock:
+                with open(self.journal_path, "a", encoding="utf-8") as journal:
+                    for entry in entries:
+                        journal.write(json_util.dumps(entry) + "\n")
+        except OSError as e:
+            self._count("dropped", len(entries))
+            logging.error(f"Dropped {len(entries)} analysis results; could not write {self.journal_path}: {str(e)}")
+            return
+        self._count("spilled", len(entries))
+        logging.warning(f"Spilled {len(entries)} analysis results to {self.journal_path}.")
+
+    def _replay_journal(self, repository):
+        """
+        Inserts the journaled entries and removes what was replayed. The
+        journal lock is only held to read and trim the file, not during the
+        inserts, so submit() can keep spilling while the database is slow.
+        """
+        with self._journal_lock:
+            if not os.path.exists(self.journal_path) or os.path.getsize(self.journal_path) == 0:
+                return
+            with open(self.journal_path, "rb") as journal:
+                content = journal.read()
+            replayed_bytes = len(content)
+            entries = [json_util.loads(line) for line in content.decode("utf-8").splitlines() if line.strip()]
+            # Journals written before submit() assigned ids: persist ids before inserting
+            if any("_id" not in entry for entry in entries):
+                for entry in entries:
+                    entry.setdefault("_id", ObjectId())
+                self._rewrite_journal(entries)
+                replayed_bytes = os.path.getsize(self.journal_path)
+        try:
+            for start in range(0, len(entries), self.batch_size):
+                repository.insert_analyses(entries[start:start + self.batch_size])
+        except Exception as e:
+            logging.error(f"Failed to replay analysis journal: {str(e)}")
+            return
+        with self._journal_lock:
+            # Keep whatever was spilled while the replay ran
+            with open(self.journal_path, "rb") as journal:
+                journal.seek(replayed_bytes)
+                spilled = [json_util.loads(line) for line in journal.read().decode("utf-8").splitlines() if line.strip()]
+            if spilled:
+                self._rewrite_journal(spilled)
+            else:
+                os.remove(self.journal_path)
+        self._count("replayed", len(entries))
+        logging.info(f"Replayed {len(entries)} journaled analysis results.")
+
+    def _rewrite_journal(self, entries):
+        # Called with the journal lock held; the replace is atomic
+        temporary = self.journal_path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as journal:
+            for entry in entries:
+                journal.write(json_util.dumps(entry) + "\n")
+        os.replace(temporary, self.journal_path)
+
+# Shared Writer
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_analysis_writer():
+    """
+    Returns the process-wide AnalysisWriter, starting it on first use.
+    """
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AnalysisWriter().start()
+    return _writer
+
+def shutdown_analysis_writer():
+    """
+    Flushes and stops the shared writer, if one was started.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None